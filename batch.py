@@ -0,0 +1,119 @@
+"""Vectorized win/tie checks and random play for many boards at once.
+
+Boards are (n, size, size) int8 arrays holding 0 for an empty cell, 1 for a mark of the first player and 2 for a mark of the second player.
+This module needs NumPy, which the rest of the game does not.
+"""
+from typing import NamedTuple
+import numpy as np
+from tic_tac_toe import get_line_tables
+
+EMPTY: int = 0
+FIRST_PLAYER: int = 1
+SECOND_PLAYER: int = 2
+
+
+class BatchStatus(NamedTuple):
+    winners: np.ndarray
+    winning_lines: np.ndarray
+    tied: np.ndarray
+    legal_moves: np.ndarray
+
+
+def line_mask_tensor(board_size: int, win_length: int = None) -> np.ndarray:
+    """Return a (lines, size * size) int16 array with a 1 for every cell of every winning line, in the order of "get_line_tables".
+
+    :param board_size: The number of rows (and columns) of the board
+    :type board_size: int
+    :param win_length: The number of marks in a row needed to win (Default value is "None", meaning the whole board width)
+    :type win_length: int
+    """
+    if win_length is None:
+        win_length = board_size
+    combos = get_line_tables(board_size, win_length).combos
+    masks = np.zeros((len(combos), board_size * board_size), dtype=np.int16)
+    for index, combo in enumerate(combos):
+        for row, col in combo:
+            masks[index, row * board_size + col] = 1
+    return masks
+
+
+def evaluate(boards: np.ndarray, win_length: int = None, line_masks: np.ndarray = None) -> BatchStatus:
+    """Check every board of the batch for a winner, a tie and the cells that can still be played.
+
+    "winners" holds the winning player (1 or 2) or 0, "winning_lines" the index of the first completed line or -1, "tied" is True for full boards without a winner and "legal_moves" is an (n, size, size) bool array that is all False once a board is decided.
+    A board where both players completed a line (which normal play cannot reach) is reported as won by the first player.
+
+    :param boards: An (n, size, size) int8 array of boards
+    :type boards: np.ndarray
+    :param win_length: The number of marks in a row needed to win (Default value is "None", meaning the whole board width)
+    :type win_length: int
+    :param line_masks: The result of "line_mask_tensor" for these boards, to avoid rebuilding it on every call (Default value is "None")
+    :type line_masks: np.ndarray
+    """
+    count, board_size = boards.shape[0], boards.shape[1]
+    if win_length is None:
+        win_length = board_size
+    if line_masks is None:
+        line_masks = line_mask_tensor(board_size, win_length)
+    cells = boards.reshape(count, board_size * board_size)
+    winners = np.zeros(count, dtype=np.int8)
+    winning_lines = np.full(count, -1, dtype=np.int64)
+    for player in (SECOND_PLAYER, FIRST_PLAYER):
+        completed = ((cells == player).astype(np.int16) @ line_masks.T) == win_length
+        has_line = completed.any(axis=1)
+        winners[has_line] = player
+        winning_lines[has_line] = completed.argmax(axis=1)[has_line]
+    empty = cells == EMPTY
+    in_play = winners == 0
+    tied = in_play & ~empty.any(axis=1)
+    legal_moves = (empty & in_play[:, None]).reshape(boards.shape)
+    return BatchStatus(winners, winning_lines, tied, legal_moves)
+
+
+def random_step(boards: np.ndarray, player, legal_moves: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Play one "Easy Mode" move (a uniformly random legal cell) on every board that still has a legal move, in place.
+    Returns a bool array telling which boards were played on.
+
+    :param boards: An (n, size, size) int8 array of boards, updated in place
+    :type boards: np.ndarray
+    :param player: The player to move (1 or 2), either the same for every board or an (n,) array
+    :param legal_moves: The "legal_moves" of "evaluate" for these boards
+    :type legal_moves: np.ndarray
+    :param rng: The NumPy random generator to draw the moves from
+    :type rng: np.random.Generator
+    """
+    count = boards.shape[0]
+    legal = legal_moves.reshape(count, -1)
+    #The legal cell with the highest random key is a uniform pick among the legal cells
+    keys = np.where(legal, rng.random(legal.shape), -1.0)
+    chosen = keys.argmax(axis=1)
+    played = legal.any(axis=1)
+    rows = np.nonzero(played)[0]
+    flat = boards.reshape(count, -1)
+    player = np.broadcast_to(np.asarray(player, dtype=boards.dtype), (count,))
+    flat[rows, chosen[rows]] = player[rows]
+    return played
+
+
+def play_random_games(count: int, board_size: int = 3, win_length: int = None, seed=None) -> tuple:
+    """Play "count" random vs random games in lockstep, every game starting empty with the first player.
+    Returns the final boards and their "BatchStatus".
+
+    :param count: The number of games to play
+    :type count: int
+    :param board_size: The number of rows (and columns) of the board (Default value is "3")
+    :type board_size: int
+    :param win_length: The number of marks in a row needed to win (Default value is "None", meaning the whole board width)
+    :type win_length: int
+    :param seed: The seed of the NumPy random generator (Default value is "None")
+    """
+    rng = np.random.default_rng(seed)
+    boards = np.zeros((count, board_size, board_size), dtype=np.int8)
+    line_masks = line_mask_tensor(board_size, win_length or board_size)
+    player = FIRST_PLAYER
+    status = evaluate(boards, win_length, line_masks)
+    while status.legal_moves.any():
+        random_step(boards, player, status.legal_moves, rng)
+        status = evaluate(boards, win_length, line_masks)
+        player = SECOND_PLAYER if player == FIRST_PLAYER else FIRST_PLAYER
+    return boards, status
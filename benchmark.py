@@ -0,0 +1,171 @@
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+from tic_tac_toe import TicTacToeGame, TicTacToeCpuEngine, Move, get_line_tables
+
+PHASES = ("empty", "midgame", "near_full")
+DEFAULT_SIZES = (3, 4, 5, 7, 10, 15)
+
+
+def win_lengths(board_size: int) -> list:
+    """Return the win lengths benchmarked for a board size: the full width and, on larger boards, 5 in a row."""
+    return sorted({board_size, min(board_size, 5)})
+
+
+def _completes_line(game, board: int, cell: int) -> bool:
+    for line in game._cell_lines[cell]:
+        mask = game._winning_masks[line]
+        if (board | 1 << cell) & mask == mask:
+            return True
+    return False
+
+
+def build_position(board_size: int, win_length: int, phase: str, seed: int = 0) -> list:
+    """Return a list of moves leading to a position of the given phase without a winner.
+    "midgame" fills half of the board and "near_full" all but two cells, or as many as can be played without completing a line.
+    """
+    game = TicTacToeGame(board_size=board_size, win_length=win_length)
+    game.set_players(game.players_list)
+    cells = board_size * board_size
+    target = {"empty": 0, "midgame": cells // 2, "near_full": cells - 2}[phase]
+    rng = random.Random(seed)
+    moves = []
+    while len(moves) < target:
+        label = game.current_player.label
+        board = game._bitboards[label]
+        options = [
+            (row, col) for row, col in game.available_moves()
+            if not _completes_line(game, board, row * board_size + col)
+        ]
+        if not options:
+            break
+        row, col = rng.choice(options)
+        move = Move(row, col, label)
+        game.process_move(move)
+        game.toggle_player()
+        moves.append(move)
+    return moves
+
+
+def replay(game, moves) -> None:
+    """Clear the board and play "moves" again, leaving the next player to move."""
+    game.clear_board()
+    game.set_players(game.players_list)
+    for move in moves:
+        game.process_move(move)
+        game.toggle_player()
+
+
+def measure(function, min_time: float, repeat: int) -> tuple:
+    """Time "function" and return its best calls per second over "repeat" runs of at least "min_time" seconds, along with the peak bytes allocated by one call."""
+    best = 0.0
+    for _ in range(repeat):
+        calls = 1
+        while True:
+            started = time.perf_counter()
+            for _ in range(calls):
+                function()
+            elapsed = time.perf_counter() - started
+            if elapsed >= min_time:
+                break
+            calls *= 2
+        best = max(best, calls / elapsed)
+    tracemalloc.start()
+    start_size, _ = tracemalloc.get_traced_memory()
+    function()
+    _, peak_size = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak_size - start_size
+
+
+def benchmark_cases(board_size: int, win_length: int, phase: str):
+    """Yield (name, function, operations per call) for every hot path on one board shape and phase."""
+    moves = build_position(board_size, win_length, phase)
+    game = TicTacToeGame(board_size=board_size, win_length=win_length)
+    game.set_cpu_player(0, True)
+    game.set_cpu_player(1, True)
+    replay(game, moves)
+    probe = Move(0, 0)
+    rng = random.Random(0)
+    hard = TicTacToeCpuEngine(game, hard_mode=True, rng=rng)
+    easy = TicTacToeCpuEngine(game, hard_mode=False, rng=rng)
+
+    if moves:
+        yield "process_move", lambda: replay(game, moves), len(moves)
+    yield "is_tied", game.is_tied, 1
+    yield "is_valid_move", lambda: game.is_valid_move(probe), 1
+    yield "_get_winning_combos", game._get_winning_combos, 1
+    yield "get_line_tables_uncached", lambda: get_line_tables.__wrapped__(board_size, win_length), 1
+    yield "block_win_check", hard.block_win_check, 1
+    yield "select_move_hard", hard.select_move, 1
+    yield "select_move_easy", easy.select_move, 1
+    if board_size == win_length == 3:
+        perfect = TicTacToeCpuEngine(game, perfect_mode=True, rng=rng)
+        yield "select_move_perfect", perfect.select_move, 1
+
+
+def run(sizes, min_time: float, repeat: int, names=None) -> dict:
+    """Run every benchmark and return {case key: {"ops_per_sec": ..., "alloc_bytes": ...}}."""
+    results = {}
+    for board_size in sizes:
+        for win_length in win_lengths(board_size):
+            for phase in PHASES:
+                for name, function, operations in benchmark_cases(board_size, win_length, phase):
+                    if names and name not in names:
+                        continue
+                    calls_per_sec, alloc_bytes = measure(function, min_time, repeat)
+                    key = f"{name}[{board_size}x{board_size} k={win_length} {phase}]"
+                    results[key] = {
+                        "ops_per_sec": calls_per_sec * operations,
+                        "alloc_bytes": alloc_bytes,
+                    }
+                    print(f"{key:<58}{results[key]['ops_per_sec']:>16,.0f} ops/s{alloc_bytes:>10} B", flush=True)
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Return the keys whose ops/sec fell more than "tolerance" (a fraction) below the baseline, printing every change."""
+    regressions = []
+    print(f"\n{'Case':<58}{'Baseline':>16}{'Now':>16}{'Change':>10}")
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        before = baseline[key]["ops_per_sec"]
+        change = result["ops_per_sec"] / before - 1
+        flag = ""
+        if change < -tolerance:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print(f"{key:<58}{before:>16,.0f}{result['ops_per_sec']:>16,.0f}{change:>+10.1%}{flag}")
+    return regressions
+
+
+def main():
+    """Run the benchmark suite from the command line, optionally saving or comparing against a baseline JSON file"""
+    parser = argparse.ArgumentParser(description="Benchmark the game and cpu hot paths.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--only", nargs="+", help="Only run the named benchmarks, e.g. process_move is_tied")
+    parser.add_argument("--min-time", type=float, default=0.1, help="Minimum seconds per timing run")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", help="Compare against this baseline JSON file")
+    parser.add_argument("--save-baseline", help="Write the results to this baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed ops/sec drop before flagging a regression")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.min_time, args.repeat, args.only)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as baseline_file:
+            json.dump({"python": sys.version.split()[0], "results": results}, baseline_file, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+"""Live broadcast of games to read-only spectators, as JSON lines over TCP or a Unix socket.
+
+A spectator sends {"op": "watch", "game": id} and gets a "snapshot" of the board:
+{"op": "snapshot", "game": id, "seq": n, "board_size": 3, "win_length": 3, "board": "X...O....", "turn": "X", "result": null, "line": []},
+then one "move" delta per move: {"op": "move", "game": id, "seq": n, "cell": 4, "label": "O", "turn": "X"}, with "result" ("X", "O" or "tie") and the winning "line" once the game is over.
+"seq" goes up by one per message of a game, so a gap means deltas were missed and a snapshot follows. {"op": "games"} lists the games being broadcast.
+"""
+import argparse
+import asyncio
+import functools
+import json
+import random
+import threading
+import time
+import instrumentation
+
+BROADCAST_HOST = "127.0.0.1"
+BROADCAST_PORT: int = 8766
+#Bytes a spectator may have waiting in its socket buffer, past that it gets no more deltas until it has caught up, and then a snapshot
+MAX_VIEWER_BUFFER: int = 64 * 1024
+#Seconds a lagging spectator gets to catch up before it is disconnected
+RESYNC_TIMEOUT: float = 30.0
+#Spectators tend to arrive all at once when a stream starts
+ACCEPT_BACKLOG: int = 4096
+
+
+def _encode(message: dict) -> bytes:
+    return json.dumps(message, separators=(",", ":")).encode() + b"\n"
+
+
+def _result(game):
+    if game.has_winner():
+        return game.current_player.label
+    if game.is_tied():
+        return "tie"
+    return None
+
+
+def game_state(game) -> dict:
+    """Return the "publish_snapshot" keyword arguments describing "game"."""
+    result = _result(game)
+    return {
+        "board_size": game.board_size,
+        "win_length": game.win_length,
+        "board": game.board_string(),
+        "turn": None if result or game.current_player is None else game.current_player.label,
+        "result": result,
+        "line": game.winner_combo,
+    }
+
+
+def move_state(game, move) -> dict:
+    """Return the "publish_move" keyword arguments for "move", once it has been played on "game" and the turn handed over."""
+    result = _result(game)
+    return {
+        "row": move.row,
+        "col": move.col,
+        "label": move.label,
+        "turn": None if result else game.current_player.label,
+        "result": result,
+        "line": game.winner_combo,
+    }
+
+
+class _Channel:
+    __slots__ = ("game_id", "board_size", "win_length", "cells", "turn", "result", "line", "seq", "viewers", "_snapshot")
+
+    def __init__(self, game_id) -> None:
+        #The board as the spectators see it, kept from the published messages so snapshots never read the game itself
+        self.game_id = game_id
+        self.board_size = 0
+        self.win_length = 0
+        self.cells = []
+        self.turn = None
+        self.result = None
+        self.line = []
+        self.seq = 0
+        self.viewers = set()
+        self._snapshot = None
+
+    def snapshot(self) -> bytes:
+        #Encoded once per position however many spectators join or resync
+        if self._snapshot is None:
+            self._snapshot = _encode({
+                "op": "snapshot",
+                "game": self.game_id,
+                "seq": self.seq,
+                "board_size": self.board_size,
+                "win_length": self.win_length,
+                "board": "".join(self.cells),
+                "turn": self.turn,
+                "result": self.result,
+                "line": self.line,
+            })
+        return self._snapshot
+
+
+class _Viewer:
+    __slots__ = ("writer", "transport", "channel", "lagging")
+
+    def __init__(self, writer) -> None:
+        self.writer = writer
+        self.transport = writer.transport
+        self.channel = None
+        self.lagging = False
+
+
+class BroadcastHub:
+    def __init__(self, max_buffer: int = MAX_VIEWER_BUFFER, resync_timeout: float = RESYNC_TIMEOUT) -> None:
+        """Sends the games published to it to any number of spectators, a snapshot when they start watching and a small delta per move after that.
+
+        Every delta is encoded once and the same bytes are written to every spectator's socket.
+        A spectator whose socket buffer grows past "max_buffer" bytes is skipped, so it never holds up the others, and gets a fresh snapshot once its buffer has drained.
+        The "publish_" methods must be called on the hub's event loop, see "BroadcastThread" for frontends that are not asyncio.
+
+        :param max_buffer: The bytes waiting to be sent to a spectator past which it is skipped until it has caught up (Default value is "65536")
+        :type max_buffer: int
+        :param resync_timeout: The seconds a skipped spectator gets to catch up before it is disconnected (Default value is "30.0")
+        :type resync_timeout: float
+        """
+        self.max_buffer = max_buffer
+        self.resync_timeout = resync_timeout
+        self.channels = {}
+        self.server = None
+        self.resyncs = 0
+        self.dropped = 0
+        self._viewers = set()
+        self._handlers = set()
+
+    async def start(self, host: str = BROADCAST_HOST, port: int = BROADCAST_PORT, unix_path: str = None):
+        """Start listening on "unix_path" if given, otherwise on "host"/"port", and return the asyncio server."""
+        if unix_path:
+            self.server = await asyncio.start_unix_server(self._serve, unix_path, backlog=ACCEPT_BACKLOG)
+        else:
+            self.server = await asyncio.start_server(self._serve, host, port, backlog=ACCEPT_BACKLOG)
+        return self.server
+
+    async def close(self) -> None:
+        self.server.close()
+        for viewer in list(self._viewers):
+            viewer.writer.close()
+        #Closed connections read as EOF, let their handlers finish so the loop can be closed after this
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        await self.server.wait_closed()
+
+    def viewer_count(self, game_id=None) -> int:
+        if game_id is None:
+            return len(self._viewers)
+        channel = self.channels.get(game_id)
+        return 0 if channel is None else len(channel.viewers)
+
+    def publish_snapshot(self, game_id, board_size: int, win_length: int, board: str, turn=None, result=None, line=()) -> None:
+        """Start broadcasting a game, or send the whole board again after a change that isn't a single move (a restart or an undo).
+
+        :param board: One character per cell, row by row, with "." for a free cell
+        :type board: str
+        :param turn: The label of the player to move, None once the game is over (Default value is "None")
+        :param result: The label of the winner or "tie" once the game is over (Default value is "None")
+        :param line: The (row, col) cells of the winning line (Default value is "()")
+        """
+        channel = self.channels.get(game_id)
+        if channel is None:
+            channel = self.channels[game_id] = _Channel(game_id)
+        channel.board_size = board_size
+        channel.win_length = win_length
+        channel.cells = list(board)
+        channel.turn = turn
+        channel.result = result
+        channel.line = [list(cell) for cell in line]
+        channel.seq += 1
+        channel._snapshot = None
+        self._fan_out(channel, channel.snapshot())
+
+    def publish_move(self, game_id, row: int, col: int, label: str, turn=None, result=None, line=()) -> None:
+        """Send a move of a game already published with "publish_snapshot".
+
+        :param label: The label of the player who moved
+        :type label: str
+        :param turn: The label of the player to move next, None once the game is over (Default value is "None")
+        :param result: The label of the winner or "tie" if the move ended the game (Default value is "None")
+        :param line: The (row, col) cells of the winning line (Default value is "()")
+        """
+        channel = self.channels.get(game_id)
+        if channel is None:
+            raise ValueError(f"publish a snapshot of game {game_id!r} first")
+        cell = row * channel.board_size + col
+        channel.cells[cell] = label
+        channel.turn = turn
+        channel.result = result
+        channel.seq += 1
+        channel._snapshot = None
+        message = {"op": "move", "game": game_id, "seq": channel.seq, "cell": cell, "label": label, "turn": turn}
+        if result is not None:
+            channel.line = [list(cell) for cell in line]
+            message["result"] = result
+            message["line"] = channel.line
+        self._fan_out(channel, _encode(message))
+
+    def end_game(self, game_id) -> None:
+        """Stop broadcasting a game, its spectators stay connected and can watch another one."""
+        channel = self.channels.pop(game_id, None)
+        if channel is None:
+            return
+        frame = _encode({"op": "ended", "game": game_id})
+        for viewer in channel.viewers:
+            viewer.channel = None
+            if not viewer.transport.is_closing():
+                viewer.transport.write(frame)
+
+    def _fan_out(self, channel: _Channel, frame: bytes) -> None:
+        instruments = instrumentation.active
+        started = time.perf_counter()
+        max_buffer = self.max_buffer
+        for viewer in channel.viewers:
+            if viewer.lagging:
+                self.dropped += 1
+                continue
+            transport = viewer.transport
+            if transport.is_closing():
+                continue
+            transport.write(frame)
+            if transport.get_write_buffer_size() > max_buffer:
+                viewer.lagging = True
+                asyncio.get_running_loop().create_task(self._resync(viewer))
+        if instruments is not None:
+            instruments.record("broadcast_fan_out", time.perf_counter() - started)
+            instruments.count("broadcast_frames", len(channel.viewers))
+
+    async def _resync(self, viewer: _Viewer) -> None:
+        #What is already buffered still goes out, the deltas skipped after it are made up for by a snapshot
+        try:
+            await asyncio.wait_for(viewer.writer.drain(), self.resync_timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            viewer.writer.close()
+            return
+        viewer.lagging = False
+        self.resyncs += 1
+        if viewer.channel is not None and not viewer.transport.is_closing():
+            viewer.transport.write(viewer.channel.snapshot())
+
+    def _watch(self, viewer: _Viewer, game_id) -> None:
+        channel = self.channels.get(game_id)
+        if channel is None:
+            raise ValueError(f"unknown game {game_id!r}")
+        if viewer.channel is not None:
+            viewer.channel.viewers.discard(viewer)
+        viewer.channel = channel
+        channel.viewers.add(viewer)
+        if not viewer.lagging:
+            viewer.transport.write(channel.snapshot())
+
+    async def _serve(self, reader, writer) -> None:
+        viewer = _Viewer(writer)
+        #The transport pauses past "max_buffer" so that drain() in _resync waits for the spectator to catch up
+        viewer.transport.set_write_buffer_limits(high=self.max_buffer)
+        self._viewers.add(viewer)
+        self._handlers.add(asyncio.current_task())
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    op = request.get("op")
+                    if op == "watch":
+                        self._watch(viewer, request.get("game"))
+                    elif op == "games":
+                        writer.write(_encode({"op": "games", "games": list(self.channels)}))
+                    else:
+                        raise ValueError(f"unknown op {op!r}")
+                except (ValueError, AttributeError, TypeError) as error:
+                    writer.write(_encode({"op": "error", "message": str(error)}))
+        except ConnectionError:
+            pass
+        finally:
+            self._viewers.discard(viewer)
+            self._handlers.discard(asyncio.current_task())
+            if viewer.channel is not None:
+                viewer.channel.viewers.discard(viewer)
+            writer.close()
+
+
+class BroadcastThread:
+    def __init__(self, host: str = BROADCAST_HOST, port: int = BROADCAST_PORT, unix_path: str = None, **hub_options) -> None:
+        """Runs a "BroadcastHub" on an event loop of its own thread, for frontends that are not asyncio like the Tk window.
+        The "publish_" methods can be called from any thread; pass them "game_state"/"move_state" worked out on the thread that owns the game.
+
+        :raises OSError: If the hub can't listen on the address
+        """
+        self.hub = BroadcastHub(**hub_options)
+        self._loop = asyncio.new_event_loop()
+        self._error = None
+        started = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(host, port, unix_path, started), name="broadcast", daemon=True)
+        self._thread.start()
+        started.wait()
+        if self._error is not None:
+            raise self._error
+
+    def _run(self, host, port, unix_path, started) -> None:
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self.hub.start(host, port, unix_path))
+        except OSError as error:
+            self._error = error
+            started.set()
+            self._loop.close()
+            return
+        started.set()
+        self._loop.run_forever()
+        self._loop.run_until_complete(self.hub.close())
+        self._loop.close()
+
+    def _call(self, method, *args, **kwargs) -> None:
+        self._loop.call_soon_threadsafe(functools.partial(method, *args, **kwargs))
+
+    def publish_snapshot(self, game_id, **state) -> None:
+        self._call(self.hub.publish_snapshot, game_id, **state)
+
+    def publish_move(self, game_id, **state) -> None:
+        self._call(self.hub.publish_move, game_id, **state)
+
+    def end_game(self, game_id) -> None:
+        self._call(self.hub.end_game, game_id)
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+
+async def _demo(hub: BroadcastHub, game_id, board_size: int, rate: float, seed) -> None:
+    #Publishes random games at "rate" moves per second and reports how long every move took to reach all the spectators' sockets
+    from tic_tac_toe import TicTacToeGame, Move
+    rng = random.Random(seed)
+    game = TicTacToeGame(board_size=board_size)
+    game.set_players(game.players_list)
+    hub.publish_snapshot(game_id, **game_state(game))
+    moves = 0
+    fan_out = 0.0
+    reported = time.monotonic()
+    while True:
+        await asyncio.sleep(1 / rate)
+        if game.has_winner() or game.is_tied():
+            game.clear_board()
+            game.set_players(game.players_list)
+            hub.publish_snapshot(game_id, **game_state(game))
+            continue
+        empty = [cell for cell in range(board_size * board_size) if not game._occupied >> cell & 1]
+        row, col = divmod(rng.choice(empty), board_size)
+        move = Move(row, col, game.current_player.label)
+        game.make_move(move)
+        started = time.perf_counter()
+        hub.publish_move(game_id, **move_state(game, move))
+        fan_out += time.perf_counter() - started
+        moves += 1
+        if time.monotonic() - reported >= 5:
+            print(f"{hub.viewer_count(game_id)} spectators: {moves} moves, {fan_out / moves * 1000:.2f}ms per move to all of them, {hub.resyncs} resyncs, {hub.dropped} deltas skipped")
+            moves = 0
+            fan_out = 0.0
+            reported = time.monotonic()
+
+
+async def _watcher(address, game_id, deadline: float, counts: list, slow: float) -> None:
+    if isinstance(address, str):
+        reader, writer = await asyncio.open_unix_connection(address)
+    else:
+        reader, writer = await asyncio.open_connection(*address)
+    writer.write(_encode({"op": "watch", "game": game_id}))
+    seq = None
+    while time.monotonic() < deadline:
+        try:
+            line = await asyncio.wait_for(reader.readline(), max(deadline - time.monotonic(), 0.001))
+        except asyncio.TimeoutError:
+            break
+        if not line:
+            break
+        message = json.loads(line)
+        if message["op"] == "snapshot":
+            counts[1] += 1
+        elif message["op"] == "move":
+            counts[0] += 1
+            if seq is not None and message["seq"] != seq + 1:
+                counts[2] += 1
+        seq = message.get("seq", seq)
+        if slow:
+            await asyncio.sleep(slow)
+    writer.close()
+
+
+async def watch_load(address, game_id, viewers: int, duration: float, slow_viewers: int = 0, slow: float = 0.5) -> None:
+    """Connect "viewers" spectators to a running hub for "duration" seconds and print what they received.
+
+    :param slow_viewers: How many of them sleep "slow" seconds after every message, to check they don't hold up the others (Default value is "0")
+    :type slow_viewers: int
+    """
+    deadline = time.monotonic() + duration
+    fast = [0, 0, 0]
+    lagging = [0, 0, 0]
+    await asyncio.gather(*(
+        _watcher(address, game_id, deadline, lagging if index < slow_viewers else fast, slow if index < slow_viewers else 0)
+        for index in range(viewers)
+    ))
+    for name, count, (deltas, snapshots, gaps) in (("fast", viewers - slow_viewers, fast), ("slow", slow_viewers, lagging)):
+        if count:
+            print(f"{count} {name} spectators: {deltas / count:.1f} deltas, {snapshots / count:.1f} snapshots and {gaps / count:.1f} gaps each")
+
+
+def main():
+    """Run a demo broadcast of random games, or connect spectators to one, from the command line"""
+    parser = argparse.ArgumentParser(description="Broadcast games to spectators over JSON lines.")
+    parser.add_argument("mode", choices=("demo", "watch"))
+    parser.add_argument("--host", default=BROADCAST_HOST)
+    parser.add_argument("--port", type=int, default=BROADCAST_PORT)
+    parser.add_argument("--unix", help="Listen on (or connect to) this Unix socket instead of TCP")
+    parser.add_argument("--game", default="demo")
+    parser.add_argument("--board-size", type=int, default=3)
+    parser.add_argument("--rate", type=float, default=20.0, help="Demo moves per second")
+    parser.add_argument("--viewers", type=int, default=1000, help="Spectators to connect")
+    parser.add_argument("--slow-viewers", type=int, default=0, help="Spectators that read slowly")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to watch for")
+    args = parser.parse_args()
+    if args.mode == "watch":
+        address = args.unix or (args.host, args.port)
+        asyncio.run(watch_load(address, args.game, args.viewers, args.duration, args.slow_viewers))
+        return
+
+    async def demo():
+        hub = BroadcastHub()
+        await hub.start(args.host, args.port, args.unix)
+        print(f"Broadcasting on {args.unix or f'{args.host}:{args.port}'}")
+        await _demo(hub, args.game, args.board_size, args.rate, None)
+    asyncio.run(demo())
+
+if __name__ == "__main__":
+    main()
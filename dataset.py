@@ -0,0 +1,251 @@
+"""Export every reachable position of a board, solved, as NumPy shards for training policy/value networks.
+
+Positions are enumerated layer by layer (one layer per number of marks), keeping one position per class of the 8 board symmetries.
+They are then solved backwards from the last layer, so every layer only needs the values of the next one.
+Each layer is written as ".npz" shards of up to "shard_size" positions holding:
+
+* "key": the canonical position, the first player's bitboard shifted left by the number of cells, ORed with the second player's
+* "board": an (n, size, size) int8 array with 0 for an empty cell, 1 for the first player and 2 for the second player
+* "to_move": 1 or 2, the player to move
+* "value": the score for the player to move as in "AlphaBetaSolver", the number of empty cells left at the winning move, negative for a loss and 0 for a draw
+* "move_values": an (n, size, size) int8 array with the score of playing every cell, "OCCUPIED" for cells already played
+* "best_moves": an (n, size, size) bool array marking every cell that reaches "value"
+
+Only positions still in play are written. The enumerated layers are kept next to the shards, and shards are written whole under a temporary name, so an interrupted export picks up where it stopped.
+This module needs NumPy, which the rest of the game does not.
+"""
+import argparse
+import json
+import os
+import time
+import numpy as np
+from tic_tac_toe import get_line_tables
+from solver import symmetry_chunks
+
+OCCUPIED: int = -128
+#The keys pack both bitboards in an int64
+MAX_CELLS: int = 31
+FIRST_PLAYER: int = 1
+SECOND_PLAYER: int = 2
+
+
+class _Board:
+    def __init__(self, board_size: int, win_length: int) -> None:
+        #Lookup tables applying every symmetry to 8 cells of a bitboard at a time, and the winning line masks
+        self.board_size = board_size
+        self.win_length = win_length
+        self.cells = board_size * board_size
+        if self.cells > MAX_CELLS:
+            raise ValueError(f"Datasets are limited to boards of up to {MAX_CELLS} cells")
+        self.full_mask = (1 << self.cells) - 1
+        self.line_masks = np.array(get_line_tables(board_size, win_length).masks, dtype=np.int64)
+        self.symmetries = [
+            [(shift, np.array(table, dtype=np.int64)) for shift, table in tables]
+            for tables in symmetry_chunks(board_size)
+        ]
+
+    def split(self, keys: np.ndarray) -> tuple:
+        return keys >> self.cells, keys & self.full_mask
+
+    def canonical(self, first: np.ndarray, second: np.ndarray) -> np.ndarray:
+        """Return the smallest key of every position over the 8 symmetries."""
+        best = None
+        for tables in self.symmetries:
+            first_t = np.zeros_like(first)
+            second_t = np.zeros_like(second)
+            for shift, table in tables:
+                first_t |= table[first >> shift & 255]
+                second_t |= table[second >> shift & 255]
+            keys = first_t << self.cells | second_t
+            best = keys if best is None else np.minimum(best, keys)
+        return best
+
+    def has_line(self, boards: np.ndarray) -> np.ndarray:
+        won = np.zeros(boards.shape, dtype=bool)
+        for mask in self.line_masks:
+            won |= boards & mask == mask
+        return won
+
+    def to_grid(self, first: np.ndarray, second: np.ndarray) -> np.ndarray:
+        bits = np.arange(self.cells, dtype=np.int64)
+        grid = ((first[:, None] >> bits) & 1) * FIRST_PLAYER + ((second[:, None] >> bits) & 1) * SECOND_PLAYER
+        return grid.astype(np.int8).reshape(-1, self.board_size, self.board_size)
+
+
+def iter_layers(board_size: int, win_length: int = None, work_dir: str = None):
+    """Yield (marks, keys) for every layer of reachable positions still in play, "keys" being the sorted canonical keys of the layer's positions.
+    Only one layer and its children are held in memory at a time. With "work_dir" every layer is saved there as "positions-NN.npy" and read back instead of enumerated on the next run.
+
+    :param board_size: The number of rows (and columns) of the board
+    :type board_size: int
+    :param win_length: The number of marks in a row needed to win (Default value is "None", meaning the whole board width)
+    :type win_length: int
+    :param work_dir: Where the layers are kept between runs (Default value is "None")
+    :type work_dir: str
+    """
+    board = _Board(board_size, win_length or board_size)
+    keys = None
+    for marks in range(board.cells):
+        path = None if work_dir is None else os.path.join(work_dir, f"positions-{marks:02d}.npy")
+        if path is not None and os.path.exists(path):
+            keys = np.load(path)
+        else:
+            keys = np.zeros(1, dtype=np.int64) if keys is None else _next_layer(board, keys, marks - 1)
+            if path is not None:
+                _save_atomic(path, lambda temporary: np.save(temporary, keys))
+        if not len(keys):
+            return
+        yield marks, keys
+
+
+def _next_layer(board: _Board, keys: np.ndarray, marks: int) -> np.ndarray:
+    #Play every empty cell of every position, dropping the children that are won and the full boards
+    first, second = board.split(keys)
+    first_moves = marks % 2 == 0
+    if marks + 1 == board.cells:
+        return np.zeros(0, dtype=np.int64)
+    children = []
+    for cell in range(board.cells):
+        bit = np.int64(1 << cell)
+        free = ((first | second) & bit) == 0
+        if first_moves:
+            child_first, child_second = first[free] | bit, second[free]
+            won = board.has_line(child_first)
+        else:
+            child_first, child_second = first[free], second[free] | bit
+            won = board.has_line(child_second)
+        children.append(board.canonical(child_first[~won], child_second[~won]))
+    return np.unique(np.concatenate(children))
+
+
+def solve_layer(board: _Board, keys: np.ndarray, marks: int, next_keys: np.ndarray, next_values: np.ndarray) -> dict:
+    """Solve the positions "keys" of a layer from the values of the next layer's positions, returning the shard arrays."""
+    first, second = board.split(keys)
+    first_moves = marks % 2 == 0
+    mover, other = (first, second) if first_moves else (second, first)
+    remaining = board.cells - marks
+    move_values = np.full((len(keys), board.cells), OCCUPIED, dtype=np.int8)
+    for cell in range(board.cells):
+        bit = np.int64(1 << cell)
+        free = ((first | second) & bit) == 0
+        played = mover[free] | bit
+        values = np.zeros(len(played), dtype=np.int8)
+        won = board.has_line(played)
+        values[won] = remaining
+        rest = ~won
+        if remaining > 1 and rest.any():
+            child_mover, child_other = played[rest], other[free][rest]
+            if first_moves:
+                child_keys = board.canonical(child_mover, child_other)
+            else:
+                child_keys = board.canonical(child_other, child_mover)
+            index = np.searchsorted(next_keys, child_keys)
+            values[rest] = -next_values[index]
+        move_values[free, cell] = values
+    value = move_values.max(axis=1)
+    size = board.board_size
+    return {
+        "key": keys,
+        "board": board.to_grid(first, second),
+        "to_move": np.full(len(keys), FIRST_PLAYER if first_moves else SECOND_PLAYER, dtype=np.int8),
+        "value": value,
+        "move_values": move_values.reshape(-1, size, size),
+        "best_moves": (move_values == value[:, None]).reshape(-1, size, size),
+    }
+
+
+def _save_atomic(path: str, write) -> None:
+    #Written under a temporary name and renamed, so a file that exists is always whole
+    temporary = f"{path}.{os.getpid()}.tmp{os.path.splitext(path)[1]}"
+    write(temporary)
+    os.replace(temporary, path)
+
+
+def export_dataset(out_dir: str, board_size: int, win_length: int = None, shard_size: int = 100_000,
+                   compress: bool = False, progress=print) -> dict:
+    """Enumerate, solve and write every reachable position still in play to "out_dir", see the module docstring for the shard layout.
+    Shards already in "out_dir" are kept, so running it again after an interruption only does what is left. Returns the manifest also written as "manifest.json".
+
+    :param out_dir: The directory for the shards, created if needed
+    :type out_dir: str
+    :param shard_size: The most positions per shard (Default value is "100000")
+    :type shard_size: int
+    :param compress: Write the shards with "np.savez_compressed" (Default value is "False")
+    :type compress: bool
+    :param progress: Called with a line of text after every shard, or None (Default value is "print")
+    """
+    win_length = win_length or board_size
+    board = _Board(board_size, win_length)
+    os.makedirs(out_dir, exist_ok=True)
+    started = time.perf_counter()
+    layers = []
+    for marks, keys in iter_layers(board_size, win_length, out_dir):
+        layers.append((marks, len(keys)))
+        if progress is not None:
+            progress(f"Layer {marks}: {len(keys):,} positions ({time.perf_counter() - started:.1f}s)")
+    total = sum(count for _, count in layers)
+    save = np.savez_compressed if compress else np.savez
+    shards = []
+    done = 0
+    solved_started = time.perf_counter()
+    next_keys = next_values = np.zeros(0, dtype=np.int64)
+    for marks, count in reversed(layers):
+        keys = np.load(os.path.join(out_dir, f"positions-{marks:02d}.npy"))
+        values = []
+        for index, start in enumerate(range(0, count, shard_size)):
+            name = f"layer{marks:02d}-{index:05d}.npz"
+            path = os.path.join(out_dir, name)
+            if os.path.exists(path):
+                with np.load(path) as shard:
+                    values.append(shard["value"])
+            else:
+                arrays = solve_layer(board, keys[start:start + shard_size], marks, next_keys, next_values)
+                _save_atomic(path, lambda temporary: save(temporary, **arrays))
+                values.append(arrays["value"])
+            shards.append({"file": name, "marks": marks, "positions": len(values[-1])})
+            done += len(values[-1])
+            if progress is not None:
+                elapsed = time.perf_counter() - solved_started
+                progress(f"{name}: {done:,}/{total:,} positions ({done / total:.0%}), {done / elapsed:,.0f} positions/sec")
+        next_keys, next_values = keys, np.concatenate(values)
+    shards.reverse()
+    manifest = {
+        "board_size": board_size,
+        "win_length": win_length,
+        "positions": total,
+        "fields": ["key", "board", "to_move", "value", "move_values", "best_moves"],
+        "shards": shards,
+    }
+    _save_atomic(os.path.join(out_dir, "manifest.json"), lambda temporary: _write_json(temporary, manifest))
+    if progress is not None:
+        progress(f"Exported {total:,} positions in {len(shards)} shards in {time.perf_counter() - started:.1f}s")
+    return manifest
+
+
+def _write_json(path: str, data: dict) -> None:
+    with open(path, "w") as json_file:
+        json.dump(data, json_file, indent=1)
+
+
+def load_shards(out_dir: str):
+    """Yield the arrays of every shard of an exported dataset, one dict per shard, in manifest order."""
+    with open(os.path.join(out_dir, "manifest.json")) as json_file:
+        manifest = json.load(json_file)
+    for shard in manifest["shards"]:
+        with np.load(os.path.join(out_dir, shard["file"])) as arrays:
+            yield {name: arrays[name] for name in arrays.files}
+
+
+def main():
+    """Export a solved dataset from the command line"""
+    parser = argparse.ArgumentParser(description="Export every reachable position, solved, as NumPy shards.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--board-size", type=int, default=3)
+    parser.add_argument("--win-length", type=int, default=None)
+    parser.add_argument("--shard-size", type=int, default=100_000)
+    parser.add_argument("--compress", action="store_true", help="Write compressed shards")
+    args = parser.parse_args()
+    export_dataset(args.out_dir, args.board_size, args.win_length, args.shard_size, args.compress)
+
+if __name__ == "__main__":
+    main()
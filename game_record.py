@@ -0,0 +1,142 @@
+import mmap
+import os
+import struct
+from typing import NamedTuple
+
+#Every game is stored as this header followed by one byte per move, the cell index (row * board_size + col) in play order
+GAME_HEADER = struct.Struct("<BBBB")
+RESULT_TIE: int = 0
+RESULT_FIRST_PLAYER: int = 1
+RESULT_SECOND_PLAYER: int = 2
+#Cell indexes and the move count each fit in a byte, so a board's cells must be numbered 0 to 254
+MAX_CELLS: int = 255
+
+
+class GameRecord(NamedTuple):
+    board_size: int
+    win_length: int
+    result: int
+    moves: bytes
+
+    def cells(self) -> list:
+        """Return the (row, col) of every move in play order."""
+        return [divmod(cell, self.board_size) for cell in self.moves]
+
+
+def check_board_size(board_size: int) -> None:
+    """Raise a ValueError if games on a "board_size" board can't be recorded."""
+    if board_size * board_size > MAX_CELLS:
+        raise ValueError(f"Game records hold boards of up to {MAX_CELLS} cells, not {board_size}x{board_size}")
+
+
+class GameRecordWriter:
+    def __init__(self, path: str, buffer_size: int = 1 << 16, board_size: int = None) -> None:
+        """Appends finished games to a binary game record file, see "GAME_HEADER".
+        Attach it to games with "TicTacToeGame.recorder"; games are buffered and written whole, so several processes can append to the same file.
+
+        :param path: The file to append to, created if needed
+        :type path: str
+        :param buffer_size: The number of buffered bytes that triggers a write (Default value is "65536")
+        :type buffer_size: int
+        :param board_size: The board size of the games to be written, checked now rather than when a game overflows the record (Default value is "None")
+        :type board_size: int
+        """
+        if board_size is not None:
+            check_board_size(board_size)
+        self.path = path
+        self.buffer_size = buffer_size
+        self.games = 0
+        self._buffer = bytearray()
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def write_game(self, board_size: int, win_length: int, result: int, moves) -> None:
+        """Buffer one finished game.
+
+        :param result: "RESULT_TIE", "RESULT_FIRST_PLAYER" or "RESULT_SECOND_PLAYER"
+        :type result: int
+        :param moves: The cell index of every move in play order
+        :type moves: bytes
+        """
+        check_board_size(board_size)
+        self._buffer += GAME_HEADER.pack(board_size, win_length, result, len(moves))
+        self._buffer += moves
+        self.games += 1
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        view = memoryview(self._buffer)
+        while view:
+            written = os.write(self._fd, view)
+            view = view[written:]
+        view.release()
+        self._buffer.clear()
+
+    def close(self) -> None:
+        if self._fd is not None:
+            self.flush()
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class GameRecordReader:
+    def __init__(self, path: str) -> None:
+        """Memory maps a game record file and iterates its games without copying the file into memory."""
+        self.path = path
+        with open(path, "rb") as record_file:
+            size = os.fstat(record_file.fileno()).st_size
+            self._map = mmap.mmap(record_file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __iter__(self):
+        return self.games()
+
+    def games(self, offset: int = 0):
+        """Yield every "GameRecord" from byte "offset" (the start of a game) to the end of the file."""
+        data = self._map
+        end = len(data)
+        unpack_from = GAME_HEADER.unpack_from
+        header_size = GAME_HEADER.size
+        while offset + header_size <= end:
+            board_size, win_length, result, move_count = unpack_from(data, offset)
+            offset += header_size
+            yield GameRecord(board_size, win_length, result, data[offset:offset + move_count])
+            offset += move_count
+
+    def close(self) -> None:
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def replay(board, record: GameRecord, delay_ms: int = 300) -> None:
+    """Play a recorded game back on a "TicTacToeBoard", one move every "delay_ms" milliseconds.
+    Both seats are set to human for the replay so the cpu does not join in.
+    """
+    game = board._game
+    if (game.board_size, game.win_length) != (record.board_size, record.win_length):
+        raise ValueError(
+            f"The record is for a {record.board_size}x{record.board_size} board with {record.win_length} in a row"
+        )
+    board._logic.cancel()
+    game.set_cpu_player(0, False)
+    game.set_cpu_player(1, False)
+    board.vs_cpu_status = False
+    board.restart_game()
+    cells = record.cells()
+
+    def play_next(index):
+        if index < len(cells):
+            board.play_cell(*cells[index])
+            board.after(delay_ms, play_next, index + 1)
+    play_next(0)
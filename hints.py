@@ -0,0 +1,120 @@
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+from solver import AlphaBetaSolver, PERFECT_MAX_CELLS
+import solved_table
+
+#Solving from an early position of a bigger board takes too long to be worth waiting for
+HINT_MAX_CELLS: int = PERFECT_MAX_CELLS
+WIN: str = "win"
+DRAW: str = "draw"
+LOSS: str = "loss"
+
+
+class MoveHint(NamedTuple):
+    row: int
+    col: int
+    outcome: str
+    moves: int
+
+
+def hint_from_score(cell: int, score: int, remaining: int, board_size: int) -> MoveHint:
+    """Turn a solver score (see "AlphaBetaSolver") for playing "cell" into a "MoveHint".
+
+    :param remaining: The number of empty cells before the move
+    :type remaining: int
+    """
+    #A score is the number of empty cells left when the winning move is made, so it lands after remaining - |score| moves, counting both players
+    row, col = divmod(cell, board_size)
+    if score > 0:
+        return MoveHint(row, col, WIN, remaining - score + 1)
+    if score < 0:
+        return MoveHint(row, col, LOSS, remaining + score + 1)
+    return MoveHint(row, col, DRAW, remaining)
+
+
+class HintEngine:
+    def __init__(self, max_positions: int = 4096) -> None:
+        """Works out the game-theoretic value of every empty cell for the player to move, keeping the last "max_positions" positions' hints.
+
+        "compute" can take a while on 4x4 boards and is meant for a worker thread, with a copy of the game; "cached" is instant and safe to call from the UI thread.
+        Positions are keyed on the game's Zobrist hash, so a position reached again after "Play Again" or an undo is not solved again.
+
+        :param max_positions: The number of positions whose hints are kept (Default value is "4096")
+        :type max_positions: int
+        """
+        self.max_positions = max_positions
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._solvers = {}
+
+    @staticmethod
+    def supports(game) -> bool:
+        return game.board_size * game.board_size <= HINT_MAX_CELLS
+
+    @staticmethod
+    def key(game) -> tuple:
+        return game.board_size, game.win_length, game.zobrist_hash
+
+    def cached(self, game):
+        """Return the hints of the position if they were computed already, None otherwise."""
+        key = self.key(game)
+        with self._cache_lock:
+            hints = self._cache.get(key)
+            if hints is not None:
+                self._cache.move_to_end(key)
+        return hints
+
+    def solver(self, game) -> AlphaBetaSolver:
+        """Return the solver used for "game"'s board, kept between positions so its transposition table carries over."""
+        shape = (game.board_size, game.win_length)
+        solver = self._solvers.get(shape)
+        if solver is None:
+            solver = self._solvers[shape] = AlphaBetaSolver(game.board_size, game._winning_masks)
+        return solver
+
+    def cancel(self) -> None:
+        """Ask a "compute" running on another thread to stop, it raises "SearchCancelled"."""
+        for solver in self._solvers.values():
+            solver.cancel_requested = True
+
+    def compute(self, game) -> list:
+        """Return a "MoveHint" for every empty cell for the player to move, solving the position if it is not cached.
+
+        :param game: A game in play, on a board of up to "HINT_MAX_CELLS" cells
+        :type game: TicTacToeGame
+        """
+        hints = self.cached(game)
+        if hints is not None:
+            return hints
+        label = game.current_player.label
+        own = game._bitboards[label]
+        opp = next(board for other, board in game._bitboards.items() if other != label)
+        remaining = game.board_size * game.board_size - bin(own | opp).count("1")
+        solver = self.solver(game)
+        if game.board_size == game.win_length == solved_table.BOARD_SIZE:
+            values = self._table_values(solver, own, opp, remaining)
+        else:
+            solver.cancel_requested = False
+            values = solver.move_values(own, opp)
+        hints = [hint_from_score(cell, score, remaining, game.board_size) for cell, score in sorted(values.items())]
+        with self._cache_lock:
+            self._cache[self.key(game)] = hints
+            if len(self._cache) > self.max_positions:
+                self._cache.popitem(last=False)
+        return hints
+
+    def _table_values(self, solver, own: int, opp: int, remaining: int) -> dict:
+        #Every reply position of a 3x3 game is in the solved table, its score for the opponent is the negative of ours
+        table = solved_table.default_table()
+        values = {}
+        for cell in range(solved_table.CELLS):
+            bit = 1 << cell
+            if (own | opp) & bit:
+                continue
+            if solver._is_win(own | bit, cell):
+                values[cell] = remaining
+                continue
+            entry = table.lookup(opp, own | bit)
+            values[cell] = 0 if entry is None else -entry[1]
+        return values
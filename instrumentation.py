@@ -0,0 +1,130 @@
+import functools
+import json
+import os
+import time
+
+#The instruments in use, "None" while instrumentation is off so every hook costs a single global lookup
+active = None
+
+
+class Histogram:
+    __slots__ = ("buckets", "count", "total", "max")
+
+    def __init__(self) -> None:
+        """Latency histogram with one bucket per power of two microseconds."""
+        self.buckets = [0] * 32
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        micros = int(seconds * 1_000_000)
+        self.buckets[min(micros.bit_length(), 31)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction: float) -> float:
+        """Return the upper bound in seconds of the bucket holding the given fraction of the samples."""
+        target = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return (1 << bucket) / 1_000_000
+        return 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_us": self.total / self.count * 1_000_000 if self.count else 0.0,
+            "p50_us": self.percentile(0.5) * 1_000_000,
+            "p90_us": self.percentile(0.9) * 1_000_000,
+            "p99_us": self.percentile(0.99) * 1_000_000,
+            "max_us": self.max * 1_000_000,
+            "buckets_us": {str(1 << bucket): count for bucket, count in enumerate(self.buckets) if count},
+        }
+
+
+class Instruments:
+    def __init__(self, snapshot_path: str = None, callback=None, interval: float = 10.0) -> None:
+        """Timing histograms per stage and event counters, exported as a snapshot every "interval" seconds.
+
+        :param snapshot_path: A JSON file rewritten with every snapshot (Default value is "None")
+        :type snapshot_path: str
+        :param callback: Called with every snapshot dict (Default value is "None")
+        :param interval: The number of seconds between two snapshots (Default value is "10.0")
+        :type interval: float
+        """
+        self.snapshot_path = snapshot_path
+        self.callback = callback
+        self.interval = interval
+        self.timings = {}
+        self.counters = {}
+        self.started = time.time()
+        self._next_export = time.monotonic() + interval
+
+    def record(self, stage: str, seconds: float) -> None:
+        histogram = self.timings.get(stage)
+        if histogram is None:
+            histogram = self.timings[stage] = Histogram()
+        histogram.record(seconds)
+        if time.monotonic() >= self._next_export:
+            self.export()
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def snapshot(self) -> dict:
+        return {
+            "started": self.started,
+            "time": time.time(),
+            "timings": {stage: histogram.snapshot() for stage, histogram in self.timings.items()},
+            "counters": dict(self.counters),
+        }
+
+    def export(self) -> dict:
+        """Hand a snapshot to the callback and/or write it to "snapshot_path", and return it."""
+        self._next_export = time.monotonic() + self.interval
+        snapshot = self.snapshot()
+        if self.callback is not None:
+            self.callback(snapshot)
+        if self.snapshot_path is not None:
+            temporary_path = f"{self.snapshot_path}.tmp"
+            with open(temporary_path, "w") as snapshot_file:
+                json.dump(snapshot, snapshot_file, indent=2)
+            os.replace(temporary_path, self.snapshot_path)
+        return snapshot
+
+
+def enable(snapshot_path: str = None, callback=None, interval: float = 10.0) -> Instruments:
+    """Turn instrumentation on with fresh instruments and return them (see "Instruments")."""
+    global active
+    active = Instruments(snapshot_path, callback, interval)
+    return active
+
+
+def disable() -> None:
+    """Turn instrumentation off, exporting a last snapshot first."""
+    global active
+    if active is not None:
+        active.export()
+    active = None
+
+
+def timed(stage: str):
+    """Decorator recording the run time of every call in the "stage" histogram while instrumentation is on."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            instruments = active
+            if instruments is None:
+                return function(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                instruments.record(stage, time.perf_counter() - started)
+        return wrapper
+    return decorator
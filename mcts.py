@@ -0,0 +1,221 @@
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from tic_tac_toe import get_line_tables
+from solver import BitboardLines
+
+
+class MctsNode:
+    __slots__ = ("own", "opp", "cell", "parent", "children", "untried", "visits", "wins", "result")
+
+    def __init__(self, own: int, opp: int, cell, parent, untried: list, result) -> None:
+        """One position of the search tree, "own" being the bitboard of the player to move.
+        "wins" counts from the point of view of the player who moved into the node (1 per win, 0.5 per draw) and "result" is set to 1 (that player won) or 0.5 (draw) when the game is over.
+        """
+        self.own = own
+        self.opp = opp
+        self.cell = cell
+        self.parent = parent
+        self.children = []
+        self.untried = untried
+        self.visits = 0
+        self.wins = 0.0
+        self.result = result
+
+
+class MctsTree(BitboardLines):
+    def __init__(self, board_size: int, win_length: int, exploration: float = 1.4, rng=random) -> None:
+        """A UCT search tree that keeps the subtree of the position it is moved to, so the work done on earlier moves is reused.
+
+        :param board_size: The number of rows (and columns) of the board
+        :type board_size: int
+        :param win_length: The number of marks in a row needed to win
+        :type win_length: int
+        :param exploration: The UCT exploration constant (Default value is "1.4")
+        :type exploration: float
+        :param rng: The random number generator for expansions and playouts (Default value is the "random" module)
+        :type rng: random.Random
+        """
+        super().__init__(board_size, get_line_tables(board_size, win_length).masks)
+        self.win_length = win_length
+        self.exploration = exploration
+        self._rng = rng
+        self.root = None
+        self.cancel_requested = False
+
+    def _new_node(self, own: int, opp: int, cell, parent, result) -> MctsNode:
+        untried = []
+        if result is None:
+            occupied = own | opp
+            untried = [empty for empty in range(self._cells) if not occupied >> empty & 1]
+            self._rng.shuffle(untried)
+            if not untried:
+                result = 0.5
+        return MctsNode(own, opp, cell, parent, untried, result)
+
+    def set_position(self, own: int, opp: int) -> None:
+        """Move the root to the position with "own" to move, reusing the current root, one of its children or grandchildren when one matches."""
+        candidates = []
+        if self.root is not None:
+            candidates.append(self.root)
+            for child in self.root.children:
+                candidates.append(child)
+                candidates.extend(child.children)
+        for node in candidates:
+            if node.own == own and node.opp == opp:
+                node.parent = None
+                self.root = node
+                return
+        self.root = self._new_node(own, opp, None, None, None)
+
+    def _select_child(self, node: MctsNode) -> MctsNode:
+        log_visits = math.log(node.visits)
+        best, best_score = None, -1.0
+        for child in node.children:
+            score = child.wins / child.visits + self.exploration * math.sqrt(log_visits / child.visits)
+            if score > best_score:
+                best, best_score = child, score
+        return best
+
+    def _rollout(self, node: MctsNode) -> float:
+        #Play random moves to the end and score the game for the player who moved into "node"
+        if node.result is not None:
+            return node.result
+        own, opp = node.own, node.opp
+        moves = list(node.untried)
+        self._rng.shuffle(moves)
+        opponent_turn = True
+        for cell in moves:
+            own |= 1 << cell
+            if self._is_win(own, cell):
+                return 0.0 if opponent_turn else 1.0
+            own, opp = opp, own
+            opponent_turn = not opponent_turn
+        return 0.5
+
+    def playout(self) -> None:
+        """Run one select, expand, rollout and backpropagate step from the root."""
+        node = self.root
+        while not node.untried and node.children:
+            node = self._select_child(node)
+        if node.untried:
+            cell = node.untried.pop()
+            own = node.own | 1 << cell
+            result = 1.0 if self._is_win(own, cell) else None
+            child = self._new_node(node.opp, own, cell, node, result)
+            node.children.append(child)
+            node = child
+        result = self._rollout(node)
+        while node is not None:
+            node.visits += 1
+            node.wins += result
+            result = 1.0 - result
+            node = node.parent
+
+    def search(self, playouts: int = None, deadline: float = None) -> dict:
+        """Run playouts from the root until "playouts" are done or "time.time()" passes "deadline", whichever comes first.
+        Returns the {cell: (visits, wins)} of the root's children.
+        """
+        done = 0
+        while (playouts is None or done < playouts) and (deadline is None or time.time() < deadline):
+            if self.root.result is not None or self.cancel_requested:
+                break
+            self.playout()
+            done += 1
+        return {child.cell: (child.visits, child.wins) for child in self.root.children}
+
+
+_worker_tree = None
+
+
+def _worker_search(task) -> tuple:
+    #Runs in a worker process, keeping one tree per process so each worker reuses its own subtree between moves
+    global _worker_tree
+    board_size, win_length, exploration, seed, own, opp, playouts, deadline = task
+    if _worker_tree is None or (_worker_tree.board_size, _worker_tree.win_length, _worker_tree.exploration) != (board_size, win_length, exploration):
+        _worker_tree = MctsTree(board_size, win_length, exploration, random.Random(f"{seed}-{os.getpid()}"))
+    _worker_tree.set_position(own, opp)
+    return os.getpid(), _worker_tree.search(playouts, deadline)
+
+
+class MctsSearch:
+    def __init__(self, board_size: int, win_length: int = None, playouts: int = 2000, time_budget: float = None, workers: int = 1, exploration: float = 1.4, seed=None) -> None:
+        """Monte Carlo Tree Search (UCT) player for boards too large to solve, with a fixed number of playouts and/or a time budget per move.
+        With more than one worker every worker process grows its own tree (root parallelization) and the root visit counts are summed to pick the move.
+
+        :param board_size: The number of rows (and columns) of the board
+        :type board_size: int
+        :param win_length: The number of marks in a row needed to win (Default value is "None", meaning the whole board width)
+        :type win_length: int
+        :param playouts: The number of playouts per move, split between the workers, or "None" to only use "time_budget" (Default value is "2000")
+        :type playouts: int
+        :param time_budget: The number of seconds a move may take, or "None" for no limit (Default value is "None")
+        :type time_budget: float
+        :param workers: The number of worker processes, 1 searching in this process (Default value is "1")
+        :type workers: int
+        :param exploration: The UCT exploration constant (Default value is "1.4")
+        :type exploration: float
+        :param seed: The seed of the random streams (Default value is "None")
+        """
+        if playouts is None and time_budget is None:
+            raise ValueError("MctsSearch needs a number of playouts, a time budget or both")
+        self.board_size = board_size
+        self.win_length = win_length or board_size
+        self.playouts = playouts
+        self.time_budget = time_budget
+        self.workers = workers
+        self.exploration = exploration
+        self.seed = seed
+        self._tree = MctsTree(board_size, self.win_length, exploration, random.Random(seed))
+        self._executor = None
+
+    def _root_stats(self, own: int, opp: int) -> dict:
+        deadline = None if self.time_budget is None else time.time() + self.time_budget
+        if self.workers <= 1:
+            self._tree.set_position(own, opp)
+            return self._tree.search(self.playouts, deadline)
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.workers)
+        playouts = None if self.playouts is None else -(-self.playouts // self.workers)
+        task = (self.board_size, self.win_length, self.exploration, self.seed, own, opp, playouts, deadline)
+        #Workers may pick up more than one task, keep the latest stats of every process so none is counted twice
+        latest = dict(self._executor.map(_worker_search, [task] * self.workers))
+        stats = {}
+        for worker_stats in latest.values():
+            for cell, (visits, wins) in worker_stats.items():
+                total_visits, total_wins = stats.get(cell, (0, 0.0))
+                stats[cell] = (total_visits + visits, total_wins + wins)
+        return stats
+
+    def best_move(self, own: int, opp: int) -> tuple:
+        """Return the (row, col) the player to move ("own") should play, the most visited root move."""
+        stats = self._root_stats(own, opp)
+        #An immediate win is always taken and an immediate loss blocked, even if the search had no time to visit them much
+        tree = self._tree
+        occupied = own | opp
+        for board in (own, opp):
+            for cell in range(tree._cells):
+                if not occupied >> cell & 1 and tree._is_win(board | 1 << cell, cell):
+                    return divmod(cell, self.board_size)
+        if not stats:
+            empty = [cell for cell in range(tree._cells) if not occupied >> cell & 1]
+            return divmod(tree._rng.choice(empty), self.board_size)
+        cell = max(stats, key=lambda cell: stats[cell][0])
+        return divmod(cell, self.board_size)
+
+    @property
+    def cancel_requested(self) -> bool:
+        """Set to True from another thread to stop the search running in this process after the current playout."""
+        return self._tree.cancel_requested
+
+    @cancel_requested.setter
+    def cancel_requested(self, value: bool) -> None:
+        self._tree.cancel_requested = value
+
+    def close(self) -> None:
+        """Shut down the worker processes, if any were started."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -0,0 +1,443 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from tic_tac_toe import TicTacToeGame, TicTacToeCpuEngine, Move
+import broadcast
+import instrumentation
+import solved_table
+
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT: int = 8765
+#The engines the server can run on its event loop, the slower searches are left to the GUI and simulate.py
+CPU_STRATEGIES = {
+    "easy": lambda rng: TicTacToeCpuEngine(None, hard_mode=False, rng=rng),
+    "hard": lambda rng: TicTacToeCpuEngine(None, hard_mode=True, rng=rng),
+    "perfect": lambda rng: TicTacToeCpuEngine(None, perfect_mode=True, rng=rng),
+}
+#Perfect play picks its moves on the event loop, so it is only offered on 3x3 boards where they are looked up in the solved table
+#A cold solve of an empty 4x4 board takes a fifth of a second, stalling every session
+MAX_PERFECT_CELLS: int = solved_table.CELLS
+MAX_BOARD_SIZE: int = 15
+#A client that stops reading is disconnected once this many bytes wait to be sent to it
+MAX_WRITE_BUFFER: int = 1 << 20
+
+
+class Session:
+    __slots__ = ("id", "game", "strategy", "seats", "cpu_seat", "last_active", "cpu_queued")
+
+    def __init__(self, session_id: int, game, strategy, cpu_seat) -> None:
+        """One game hosted by "GameServer", "seats" holding the writer of the connection playing each seat (None for the cpu or a free seat)."""
+        self.id = session_id
+        self.game = game
+        self.strategy = strategy
+        self.seats = [None, None]
+        self.cpu_seat = cpu_seat
+        self.last_active = time.monotonic()
+        self.cpu_queued = False
+
+    def seat_to_move(self) -> int:
+        return 0 if self.game.current_player.label == self.game.players_list[0].label else 1
+
+    def is_over(self) -> bool:
+        return self.game.has_winner() or self.game.is_tied()
+
+    def state(self) -> dict:
+        game = self.game
+        result = None
+        if game.has_winner():
+            result = game.current_player.label
+        elif game.is_tied():
+            result = "tie"
+        return {
+            "op": "state",
+            "session": self.id,
+            "board": game.board_string(),
+            "turn": None if result else game.current_player.label,
+            "result": result,
+        }
+
+
+class GameServer:
+    def __init__(self, idle_timeout: float = 300.0, max_batch: int = 512, seed=None, hub=None) -> None:
+        """Hosts any number of games for clients speaking JSON lines over TCP or a Unix socket, without a Tk window.
+
+        Requests are JSON objects, one per line, answered with "state" messages (or "error"):
+        {"op": "new", "board_size": 3, "win_length": 3, "cpu": "hard", "seat": 0} starts a game, "cpu" being one of "CPU_STRATEGIES" or null for a human opponent joining later, and "seat" the seat of the requesting player (0 plays first),
+        {"op": "join", "session": id} takes the free seat of a human vs human game,
+        {"op": "move", "session": id, "row": r, "col": c}, {"op": "restart", "session": id} and {"op": "leave", "session": id}.
+
+        Cpu turns are queued and played in batches between reads, and sessions idle for "idle_timeout" seconds are closed.
+
+        :param idle_timeout: The number of seconds without a request after which a session is closed (Default value is "300.0")
+        :type idle_timeout: float
+        :param max_batch: The number of cpu moves played before the event loop gets a chance to serve reads (Default value is "512")
+        :type max_batch: int
+        :param seed: The seed of the cpu engines' random stream (Default value is "None")
+        :param hub: Where every session is published for spectators under its session id, running on the same event loop (Default value is "None")
+        :type hub: BroadcastHub
+        """
+        self.idle_timeout = idle_timeout
+        self.max_batch = max_batch
+        self.sessions = {}
+        self.server = None
+        self._rng = random.Random(seed)
+        self._engines = {}
+        self._connections = {}
+        self._next_id = 1
+        self._cpu_queue = []
+        self._cpu_ready = None
+        self._tasks = []
+        self._outgoing = {}
+        self.hub = hub
+
+    async def start(self, host: str = SERVER_HOST, port: int = SERVER_PORT, unix_path: str = None):
+        """Start listening on "unix_path" if given, otherwise on "host"/"port", and return the asyncio server."""
+        #Mapped (and built if missing) on a worker thread before any client connects, rather than on the loop by the first perfect game
+        await asyncio.get_running_loop().run_in_executor(None, solved_table.default_table().load)
+        if unix_path:
+            self.server = await asyncio.start_unix_server(self._serve, unix_path)
+        else:
+            self.server = await asyncio.start_server(self._serve, host, port)
+        self._cpu_ready = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._play_cpu_turns()),
+            asyncio.create_task(self._close_idle_sessions()),
+        ]
+        return self.server
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self.server.close()
+        for writer in list(self._connections):
+            writer.close()
+        await self.server.wait_closed()
+
+    def _engine(self, session: Session):
+        #One engine per strategy and board shape, pointed at the session's game before every move so solvers keep their tables
+        game = session.game
+        key = (session.strategy, game.board_size, game.win_length)
+        engine = self._engines.get(key)
+        if engine is None:
+            engine = self._engines[key] = CPU_STRATEGIES[session.strategy](self._rng)
+        engine._game = game
+        return engine
+
+    def _send(self, writer, message: dict) -> None:
+        #Messages are gathered per connection and written once per event loop iteration, one send call for many games
+        pending = self._outgoing.get(writer)
+        if pending is None:
+            if not self._outgoing:
+                asyncio.get_running_loop().call_soon(self._flush)
+            pending = self._outgoing[writer] = []
+        pending.append(json.dumps(message, separators=(",", ":")))
+
+    def _flush(self) -> None:
+        outgoing, self._outgoing = self._outgoing, {}
+        for writer, messages in outgoing.items():
+            if writer.is_closing():
+                continue
+            messages.append("")
+            writer.write("\n".join(messages).encode())
+            if writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+                writer.close()
+
+    def _publish(self, session: Session) -> None:
+        if self.hub is not None:
+            self.hub.publish_snapshot(session.id, **broadcast.game_state(session.game))
+
+    def _broadcast(self, session: Session) -> None:
+        state = session.state()
+        for writer in session.seats:
+            if writer is not None:
+                self._send(writer, state)
+
+    def _queue_cpu_turn(self, session: Session) -> None:
+        if session.cpu_seat is None or session.cpu_queued or session.is_over():
+            return
+        if session.seat_to_move() != session.cpu_seat:
+            return
+        session.cpu_queued = True
+        self._cpu_queue.append(session)
+        self._cpu_ready.set()
+
+    async def _play_cpu_turns(self) -> None:
+        while True:
+            await self._cpu_ready.wait()
+            self._cpu_ready.clear()
+            while self._cpu_queue:
+                batch = self._cpu_queue[:self.max_batch]
+                del self._cpu_queue[:self.max_batch]
+                instruments = instrumentation.active
+                started = time.perf_counter()
+                for session in batch:
+                    session.cpu_queued = False
+                    if session.id not in self.sessions or session.is_over() or session.seat_to_move() != session.cpu_seat:
+                        continue
+                    row, col = self._engine(session).select_move()
+                    self._play(session, row, col)
+                if instruments is not None:
+                    instruments.record("server_cpu_batch", time.perf_counter() - started)
+                    instruments.count("server_cpu_moves", len(batch))
+                await asyncio.sleep(0)
+
+    async def _close_idle_sessions(self) -> None:
+        while True:
+            await asyncio.sleep(self.idle_timeout / 4)
+            cutoff = time.monotonic() - self.idle_timeout
+            for session in [session for session in self.sessions.values() if session.last_active < cutoff]:
+                self._close_session(session, "idle")
+
+    def _close_session(self, session: Session, reason: str) -> None:
+        del self.sessions[session.id]
+        if self.hub is not None:
+            self.hub.end_game(session.id)
+        for writer in session.seats:
+            if writer is not None:
+                #The writer's connection may be gone already, when it closed the session by disconnecting
+                session_ids = self._connections.get(writer)
+                if session_ids is not None:
+                    session_ids.discard(session.id)
+                self._send(writer, {"op": "closed", "session": session.id, "reason": reason})
+
+    def _play(self, session: Session, row: int, col: int) -> None:
+        game = session.game
+        move = Move(row, col, game.current_player.label)
+        game.process_move(move)
+        over = session.is_over()
+        if not over:
+            game.toggle_player()
+        if self.hub is not None:
+            self.hub.publish_move(session.id, **broadcast.move_state(game, move))
+        if not over and session.seat_to_move() == session.cpu_seat:
+            #The player hears about their move along with the cpu's reply
+            return
+        self._broadcast(session)
+
+    def _new_session(self, writer, request: dict) -> Session:
+        board_size = int(request.get("board_size", 3))
+        win_length = request.get("win_length")
+        strategy = request.get("cpu")
+        seat = int(request.get("seat", 0))
+        if not 1 <= board_size <= MAX_BOARD_SIZE:
+            raise ValueError(f"board_size must be between 1 and {MAX_BOARD_SIZE}")
+        if seat not in (0, 1):
+            raise ValueError("seat must be 0 or 1")
+        if strategy is not None and strategy not in CPU_STRATEGIES:
+            raise ValueError(f"cpu must be one of {', '.join(CPU_STRATEGIES)} or null")
+        if strategy == "perfect" and board_size * board_size > MAX_PERFECT_CELLS:
+            raise ValueError(f"perfect play is limited to boards of up to {MAX_PERFECT_CELLS} cells")
+        game = TicTacToeGame(board_size=board_size, win_length=None if win_length is None else int(win_length))
+        cpu_seat = None
+        if strategy is not None:
+            cpu_seat = 1 - seat
+            game.set_cpu_player(cpu_seat, True)
+        game.set_players(game.players_list)
+        session = Session(self._next_id, game, strategy, cpu_seat)
+        self._next_id += 1
+        session.seats[seat] = writer
+        self.sessions[session.id] = session
+        return session
+
+    def _session_of(self, writer, request: dict) -> Session:
+        session = self.sessions.get(request.get("session"))
+        if session is None or writer not in session.seats:
+            raise ValueError("unknown session")
+        return session
+
+    def _handle(self, writer, request: dict) -> None:
+        op = request.get("op")
+        if op == "new":
+            session = self._new_session(writer, request)
+            self._connections[writer].add(session.id)
+            self._send(writer, {"op": "joined", "session": session.id, "seat": session.seats.index(writer)})
+            self._publish(session)
+            self._broadcast(session)
+            self._queue_cpu_turn(session)
+            return
+        if op == "join":
+            session = self.sessions.get(request.get("session"))
+            if session is None or session.cpu_seat is not None or None not in session.seats:
+                raise ValueError("no free seat in this session")
+            if writer in session.seats:
+                raise ValueError("already playing in this session")
+            seat = session.seats.index(None)
+            session.seats[seat] = writer
+            session.last_active = time.monotonic()
+            self._connections[writer].add(session.id)
+            self._send(writer, {"op": "joined", "session": session.id, "seat": seat})
+            self._broadcast(session)
+            return
+        session = self._session_of(writer, request)
+        session.last_active = time.monotonic()
+        if op == "move":
+            if session.seats[session.seat_to_move()] is not writer or session.seat_to_move() == session.cpu_seat:
+                raise ValueError("not your turn")
+            row, col = int(request["row"]), int(request["col"])
+            size = session.game.board_size
+            if not (0 <= row < size and 0 <= col < size and session.game.is_valid_move(Move(row, col))):
+                raise ValueError("invalid move")
+            self._play(session, row, col)
+            self._queue_cpu_turn(session)
+        elif op == "restart":
+            session.game.clear_board()
+            session.game.set_players(session.game.players_list)
+            self._publish(session)
+            self._broadcast(session)
+            self._queue_cpu_turn(session)
+        elif op == "leave":
+            self._close_session(session, "left")
+        else:
+            raise ValueError(f"unknown op {op!r}")
+
+    async def _serve(self, reader, writer) -> None:
+        self._connections[writer] = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                instruments = instrumentation.active
+                started = time.perf_counter()
+                try:
+                    request = json.loads(line)
+                    self._handle(writer, request)
+                except (ValueError, KeyError, TypeError, AttributeError) as error:
+                    self._send(writer, {"op": "error", "message": str(error)})
+                if instruments is not None:
+                    instruments.record("server_request", time.perf_counter() - started)
+        except ConnectionError:
+            pass
+        finally:
+            for session_id in self._connections.pop(writer):
+                session = self.sessions.get(session_id)
+                if session is not None:
+                    session.seats = [None if seat is writer else seat for seat in session.seats]
+                    self._close_session(session, "opponent left")
+            writer.close()
+
+
+async def _load_connection(address, sessions: int, deadline: float, board_size: int, cpu: str, think: float, latencies: list, seed) -> int:
+    #Plays "sessions" games at once over one connection, picking random moves after "think" seconds on average, and appends the latency of every move to "latencies"
+    rng = random.Random(seed)
+    if isinstance(address, str):
+        reader, writer = await asyncio.open_unix_connection(address)
+    else:
+        reader, writer = await asyncio.open_connection(*address)
+    new_game = json.dumps({"op": "new", "board_size": board_size, "cpu": cpu, "seat": 0}).encode() + b"\n"
+    labels = {}
+    sent = {}
+    games = 0
+    pending = b""
+    loop = asyncio.get_running_loop()
+
+    def send_move(session_id, row, col):
+        if not writer.is_closing():
+            sent[session_id] = time.perf_counter()
+            writer.write(json.dumps({"op": "move", "session": session_id, "row": row, "col": col}).encode() + b"\n")
+
+    writer.write(new_game * sessions)
+    while time.monotonic() < deadline:
+        chunk = await reader.read(1 << 16)
+        if not chunk:
+            break
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        replies = []
+        for line in lines:
+            message = json.loads(line)
+            session_id = message.get("session")
+            if message["op"] == "joined":
+                labels[session_id] = "XO"[message["seat"]]
+                continue
+            if message["op"] != "state":
+                continue
+            if message["result"] is None and message["turn"] != labels[session_id]:
+                continue
+            if session_id in sent:
+                latencies.append(time.perf_counter() - sent.pop(session_id))
+            if message["result"] is not None:
+                games += 1
+                replies.append({"op": "restart", "session": session_id})
+                continue
+            empty = [cell for cell, label in enumerate(message["board"]) if label == "."]
+            row, col = divmod(rng.choice(empty), board_size)
+            if think:
+                loop.call_later(rng.uniform(0, 2 * think), send_move, session_id, row, col)
+                continue
+            sent[session_id] = time.perf_counter()
+            replies.append({"op": "move", "session": session_id, "row": row, "col": col})
+        if replies:
+            writer.write("".join(json.dumps(reply, separators=(",", ":")) + "\n" for reply in replies).encode())
+    writer.close()
+    return games
+
+
+async def load_test(address, connections: int, sessions: int, duration: float, board_size: int = 3, cpu: str = "hard", think: float = 0.0, seed=0) -> None:
+    """Play "connections" x "sessions" concurrent games against a running server for "duration" seconds and print the move latencies.
+
+    :param address: The (host, port) of the server, or the path of its Unix socket
+    :param connections: The number of client connections
+    :type connections: int
+    :param sessions: The number of games played at once over every connection
+    :type sessions: int
+    :param think: The average number of seconds a player waits before moving, 0 to answer every state at once (Default value is "0.0")
+    :type think: float
+    """
+    latencies = []
+    deadline = time.monotonic() + duration
+    started = time.perf_counter()
+    games = await asyncio.gather(*(
+        _load_connection(address, sessions, deadline, board_size, cpu, think, latencies, f"{seed}-{index}")
+        for index in range(connections)
+    ))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    if not latencies:
+        print("No moves were answered")
+        return
+
+    def percentile(fraction):
+        return latencies[min(int(fraction * len(latencies)), len(latencies) - 1)] * 1000
+
+    print(f"{connections * sessions} sessions, {sum(games)} games, {len(latencies)} moves in {elapsed:.2f}s: {len(latencies) / elapsed:,.0f} moves/sec")
+    print(f"Move latency p50 {percentile(0.5):.2f}ms  p90 {percentile(0.9):.2f}ms  p99 {percentile(0.99):.2f}ms  max {latencies[-1] * 1000:.2f}ms")
+
+
+def main():
+    """Run the game server, or the load generator against one, from the command line"""
+    parser = argparse.ArgumentParser(description="Host many tic tac toe games over JSON lines.")
+    parser.add_argument("mode", choices=("serve", "load"))
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--unix", help="Listen on (or connect to) this Unix socket instead of TCP")
+    parser.add_argument("--idle-timeout", type=float, default=300.0)
+    parser.add_argument("--connections", type=int, default=100, help="Load generator connections")
+    parser.add_argument("--sessions", type=int, default=100, help="Load generator games per connection")
+    parser.add_argument("--duration", type=float, default=10.0, help="Load generator run time in seconds")
+    parser.add_argument("--board-size", type=int, default=3)
+    parser.add_argument("--cpu", choices=CPU_STRATEGIES, default="hard")
+    parser.add_argument("--think", type=float, default=1.0, help="Load generator average seconds between a state and the next move")
+    parser.add_argument("--broadcast-port", type=int, help="Publish every session for spectators on this port, see broadcast.py")
+    args = parser.parse_args()
+    if args.mode == "load":
+        address = args.unix or (args.host, args.port)
+        asyncio.run(load_test(address, args.connections, args.sessions, args.duration, args.board_size, args.cpu, args.think))
+        return
+
+    async def serve():
+        hub = None
+        if args.broadcast_port:
+            hub = broadcast.BroadcastHub()
+            await hub.start(args.host, args.broadcast_port)
+            print(f"Broadcasting on {args.host}:{args.broadcast_port}")
+        server = GameServer(args.idle_timeout, hub=hub)
+        await server.start(args.host, args.port, args.unix)
+        print(f"Serving on {args.unix or f'{args.host}:{args.port}'}")
+        await server.server.serve_forever()
+    asyncio.run(serve())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import argparse
+import os
+import random
+import time
+from multiprocessing import Pool
+from tic_tac_toe import TicTacToeGame, TicTacToeCpuEngine, Move
+from mcts import MctsSearch
+from game_record import GameRecordWriter, check_board_size
+
+STRATEGIES = {
+    "easy": lambda game, rng: TicTacToeCpuEngine(game, hard_mode=False, rng=rng),
+    "hard": lambda game, rng: TicTacToeCpuEngine(game, hard_mode=True, rng=rng),
+    "perfect": lambda game, rng: TicTacToeCpuEngine(game, perfect_mode=True, rng=rng),
+    "anytime": lambda game, rng: TicTacToeCpuEngine(game, rng=rng, difficulty=4),
+    "mcts": lambda game, rng: TicTacToeCpuEngine(game, rng=rng, searcher=MctsSearch(
+        game.board_size, game.win_length, playouts=1000, seed=rng.random(),
+    )),
+}
+
+
+def play_game(game, engines) -> int:
+    """Play one cpu vs cpu game to the end, each seat moving with its own engine.
+    Returns the index of the winning seat, or -1 for a tie.
+
+    :param game: A game with both players set as cpu
+    :type game: TicTacToeGame
+    :param engines: One "TicTacToeCpuEngine" per seat, in turn order
+    :type engines: list
+    """
+    game.clear_board()
+    game.set_players(game.players_list)
+    seat = 0
+    while True:
+        row, col = engines[seat].select_move()
+        game.process_move(Move(row, col, game.current_player.label))
+        if game.has_winner():
+            return seat
+        if game.is_tied():
+            return -1
+        game.toggle_player()
+        seat = 1 - seat
+
+
+def play_batch(task) -> tuple:
+    """Play a batch of games in a worker process with its own seeded random stream.
+    Returns the batch's [first seat wins, second seat wins, ties] counts and the number of moves played.
+
+    :param task: A (seed, games, board_size, win_length, first, second, record_path) tuple, "record_path" being a game record file to append the games to or None
+    :type task: tuple
+    """
+    seed, games, board_size, win_length, first, second, record_path = task
+    rng = random.Random(seed)
+    game = TicTacToeGame(board_size=board_size, win_length=win_length)
+    game.set_cpu_player(0, True)
+    game.set_cpu_player(1, True)
+    engines = [
+        STRATEGIES[first](game, rng),
+        STRATEGIES[second](game, rng),
+    ]
+    if record_path is not None:
+        game.recorder = GameRecordWriter(record_path, board_size=board_size)
+    results = [0, 0, 0]
+    moves = 0
+    for _ in range(games):
+        results[play_game(game, engines)] += 1
+        moves += bin(game._occupied).count("1")
+    if game.recorder is not None:
+        game.recorder.close()
+    return results, moves
+
+
+def simulate(games, first, second, board_size=3, win_length=None, workers=None, seed=0, batch_size=1000, record_path=None) -> tuple:
+    """Play "games" cpu vs cpu games split in batches over a process pool.
+    Every batch gets its own random stream derived from "seed", so a run is reproducible for a given seed and batch size whatever the number of workers.
+    Returns the [first seat wins, second seat wins, ties] counts, the number of moves played and the elapsed seconds.
+
+    :param games: The number of games to play
+    :type games: int
+    :param first: The strategy of the first seat, one of "STRATEGIES"
+    :type first: str
+    :param second: The strategy of the second seat, one of "STRATEGIES"
+    :type second: str
+    :param workers: The number of worker processes (Default value is "None", meaning one per core)
+    :type workers: int
+    :param seed: The seed all the batch random streams derive from (Default value is "0")
+    :type seed: int
+    :param batch_size: The number of games a worker plays before reporting back (Default value is "1000")
+    :type batch_size: int
+    :param record_path: A game record file every game is appended to, see "game_record" (Default value is "None")
+    :type record_path: str
+    """
+    if record_path is not None:
+        #Checked before starting the pool rather than in every worker
+        check_board_size(board_size)
+    tasks = []
+    for batch, start in enumerate(range(0, games, batch_size)):
+        tasks.append((f"{seed}-{batch}", min(batch_size, games - start), board_size, win_length, first, second, record_path))
+    results = [0, 0, 0]
+    moves = 0
+    started = time.perf_counter()
+    with Pool(workers) as pool:
+        for batch_results, batch_moves in pool.imap_unordered(play_batch, tasks):
+            for index, count in enumerate(batch_results):
+                results[index] += count
+            moves += batch_moves
+    return results, moves, time.perf_counter() - started
+
+
+def print_report(results, moves, elapsed, first, second) -> None:
+    games = sum(results)
+    first_wins, second_wins, ties = results
+    print(f"{games} games in {elapsed:.2f}s: {games / elapsed:,.0f} games/sec, {moves / elapsed:,.0f} moves/sec")
+    print(f"{'Seat':<6}{'Strategy':<10}{'Wins':>18}{'Draws':>18}{'Losses':>18}")
+    for seat, strategy, wins, losses in (("X", first, first_wins, second_wins), ("O", second, second_wins, first_wins)):
+        cells = "".join(f"{count:>10} ({count / games:>5.1%})" for count in (wins, ties, losses))
+        print(f"{seat:<6}{strategy:<10}{cells}")
+
+
+def main():
+    """Run cpu vs cpu self-play from the command line and print the results"""
+    parser = argparse.ArgumentParser(description="Headless cpu vs cpu self-play over a process pool.")
+    parser.add_argument("--games", type=int, default=100_000)
+    parser.add_argument("--first", choices=STRATEGIES, default="hard")
+    parser.add_argument("--second", choices=STRATEGIES, default="easy")
+    parser.add_argument("--board-size", type=int, default=3)
+    parser.add_argument("--win-length", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--record", help="Append every game to this binary game record file")
+    args = parser.parse_args()
+    results, moves, elapsed = simulate(
+        args.games, args.first, args.second, args.board_size, args.win_length,
+        args.workers, args.seed, args.batch_size, args.record,
+    )
+    print_report(results, moves, elapsed, args.first, args.second)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import mmap
+import os
+import struct
+import sys
+from solver import AlphaBetaSolver
+
+BOARD_SIZE: int = 3
+CELLS: int = BOARD_SIZE * BOARD_SIZE
+MAGIC = b"TTTS"
+VERSION: int = 1
+HEADER = struct.Struct("<4sBBH")
+ENTRY = struct.Struct("<HbB")
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "solved_3x3.bin")
+
+#Base 3 weight of every bitboard, so a position's index is _BASE3[own] + 2 * _BASE3[opp]
+_BASE3 = [
+    sum(3 ** cell for cell in range(CELLS) if mask >> cell & 1)
+    for mask in range(1 << CELLS)
+]
+
+
+def position_index(own: int, opp: int) -> int:
+    """Return the table index of a position, "own" being the bitboard of the player to move."""
+    return _BASE3[own] + 2 * _BASE3[opp]
+
+
+def build_table(path: str = DEFAULT_PATH) -> int:
+    """Enumerate every position reachable under "TicTacToeGame" rules, solve it and write the value and best moves of each one to "path".
+
+    Every entry holds a bitmask of the best cells, the score for the player to move (see "AlphaBetaSolver") and a flag telling if the position is reachable and still in play.
+    Returns the number of positions written.
+
+    :param path: Where to write the table (Default value is "DEFAULT_PATH")
+    :type path: str
+    """
+    from tic_tac_toe import TicTacToeGame
+
+    game = TicTacToeGame(board_size=BOARD_SIZE)
+    solver = AlphaBetaSolver(BOARD_SIZE, game._winning_masks)
+    full_mask = (1 << CELLS) - 1
+    entries = bytearray(ENTRY.size * 3 ** CELLS)
+    seen = set()
+    stack = [(0, 0)]
+    while stack:
+        own, opp = stack.pop()
+        index = position_index(own, opp)
+        if index in seen:
+            continue
+        seen.add(index)
+        empty = full_mask & ~(own | opp)
+        if not empty:
+            continue
+        remaining = bin(empty).count("1")
+        best_value, best_moves = None, 0
+        for cell in range(CELLS):
+            bit = 1 << cell
+            if not empty & bit:
+                continue
+            if solver._is_win(own | bit, cell):
+                value = remaining
+            else:
+                value = -solver.negamax(opp, own | bit, -CELLS - 1, CELLS + 1)
+                stack.append((opp, own | bit))
+            if best_value is None or value > best_value:
+                best_value, best_moves = value, bit
+            elif value == best_value:
+                best_moves |= bit
+        ENTRY.pack_into(entries, ENTRY.size * index, best_moves, best_value, 1)
+
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as table_file:
+        table_file.write(HEADER.pack(MAGIC, VERSION, BOARD_SIZE, ENTRY.size))
+        table_file.write(entries)
+    os.replace(temporary_path, path)
+    return len(seen)
+
+
+class SolvedTable:
+    def __init__(self, path: str = DEFAULT_PATH) -> None:
+        """Perfect play for the 3x3 board by direct lookup in the table written by "build_table".
+
+        The file is memory mapped the first time a position is looked up, and built first if it does not exist yet.
+
+        :param path: The table file to read (Default value is "DEFAULT_PATH")
+        :type path: str
+        """
+        self.path = path
+        self._map = None
+
+    def load(self):
+        """Memory map the table, building the file first if it does not exist, unless it is mapped already.
+        Lookups do this on first use, call it beforehand to keep that work out of a time-critical thread."""
+        if self._map is not None:
+            return self._map
+        if not os.path.exists(self.path):
+            build_table(self.path)
+        with open(self.path, "rb") as table_file:
+            table_map = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, board_size, entry_size = HEADER.unpack_from(table_map, 0)
+        if (magic, version, board_size, entry_size) != (MAGIC, VERSION, BOARD_SIZE, ENTRY.size):
+            table_map.close()
+            raise ValueError(f"{self.path} is not a solved {BOARD_SIZE}x{BOARD_SIZE} table")
+        self._map = table_map
+        return table_map
+
+    def lookup(self, own: int, opp: int) -> tuple:
+        """Return the bitmask of best cells and the score for the player to move ("own"), or None if the position is not in the table."""
+        table_map = self._map or self.load()
+        best_moves, value, in_play = ENTRY.unpack_from(table_map, HEADER.size + ENTRY.size * position_index(own, opp))
+        if not in_play:
+            return None
+        return best_moves, value
+
+    def best_move(self, own: int, opp: int, rng) -> tuple:
+        """Return the (row, col) of one of the best cells for the player to move ("own"), picked with "rng"."""
+        entry = self.lookup(own, opp)
+        if entry is None:
+            raise ValueError("There is no move to pick, the position is already won, full or not reachable")
+        best_moves, _ = entry
+        cells = [cell for cell in range(CELLS) if best_moves >> cell & 1]
+        return divmod(rng.choice(cells), BOARD_SIZE)
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+_default_table = None
+
+
+def default_table() -> SolvedTable:
+    """Return the process wide "SolvedTable" for "DEFAULT_PATH", created on first use."""
+    global _default_table
+    if _default_table is None:
+        _default_table = SolvedTable()
+    return _default_table
+
+
+if __name__ == "__main__":
+    output_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PATH
+    print(f"Wrote {build_table(output_path)} positions to {output_path}")
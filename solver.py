@@ -0,0 +1,426 @@
+import time
+from collections import OrderedDict
+
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+#The largest board "AlphaBetaSolver" is used on for play, an empty 4x4 board is solved in a fifth of a second but 5x5 ones take minutes
+PERFECT_MAX_CELLS: int = 16
+
+
+class SearchCancelled(Exception):
+    """Raised inside a search once "cancel_requested" is set on the searcher."""
+
+
+def symmetry_permutations(board_size: int) -> list:
+    """Return the 8 rotations/reflections of a square board as lists mapping every cell index to its transformed cell index.
+
+    :param board_size: The number of rows (and columns) of the board
+    :type board_size: int
+    """
+    last = board_size - 1
+    transforms = (
+        lambda row, col: (row, col),
+        lambda row, col: (col, last - row),
+        lambda row, col: (last - row, last - col),
+        lambda row, col: (last - col, row),
+        lambda row, col: (row, last - col),
+        lambda row, col: (last - row, col),
+        lambda row, col: (col, row),
+        lambda row, col: (last - col, last - row),
+    )
+    permutations = []
+    for transform in transforms:
+        permutation = []
+        for cell in range(board_size * board_size):
+            row, col = transform(*divmod(cell, board_size))
+            permutation.append(row * board_size + col)
+        permutations.append(permutation)
+    return permutations
+
+
+def move_order(board_size: int) -> list:
+    """Return every cell index ordered center(s) first, then corners, then the rest of the board."""
+    low, high = (board_size - 1) // 2, board_size // 2
+    centers = [row * board_size + col for row in range(low, high + 1) for col in range(low, high + 1)]
+    last = board_size - 1
+    corners = [cell for cell in (0, last, last * board_size, last * board_size + last) if cell not in centers]
+    rest = [cell for cell in range(board_size * board_size) if cell not in centers + corners]
+    return centers + corners + rest
+
+
+def symmetry_chunks(board_size: int) -> list:
+    """Return, for every symmetry of "symmetry_permutations", a (shift, table) pair per 8 bit chunk of a bitboard, "table" mapping each byte value to its cells transformed.
+    A whole bitboard is then transformed with one lookup per chunk.
+    """
+    cells = board_size * board_size
+    chunks = []
+    for permutation in symmetry_permutations(board_size):
+        tables = []
+        for shift in range(0, cells, 8):
+            table = []
+            for byte in range(256):
+                transformed = 0
+                for bit in range(8):
+                    if byte >> bit & 1 and shift + bit < cells:
+                        transformed |= 1 << permutation[shift + bit]
+                table.append(transformed)
+            tables.append((shift, table))
+        chunks.append(tables)
+    return chunks
+
+
+class BitboardLines:
+    def __init__(self, board_size: int, winning_masks: list) -> None:
+        """The tables shared by the searches over a pair of bitboards: the cells in "move_order" with their bits, and the winning lines through every cell.
+
+        :param board_size: The number of rows (and columns) of the board
+        :type board_size: int
+        :param winning_masks: One bitmask per winning line, as built by "TicTacToeGame"
+        :type winning_masks: list
+        """
+        self.board_size = board_size
+        self.winning_masks = winning_masks
+        self._cells = board_size * board_size
+        self._full_mask = (1 << self._cells) - 1
+        self._order = [(cell, 1 << cell) for cell in move_order(board_size)]
+        self._cell_masks = [[] for _ in range(self._cells)]
+        for mask in winning_masks:
+            for cell in range(self._cells):
+                if mask >> cell & 1:
+                    self._cell_masks[cell].append(mask)
+
+    def _is_win(self, board: int, cell: int) -> bool:
+        #Only the lines through the cell just played can have been completed by it
+        for mask in self._cell_masks[cell]:
+            if board & mask == mask:
+                return True
+        return False
+
+
+class AlphaBetaSolver(BitboardLines):
+    def __init__(self, board_size: int, winning_masks: list, max_entries: int = 1_000_000) -> None:
+        """Negamax search with alpha-beta pruning over a pair of bitboards, using a transposition table keyed on the board reduced under its 8 rotations/reflections.
+
+        Scores are from the point of view of the player to move: a win is worth the number of empty cells left before the winning move (so quicker wins score higher), a loss the negative of that, and a draw 0.
+
+        :param board_size: The number of rows (and columns) of the board
+        :type board_size: int
+        :param winning_masks: One bitmask per winning line, as built by "TicTacToeGame"
+        :type winning_masks: list
+        :param max_entries: The number of positions kept in the transposition table before the oldest ones are evicted (Default value is "1_000_000")
+        :type max_entries: int
+        """
+        super().__init__(board_size, winning_masks)
+        self.max_entries = max_entries
+        self.nodes = 0
+        self.cancel_requested = False
+        self._table = OrderedDict()
+        self._symmetry_chunks = symmetry_chunks(board_size)
+
+    def canonical_key(self, own: int, opp: int) -> int:
+        """Return the smallest encoding of the position ("own" to move) over all 8 board symmetries."""
+        best = None
+        for tables in self._symmetry_chunks:
+            own_t = opp_t = 0
+            for shift, table in tables:
+                own_t |= table[own >> shift & 255]
+                opp_t |= table[opp >> shift & 255]
+            key = own_t << self._cells | opp_t
+            if best is None or key < best:
+                best = key
+        return best
+
+    def clear(self) -> None:
+        """Forget every position stored in the transposition table."""
+        self._table.clear()
+
+    def _store(self, key: int, value: int, flag: int) -> None:
+        table = self._table
+        table[key] = (value, flag)
+        if len(table) > self.max_entries:
+            table.popitem(last=False)
+
+    def negamax(self, own: int, opp: int, alpha: int, beta: int) -> int:
+        """Return the score of the position for the player to move ("own"), assuming the player who made "opp" has not already won."""
+        self.nodes += 1
+        if self.cancel_requested:
+            raise SearchCancelled()
+        empty = self._full_mask & ~(own | opp)
+        if not empty:
+            return 0
+        remaining = bin(empty).count("1")
+        #Win right away if possible, and find the cells the opponent threatens to win on
+        threats = []
+        for cell, bit in self._order:
+            if empty & bit:
+                if self._is_win(own | bit, cell):
+                    return remaining
+                if self._is_win(opp | bit, cell):
+                    threats.append((cell, bit))
+        if len(threats) > 1:
+            return 1 - remaining
+        if len(threats) == 1:
+            _, bit = threats[0]
+            return -self.negamax(opp, own | bit, -beta, -alpha)
+
+        #Without an immediate win the best result left is winning on our next move, or a draw near the end
+        upper = max(remaining - 2, 0)
+        if beta > upper:
+            beta = upper
+            if alpha >= beta:
+                return beta
+        key = self.canonical_key(own, opp)
+        entry = self._table.get(key)
+        if entry is not None:
+            value, flag = entry
+            if flag == EXACT:
+                return value
+            elif flag == LOWER_BOUND and value > alpha:
+                alpha = value
+            elif flag == UPPER_BOUND and value < beta:
+                beta = value
+            if alpha >= beta:
+                return value
+
+        original_alpha = alpha
+        best = -self._cells - 1
+        for cell, bit in self._order:
+            if empty & bit:
+                value = -self.negamax(opp, own | bit, -beta, -alpha)
+                if value > best:
+                    best = value
+                    if value > alpha:
+                        alpha = value
+                        if alpha >= beta:
+                            break
+        if best <= original_alpha:
+            self._store(key, best, UPPER_BOUND)
+        elif best >= beta:
+            self._store(key, best, LOWER_BOUND)
+        else:
+            self._store(key, best, EXACT)
+        return best
+
+    def solve(self, own: int, opp: int) -> tuple:
+        """Return the best cell index for the player to move ("own") along with its score.
+
+        :param own: The bitboard of the player to move
+        :type own: int
+        :param opp: The bitboard of the other player
+        :type opp: int
+        """
+        empty = self._full_mask & ~(own | opp)
+        best_cell, best = None, -self._cells - 1
+        alpha, beta = -self._cells - 1, self._cells + 1
+        for cell, bit in self._order:
+            if empty & bit:
+                if self._is_win(own | bit, cell):
+                    return cell, bin(empty).count("1")
+                value = -self.negamax(opp, own | bit, -beta, -alpha)
+                if value > best:
+                    best_cell, best = cell, value
+                    alpha = max(alpha, value)
+        return best_cell, best
+
+    def best_move(self, own: int, opp: int) -> tuple:
+        """Return the (row, col) the player to move ("own") should play."""
+        cell, _ = self.solve(own, opp)
+        return divmod(cell, self.board_size)
+
+    def move_values(self, own: int, opp: int) -> dict:
+        """Return the exact score of every empty cell for the player to move ("own"), as the cell index to the score of playing it.
+        Unlike "solve" every cell is searched with a full window, so losing moves get their real score rather than a bound.
+        """
+        empty = self._full_mask & ~(own | opp)
+        remaining = bin(empty).count("1")
+        window = self._cells + 1
+        values = {}
+        for cell, bit in self._order:
+            if empty & bit:
+                if self._is_win(own | bit, cell):
+                    values[cell] = remaining
+                else:
+                    values[cell] = -self.negamax(opp, own | bit, -window, window)
+        return values
+
+
+class _DeadlineReached(Exception):
+    pass
+
+
+class AnytimeSearch(BitboardLines):
+    def __init__(self, board_size: int, winning_masks: list, time_budget: float = 0.05, max_depth: int = None) -> None:
+        """Iterative deepening negamax that always answers within "time_budget" seconds, with the best move of the deepest search it finished.
+        Positions past the search horizon are scored by counting the lines each player still has a chance to complete, so it plays on boards of any size, and on large boards only the cells next to a mark are searched.
+        After every move "depth" holds the depth reached, "nodes" the number of positions searched and "elapsed" the seconds it took.
+
+        :param board_size: The number of rows (and columns) of the board
+        :type board_size: int
+        :param winning_masks: One bitmask per winning line, as built by "TicTacToeGame"
+        :type winning_masks: list
+        :param time_budget: The number of seconds a move may take (Default value is "0.05")
+        :type time_budget: float
+        :param max_depth: The deepest search to run, in moves, or "None" for no limit besides the time budget (Default value is "None")
+        :type max_depth: int
+        """
+        super().__init__(board_size, winning_masks)
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.cancel_requested = False
+        self.depth = 0
+        self.nodes = 0
+        self.elapsed = 0.0
+        self.score = None
+        win_length = bin(winning_masks[0]).count("1") if winning_masks else 1
+        #A line with n marks is worth 4 times one with n - 1, and any win is worth more than every line on the board
+        self._weights = [0] + [4 ** count for count in range(1, win_length + 1)]
+        self._win_score = 4 ** (win_length + 1) * max(len(winning_masks), 1)
+        self._neighbours = []
+        for cell in range(self._cells):
+            row, col = divmod(cell, board_size)
+            mask = 0
+            for near_row in range(max(row - 1, 0), min(row + 2, board_size)):
+                for near_col in range(max(col - 1, 0), min(col + 2, board_size)):
+                    mask |= 1 << (near_row * board_size + near_col)
+            self._neighbours.append(mask)
+        #Small boards are searched in full, larger ones only next to the marks already played
+        self._search_everywhere = self._cells <= 25
+        self._table = {}
+        self._deadline = 0.0
+
+    def _near(self, occupied: int) -> int:
+        if self._search_everywhere or not occupied:
+            return self._full_mask if self._search_everywhere else self._order[0][1]
+        near = 0
+        while occupied:
+            low_bit = occupied & -occupied
+            near |= self._neighbours[low_bit.bit_length() - 1]
+            occupied ^= low_bit
+        return near
+
+    def _evaluate(self, own: int, opp: int) -> int:
+        weights = self._weights
+        score = 0
+        for mask in self.winning_masks:
+            own_marks = own & mask
+            opp_marks = opp & mask
+            if own_marks and not opp_marks:
+                score += weights[bin(own_marks).count("1")]
+            elif opp_marks and not own_marks:
+                score -= weights[bin(opp_marks).count("1")]
+        return score
+
+    def _search(self, own: int, opp: int, near: int, depth: int, alpha: int, beta: int) -> int:
+        self.nodes += 1
+        if self.cancel_requested:
+            raise SearchCancelled()
+        if time.perf_counter() > self._deadline:
+            raise _DeadlineReached()
+        empty = self._full_mask & ~(own | opp)
+        if not empty:
+            return 0
+        remaining = bin(empty).count("1")
+        candidates = empty & near
+        #Win right away if possible, and answer a single threat of the opponent
+        threats = []
+        for cell, bit in self._order:
+            if candidates & bit:
+                if self._is_win(own | bit, cell):
+                    return self._win_score + remaining
+                if self._is_win(opp | bit, cell):
+                    threats.append((cell, bit))
+        if len(threats) > 1:
+            return 1 - self._win_score - remaining
+        if depth <= 0:
+            return self._evaluate(own, opp)
+        if len(threats) == 1:
+            cell, bit = threats[0]
+            return -self._search(opp, own | bit, near | self._neighbours[cell], depth - 1, -beta, -alpha)
+
+        key = own << self._cells | opp
+        entry = self._table.get(key)
+        first = None
+        if entry is not None:
+            entry_depth, value, flag, first = entry
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return value
+                elif flag == LOWER_BOUND and value > alpha:
+                    alpha = value
+                elif flag == UPPER_BOUND and value < beta:
+                    beta = value
+                if alpha >= beta:
+                    return value
+        original_alpha = alpha
+        best, best_cell = None, None
+        moves = [(cell, bit) for cell, bit in self._order if candidates & bit]
+        if first is not None and candidates >> first & 1:
+            moves.insert(0, (first, 1 << first))
+        for cell, bit in moves:
+            value = -self._search(opp, own | bit, near | self._neighbours[cell], depth - 1, -beta, -alpha)
+            if best is None or value > best:
+                best, best_cell = value, cell
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        break
+        if best <= original_alpha:
+            flag = UPPER_BOUND
+        elif best >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        self._table[key] = (depth, best, flag, best_cell)
+        return best
+
+    def best_move(self, own: int, opp: int) -> tuple:
+        """Return the (row, col) the player to move ("own") should play, found within the time budget."""
+        started = time.perf_counter()
+        self._deadline = started + self.time_budget
+        self._table = {}
+        self.nodes = 0
+        self.depth = 0
+        self.score = None
+        occupied = own | opp
+        empty = self._full_mask & ~occupied
+        near = self._near(occupied)
+        #Take a win at once, otherwise block a single threat, otherwise deepen while there is time
+        moves = [(cell, bit) for cell, bit in self._order if empty & near & bit]
+        if not moves:
+            moves = [(cell, bit) for cell, bit in self._order if empty & bit]
+        threats = []
+        for cell, bit in moves:
+            if self._is_win(own | bit, cell):
+                self.elapsed = time.perf_counter() - started
+                return divmod(cell, self.board_size)
+            if self._is_win(opp | bit, cell):
+                threats.append((cell, bit))
+        if threats:
+            moves = threats[:1]
+        best_cell = moves[0][0]
+        remaining = bin(empty).count("1")
+        max_depth = remaining if self.max_depth is None else min(self.max_depth, remaining)
+        try:
+            for depth in range(1, max_depth + 1):
+                alpha, beta = -self._win_score - self._cells - 1, self._win_score + self._cells + 1
+                depth_best, depth_score = None, None
+                ordered = [(best_cell, 1 << best_cell)] + [(cell, bit) for cell, bit in moves if cell != best_cell]
+                try:
+                    for cell, bit in ordered:
+                        value = -self._search(opp, own | bit, near | self._neighbours[cell], depth - 1, -beta, -alpha)
+                        if depth_score is None or value > depth_score:
+                            depth_best, depth_score = cell, value
+                            alpha = max(alpha, value)
+                except _DeadlineReached:
+                    #The previous best move is searched first, so a move that already beat it at this depth is a better pick
+                    if depth_best is not None and depth_best != best_cell:
+                        best_cell = depth_best
+                    raise
+                best_cell, self.score, self.depth = depth_best, depth_score, depth
+                if abs(depth_score) >= self._win_score or len(moves) == 1:
+                    break
+        except _DeadlineReached:
+            pass
+        self.elapsed = time.perf_counter() - started
+        return divmod(best_cell, self.board_size)
@@ -0,0 +1,300 @@
+"""Persistent statistics of finished games in a SQLite database.
+
+Every game is a row of "games". The writer thread also keeps "totals", a few counters per (board, mode, difficulty, cpu seat, opening cell, result), up to date.
+The aggregate queries read "totals" through its primary key, so they take the same time whether "games" holds a hundred rows or tens of millions.
+"""
+import argparse
+import queue
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import NamedTuple
+from game_record import GameRecordReader, RESULT_TIE, RESULT_FIRST_PLAYER, RESULT_SECOND_PLAYER
+
+MODE_PLAYERS: str = "players"
+MODE_CPU: str = "cpu"
+MODE_PERFECT: str = "perfect"
+MODE_TWITCH: str = "twitch"
+MODE_SELF_PLAY: str = "selfplay"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    played_at REAL NOT NULL,
+    board_size INTEGER NOT NULL,
+    win_length INTEGER NOT NULL,
+    mode TEXT NOT NULL,
+    difficulty INTEGER,
+    cpu_seat INTEGER,
+    opening_cell INTEGER,
+    result INTEGER NOT NULL,
+    move_count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_played_at ON games (played_at);
+CREATE TABLE IF NOT EXISTS totals (
+    board_size INTEGER NOT NULL,
+    win_length INTEGER NOT NULL,
+    mode TEXT NOT NULL,
+    difficulty INTEGER NOT NULL,
+    cpu_seat INTEGER NOT NULL,
+    opening_cell INTEGER NOT NULL,
+    result INTEGER NOT NULL,
+    games INTEGER NOT NULL,
+    moves INTEGER NOT NULL,
+    PRIMARY KEY (board_size, win_length, mode, difficulty, cpu_seat, opening_cell, result)
+) WITHOUT ROWID;
+"""
+INSERT_GAME = "INSERT INTO games (played_at, board_size, win_length, mode, difficulty, cpu_seat, opening_cell, result, move_count) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+#"totals" can't hold NULLs in its key, -1 stands for no difficulty, no cpu seat or no opening move
+UPSERT_TOTALS = """
+INSERT INTO totals (board_size, win_length, mode, difficulty, cpu_seat, opening_cell, result, games, moves) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT DO UPDATE SET games = games + excluded.games, moves = moves + excluded.moves
+"""
+
+
+class GameStats(NamedTuple):
+    group: tuple
+    games: int
+    first_wins: int
+    second_wins: int
+    ties: int
+    average_moves: float
+
+    @property
+    def first_win_rate(self) -> float:
+        return self.first_wins / self.games if self.games else 0.0
+
+
+class DifficultyStats(NamedTuple):
+    mode: str
+    difficulty: int
+    games: int
+    player_wins: int
+    cpu_wins: int
+    ties: int
+
+    @property
+    def player_win_rate(self) -> float:
+        return self.player_wins / self.games if self.games else 0.0
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    #With WAL a commit only waits for the log write, the database file is synced at checkpoints
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class StatsStore:
+    def __init__(self, path: str, batch_size: int = 10_000, max_queued: int = 100_000) -> None:
+        """Records finished games in a SQLite database and answers aggregate queries over them.
+        "record_game" only puts the game on a queue; a background thread writes the queued games in batches of up to "batch_size" per transaction, so callers never wait on disk.
+
+        :param path: The database file, created if needed
+        :type path: str
+        :param batch_size: The most games written in one transaction (Default value is "10000")
+        :type batch_size: int
+        :param max_queued: The number of queued games past which "record_game" waits for the writer, only bulk imports get there (Default value is "100000")
+        :type max_queued: int
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.error = None
+        self._queue = queue.Queue(max_queued)
+        writer = _connect(path)
+        writer.executescript(SCHEMA)
+        writer.commit()
+        self._reader = _connect(path)
+        self._reader_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._write, args=(writer,), name="stats-writer", daemon=True)
+        self._thread.start()
+
+    def record_game(self, board_size: int, win_length: int, mode: str, result: int, move_count: int,
+                    opening_cell: int = None, difficulty: int = None, cpu_seat: int = None) -> None:
+        """Queue one finished game for writing.
+
+        :param mode: How the game was played, one of the "MODE_" names
+        :type mode: str
+        :param result: "RESULT_TIE", "RESULT_FIRST_PLAYER" or "RESULT_SECOND_PLAYER" from "game_record"
+        :type result: int
+        :param opening_cell: The cell index (row * board_size + col) of the first move (Default value is "None")
+        :type opening_cell: int
+        :param difficulty: The cpu difficulty level (Default value is "None")
+        :type difficulty: int
+        :param cpu_seat: 0 if the cpu played first, 1 if it played second, None without a cpu or with cpu players in both seats (Default value is "None")
+        :type cpu_seat: int
+        """
+        self._queue.put((time.time(), board_size, win_length, mode, difficulty, cpu_seat, opening_cell, result, move_count))
+
+    def record_finished_game(self, game, mode: str, difficulty: int = None) -> None:
+        """Queue "game", which must be over and played with "make_move", working out the result, opening cell and cpu seat from it."""
+        cpu_seats = [seat for seat, player in enumerate(game.players_list) if player.cpu]
+        opening_cell = None
+        if game.history:
+            opening = game.history[0][0]
+            opening_cell = opening.row * game.board_size + opening.col
+        self.record_game(
+            game.board_size, game.win_length, mode, game.result(), len(game.history),
+            opening_cell, difficulty, cpu_seats[0] if len(cpu_seats) == 1 else None,
+        )
+
+    def _write(self, connection) -> None:
+        #Runs on the writer thread: block for the first game, then take whatever else is queued up to a batch
+        closing = False
+        while not closing:
+            rows = [self._queue.get()]
+            while len(rows) < self.batch_size:
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            closing = None in rows
+            flushes = [row for row in rows if isinstance(row, threading.Event)]
+            rows = [row for row in rows if isinstance(row, tuple)]
+            if rows and self.error is None:
+                try:
+                    self._write_batch(connection, rows)
+                except sqlite3.Error as error:
+                    self.error = error
+            for flushed in flushes:
+                flushed.set()
+        connection.close()
+
+    def _write_batch(self, connection, rows) -> None:
+        totals = Counter()
+        moves = Counter()
+        for _, board_size, win_length, mode, difficulty, cpu_seat, opening_cell, result, move_count in rows:
+            key = (
+                board_size, win_length, mode,
+                -1 if difficulty is None else difficulty,
+                -1 if cpu_seat is None else cpu_seat,
+                -1 if opening_cell is None else opening_cell,
+                result,
+            )
+            totals[key] += 1
+            moves[key] += move_count
+        with connection:
+            connection.executemany(INSERT_GAME, rows)
+            connection.executemany(UPSERT_TOTALS, [key + (count, moves[key]) for key, count in totals.items()])
+
+    def flush(self, timeout: float = None) -> bool:
+        """Wait until every game queued so far is written, returns False on timeout."""
+        flushed = threading.Event()
+        self._queue.put(flushed)
+        return flushed.wait(timeout)
+
+    def close(self) -> None:
+        """Write the queued games and stop the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._reader.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _query(self, sql: str, parameters=()) -> list:
+        with self._reader_lock:
+            return self._reader.execute(sql, parameters).fetchall()
+
+    def win_rate_by_opening(self, board_size: int, win_length: int = None, mode: str = None) -> list:
+        """Return a "GameStats" per opening cell, the group being the (row, col) of the first move.
+
+        :param win_length: Only count games with this win length (Default value is "None", meaning the whole board width)
+        :type win_length: int
+        :param mode: Only count games played in this mode (Default value is "None", meaning all of them)
+        :type mode: str
+        """
+        if win_length is None:
+            win_length = board_size
+        sql = """
+            SELECT opening_cell, SUM(games), SUM(games * (result = ?)), SUM(games * (result = ?)), SUM(games * (result = ?)), SUM(moves)
+            FROM totals WHERE board_size = ? AND win_length = ? AND opening_cell >= 0
+        """
+        parameters = [RESULT_FIRST_PLAYER, RESULT_SECOND_PLAYER, RESULT_TIE, board_size, win_length]
+        if mode is not None:
+            sql += " AND mode = ?"
+            parameters.append(mode)
+        sql += " GROUP BY opening_cell ORDER BY opening_cell"
+        return [
+            GameStats(divmod(cell, board_size), games, first, second, ties, moves / games)
+            for cell, games, first, second, ties, moves in self._query(sql, parameters)
+        ]
+
+    def win_rate_by_difficulty(self, board_size: int = None, win_length: int = None) -> list:
+        """Return a "DifficultyStats" per cpu mode and difficulty for the games of a player against the cpu, seen from the player's side.
+
+        :param board_size: Only count games on boards of this size (Default value is "None", meaning all of them)
+        :type board_size: int
+        :param win_length: Only count games with this win length (Default value is "None", meaning any)
+        :type win_length: int
+        """
+        #The player wins when the seat that won is not the cpu's: seat 0 is RESULT_FIRST_PLAYER and seat 1 RESULT_SECOND_PLAYER
+        sql = """
+            SELECT mode, difficulty, SUM(games), SUM(games * (result != ? AND result - 1 != cpu_seat)), SUM(games * (result - 1 = cpu_seat)), SUM(games * (result = ?))
+            FROM totals WHERE cpu_seat >= 0
+        """
+        parameters = [RESULT_TIE, RESULT_TIE]
+        for column, value in (("board_size", board_size), ("win_length", win_length)):
+            if value is not None:
+                sql += f" AND {column} = ?"
+                parameters.append(value)
+        sql += " GROUP BY mode, difficulty ORDER BY mode, difficulty"
+        return [
+            DifficultyStats(mode, None if difficulty < 0 else difficulty, games, wins, losses, ties)
+            for mode, difficulty, games, wins, losses, ties in self._query(sql, parameters)
+        ]
+
+    def game_count(self) -> int:
+        return self._query("SELECT COALESCE(SUM(games), 0) FROM totals")[0][0]
+
+    def import_records(self, record_path: str, mode: str = MODE_SELF_PLAY) -> int:
+        """Queue every game of a game record file, see "game_record", returns the number of games queued."""
+        count = 0
+        with GameRecordReader(record_path) as reader:
+            for record in reader:
+                opening_cell = record.moves[0] if record.moves else None
+                self.record_game(record.board_size, record.win_length, mode, record.result, len(record.moves), opening_cell)
+                count += 1
+        return count
+
+
+def print_report(store, board_size: int, win_length: int = None) -> None:
+    print(f"{store.game_count():,} games recorded")
+    print(f"{'Opening':<10}{'Games':>12}{'First wins':>12}{'Second wins':>13}{'Ties':>8}{'Moves':>8}")
+    for stats in store.win_rate_by_opening(board_size, win_length):
+        second_rate = stats.second_wins / stats.games
+        tie_rate = stats.ties / stats.games
+        print(f"{str(stats.group):<10}{stats.games:>12,}{stats.first_win_rate:>12.1%}{second_rate:>13.1%}{tie_rate:>8.1%}{stats.average_moves:>8.1f}")
+    print(f"{'Mode':<10}{'Level':>6}{'Games':>12}{'Wins':>8}{'Losses':>8}{'Ties':>8}")
+    for stats in store.win_rate_by_difficulty(board_size, win_length):
+        level = "-" if stats.difficulty is None else stats.difficulty
+        cells = "".join(f"{count / stats.games:>8.1%}" for count in (stats.player_wins, stats.cpu_wins, stats.ties))
+        print(f"{stats.mode:<10}{level:>6}{stats.games:>12,}{cells}")
+
+
+def main():
+    """Import game records into a statistics database or print its report from the command line"""
+    parser = argparse.ArgumentParser(description="Game statistics stored in SQLite.")
+    parser.add_argument("database")
+    parser.add_argument("--import-records", metavar="RECORD", nargs="+", default=[], help="Game record files to add to the database")
+    parser.add_argument("--board-size", type=int, default=3)
+    parser.add_argument("--win-length", type=int, default=None)
+    args = parser.parse_args()
+    with StatsStore(args.database) as store:
+        for record_path in args.import_records:
+            started = time.perf_counter()
+            count = store.import_records(record_path)
+            store.flush()
+            print(f"Imported {count:,} games from {record_path} in {time.perf_counter() - started:.2f}s")
+        if store.error is not None:
+            raise store.error
+        print_report(store, args.board_size, args.win_length)
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,15 @@
-from tkinter import *
-import tkinter as tk
+import argparse
 from itertools import cycle
-from tkinter import font
+import copy
+from functools import lru_cache
 from typing import NamedTuple
 import time
 import random
+import os
+import game_record
+import instrumentation
+from solver import AlphaBetaSolver, AnytimeSearch, symmetry_permutations, PERFECT_MAX_CELLS
+import solved_table
 
 class Player(NamedTuple):
     label: str
@@ -17,26 +22,133 @@ class Move(NamedTuple):
     col: int
     label: str = ""
 
+class LineTables(NamedTuple):
+    combos: tuple
+    masks: tuple
+    cell_lines: tuple
+
+class ZobristKeys(NamedTuple):
+    pieces: tuple
+    symmetric: tuple
+    side: int
+
 BOARD_SIZE: int = 3
+ZOBRIST_MASK: int = (1 << 64) - 1
+#The search budget of every cpu difficulty level, (deepest search in moves or None for no limit, seconds per move)
+DIFFICULTY_LEVELS = {
+    1: (1, 0.01),
+    2: (2, 0.02),
+    3: (4, 0.05),
+    4: (None, 0.05),
+    5: (None, 0.25),
+}
+#The level perfect play searches at on boards too big to solve, see "PERFECT_MAX_CELLS"
+PERFECT_FALLBACK_LEVEL: int = 5
 DEFAULT_PLAYERS = (
     Player(label = "X", color = "blue", cpu = False, name = "Player one"),
     Player(label = "O", color = "green", cpu = False, name = "Player two"),
 )
 
 
+@lru_cache(maxsize=None)
+def get_line_tables(board_size: int, win_length: int) -> LineTables:
+    """Computes every run of "win_length" cells in a row, column or diagonal of the board, the bitmask of each run and the runs passing through every cell.
+    The result is cached so every game with the same "board_size" and "win_length" shares the same tables.
+
+    :param board_size: The number of rows (and columns) of the board
+    :type board_size: int
+    :param win_length: The number of cells in a row needed to win
+    :type win_length: int
+    """
+    directions = ((0, 1), (1, 0), (1, 1), (1, -1))
+    combos = []
+    for row_step, col_step in directions:
+        for row in range(board_size):
+            for col in range(board_size):
+                last_row = row + row_step * (win_length - 1)
+                last_col = col + col_step * (win_length - 1)
+                if 0 <= last_row < board_size and 0 <= last_col < board_size:
+                    combos.append(tuple(
+                        (row + row_step * step, col + col_step * step)
+                        for step in range(win_length)
+                    ))
+    masks = []
+    cell_lines = [[] for _ in range(board_size * board_size)]
+    for index, combo in enumerate(combos):
+        mask = 0
+        for row, col in combo:
+            mask |= 1 << (row * board_size + col)
+            cell_lines[row * board_size + col].append(index)
+        masks.append(mask)
+    return LineTables(tuple(combos), tuple(masks), tuple(tuple(lines) for lines in cell_lines))
+
+
+@lru_cache(maxsize=None)
+def get_zobrist_keys(board_size: int) -> ZobristKeys:
+    """Returns the random 64 bit keys used to hash positions of a "board_size" x "board_size" board: one key per seat and cell, and the key of the second seat being to move.
+    "symmetric" packs, per seat and cell, the keys of the cell's 8 images under the board's rotations/reflections into one 512 bit int, so the hashes of all 8 symmetric boards are updated with a single xor.
+    The keys are drawn from a stream seeded by the board size, so hashes are the same in every process and run.
+
+    :param board_size: The number of rows (and columns) of the board
+    :type board_size: int
+    """
+    rng = random.Random(f"zobrist-{board_size}")
+    cells = board_size * board_size
+    pieces = tuple(tuple(rng.getrandbits(64) for _ in range(cells)) for _ in range(2))
+    permutations = symmetry_permutations(board_size)
+    symmetric = tuple(
+        tuple(
+            sum(seat_keys[permutation[cell]] << (64 * index) for index, permutation in enumerate(permutations))
+            for cell in range(cells)
+        )
+        for seat_keys in pieces
+    )
+    return ZobristKeys(pieces, symmetric, rng.getrandbits(64))
+
+
 class TicTacToeGame:
-    def __init__(self, players = DEFAULT_PLAYERS, board_size = BOARD_SIZE) -> None:
+    def __init__(self, players = DEFAULT_PLAYERS, board_size = BOARD_SIZE, win_length = None) -> None:
+        """Holds the state of one game on a "board_size" x "board_size" board, won by the first player with "win_length" marks in a row, column or diagonal.
+
+        :param players: The players taking turns, first to play first (Default value is "DEFAULT_PLAYERS")
+        :type players: tuple
+        :param board_size: The number of rows (and columns) of the board (Default value is "BOARD_SIZE")
+        :type board_size: int
+        :param win_length: The number of marks in a row needed to win (Default value is "None", meaning the whole board width)
+        :type win_length: int
+        """
+        if win_length is None:
+            win_length = board_size
+        if not 1 <= win_length <= board_size:
+            raise ValueError(f"win_length must be between 1 and {board_size}, got {win_length}")
         self.players_list = list(players)
         self._players = None
         self.board_size = board_size
+        self.win_length = win_length
         self.current_player = None
         self.winner_combo = []
-        self._current_moves = []
         self._has_winner = False
         self._winning_combos = []
+        self._winning_masks = []
+        self._cell_lines = []
+        self._bitboards = {}
+        self._line_counts = {}
+        self._line_totals = []
+        self._threat_lines = {}
+        self._occupied = 0
+        self._full_mask = 0
+        self._zobrist_keys = None
+        self._zobrist = 0
+        self._label_seats = {}
+        self.history = []
         self.cpu_moves = []
         self.player_moves = []
         self.hard_mode = True
+        self.recorder = None
+        self._record_moves = bytearray()
+        #True when the last move finished the game with the same moves as a finish before it, a redo, so the game isn't recorded twice
+        self.finished_before = False
+        self._finished_games = set()
         self._setup_board()
 
     def set_cpu_player(self, player_index: int, new_cpu_value: bool) -> None:
@@ -62,45 +174,208 @@ class TicTacToeGame:
         self.current_player = next(self._players)
 
     def _setup_board(self) -> None:
-        """Inittializes the game board, creating a grid of "Move" objects and computing all possible winning combinations (self._get_winning_combos) for the current board.
+        """Inittializes the game board, looking up the shared winning combinations (get_line_tables) for the current board along with one bitmask per combination and the lines passing through every cell, then clears the per player bitboards.
         """
-        self._current_moves = [
-            [Move(row, col) for col in range(self.board_size)]
-            for row in range(self.board_size)
-        ]
-        self._winning_combos = self._get_winning_combos()
+        self._full_mask = (1 << (self.board_size * self.board_size)) - 1
+        tables = get_line_tables(self.board_size, self.win_length)
+        self._winning_combos = tables.combos
+        self._winning_masks = tables.masks
+        self._cell_lines = tables.cell_lines
+        self._zobrist_keys = get_zobrist_keys(self.board_size)
+        self.clear_board()
 
     def _get_winning_combos(self) -> list:
-        rows = [
-            [(move.row, move.col) for move in row]
-            for row in self._current_moves
-        ]
-        columns = [list(col) for col in zip(*rows)]
-        first_diagonal = [row[i] for i, row in enumerate(rows)]
-        second_diagonal = [col[j] for j, col in enumerate(reversed(columns))]
-        return rows + columns + [first_diagonal, second_diagonal]
-    
+        return list(get_line_tables(self.board_size, self.win_length).combos)
+
+    def _cell_bit(self, row: int, col: int) -> int:
+        """Return the bit representing the cell at "row"/"col" in a bitboard."""
+        return 1 << (row * self.board_size + col)
+
+    def board_string(self, empty: str = ".") -> str:
+        """Return the board as one character per cell, row by row, "empty" standing for a free cell."""
+        cells = [empty] * (self.board_size * self.board_size)
+        for label, board in self._bitboards.items():
+            while board:
+                low_bit = board & -board
+                cells[low_bit.bit_length() - 1] = label
+                board ^= low_bit
+        return "".join(cells)
+
+    @property
+    def _current_moves(self) -> list:
+        """A grid of "Move" objects built from the bitboards, kept for code that reads the board cell by cell."""
+        labels = list(self._bitboards.items())
+        grid = []
+        for row in range(self.board_size):
+            grid_row = []
+            for col in range(self.board_size):
+                bit = self._cell_bit(row, col)
+                label = next((label for label, board in labels if board & bit), "")
+                grid_row.append(Move(row, col, label))
+            grid.append(grid_row)
+        return grid
+
     def is_valid_move(self, move):
-        row, col = move.row, move.col
-        move_was_not_played = self._current_moves[row][col].label == ""
+        move_was_not_played = not self._occupied & self._cell_bit(move.row, move.col)
         no_winner = not self._has_winner
         return no_winner and move_was_not_played
     
     def process_move(self, move):
-        """Process the current move and check if it's a win."""
-        row, col = move.row, move.col
-        self._current_moves[row][col] = move
-        for combo in self._winning_combos:
-            results = set(
-                self._current_moves[n][m].label
-                for n, m in combo
-            )
-            is_win = (len(results) == 1) and ("" not in results)
-            if is_win:
-                self._has_winner = True
-                self.winner_combo = combo
-                break
+        """Process the current move, update the threat index for every line through the played cell and check if it's a win."""
+        instruments = instrumentation.active
+        if instruments is not None:
+            started = time.perf_counter()
+        cell = move.row * self.board_size + move.col
+        self._bitboards[move.label] = self._bitboards.get(move.label, 0) | (1 << cell)
+        self._occupied |= 1 << cell
+        self._zobrist ^= self._zobrist_keys.symmetric[self._label_seats[move.label]][cell]
+        counts = self._line_counts.setdefault(move.label, [0] * len(self._winning_combos))
+        threats = self._threat_lines.setdefault(move.label, set())
+        for line in self._cell_lines[cell]:
+            counts[line] += 1
+            self._line_totals[line] += 1
+            for label, lines in self._threat_lines.items():
+                if label != move.label:
+                    lines.discard(line)
+            if counts[line] != self._line_totals[line]:
+                continue
+            if counts[line] == self.win_length - 1:
+                threats.add(line)
+            elif counts[line] == self.win_length:
+                threats.discard(line)
+                if not self._has_winner:
+                    self._has_winner = True
+                    self.winner_combo = self._winning_combos[line]
+        if self._has_winner or self._occupied == self._full_mask:
+            #Kept through unmake_move, undoing the final move and playing it again ends the same game, keyed on the moves made with make_move
+            played = tuple(entry[0] for entry in self.history)
+            self.finished_before = played in self._finished_games
+            self._finished_games.add(played)
+        if self.recorder is not None:
+            self._record_game(cell, move.label)
+        if instruments is not None:
+            instruments.record("process_move", time.perf_counter() - started)
+            instruments.count("moves_played")
+            if self._has_winner or self._occupied == self._full_mask:
+                instruments.count("games_played")
+
+    def make_move(self, move) -> None:
+        """Play "move" for the current player and hand the turn over unless the game is over, pushing what "unmake_move" needs onto "history"."""
+        previous_player = self.current_player
+        #Which move list the move went to: None, or True for "cpu_moves" and False for "player_moves"
+        cpu_list = None
+        if any(player.cpu for player in self.players_list):
+            cpu_list = previous_player.cpu
+            (self.cpu_moves if cpu_list else self.player_moves).append([move.row, move.col])
+        #Everything process_move may overwrite, so unmaking restores it without copying the board
+        self.history.append((move, self._has_winner, self.winner_combo, previous_player, cpu_list))
+        self.process_move(move)
+        if not self._has_winner and self._occupied != self._full_mask:
+            self.toggle_player()
+
+    def unmake_move(self):
+        """Take back the last move played with "make_move" and return it, restoring the board, threat index, hash, winner, current player and move lists."""
+        move, had_winner, winner_combo, previous_player, cpu_list = self.history.pop()
+        cell = move.row * self.board_size + move.col
+        bit = 1 << cell
+        self._bitboards[move.label] &= ~bit
+        self._occupied &= ~bit
+        self._zobrist ^= self._zobrist_keys.symmetric[self._label_seats[move.label]][cell]
+        counts = self._line_counts[move.label]
+        threat_length = self.win_length - 1
+        for line in self._cell_lines[cell]:
+            counts[line] -= 1
+            self._line_totals[line] -= 1
+            total = self._line_totals[line]
+            #A line is a threat for the one player holding all its marks, one short of a win
+            for label, lines in self._threat_lines.items():
+                if threat_length and total == threat_length and self._line_counts[label][line] == total:
+                    lines.add(line)
+                else:
+                    lines.discard(line)
+        self._has_winner = had_winner
+        self.winner_combo = winner_combo
+        self._set_current_player(previous_player)
+        if cpu_list is not None:
+            (self.cpu_moves if cpu_list else self.player_moves).pop()
+        if self._record_moves:
+            self._record_moves.pop()
+        return move
+
+    def _set_current_player(self, player) -> None:
+        #Point the turn cycle at "player" so the next toggle_player moves on to the player after them
+        index = next(index for index, seat in enumerate(self.players_list) if seat.label == player.label)
+        self.current_player = self.players_list[index]
+        index += 1
+        self._players = cycle(self.players_list[index:] + self.players_list[:index])
+
+    def result(self):
+        """Return "RESULT_TIE", "RESULT_FIRST_PLAYER" or "RESULT_SECOND_PLAYER" from "game_record" once the game is over, None before."""
+        if self._has_winner:
+            first = self.current_player.label == self.players_list[0].label
+            return game_record.RESULT_FIRST_PLAYER if first else game_record.RESULT_SECOND_PLAYER
+        if self._occupied == self._full_mask:
+            return game_record.RESULT_TIE
+        return None
+
+    def _record_game(self, cell: int, label: str) -> None:
+        #Keep the move for the attached "GameRecordWriter" and hand it the whole game once it's over
+        self._record_moves.append(cell)
+        if self._has_winner:
+            first = label == self.players_list[0].label
+            result = game_record.RESULT_FIRST_PLAYER if first else game_record.RESULT_SECOND_PLAYER
+        elif self._occupied == self._full_mask:
+            result = game_record.RESULT_TIE
+        else:
+            return
+        if self.finished_before:
+            return
+        self.recorder.write_game(self.board_size, self.win_length, result, self._record_moves)
+
+    def winning_move(self, label: str):
+        """Return the (row, col) of a cell that would complete a line for "label", or None if there is no such cell.
+
+        :param label: The label of the player to look up threats for
+        :type label: str
+        """
+        threats = self._threat_lines.get(label)
+        if not threats:
+            return None
+        empty_bit = self._winning_masks[next(iter(threats))] & ~self._occupied
+        return divmod(empty_bit.bit_length() - 1, self.board_size)
     
+    def moves_of(self, label: str) -> list:
+        """Return the (row, col) of every cell played by "label"."""
+        board = self._bitboards.get(label, 0)
+        return [
+            divmod(cell, self.board_size)
+            for cell in range(self.board_size * self.board_size)
+            if board >> cell & 1
+        ]
+
+    def available_moves(self) -> list:
+        """Return the (row, col) of every cell that has not been played yet."""
+        return [
+            divmod(cell, self.board_size)
+            for cell in range(self.board_size * self.board_size)
+            if not self._occupied >> cell & 1
+        ]
+
+    def _second_seat_to_move(self) -> bool:
+        return self.current_player is not None and self._label_seats.get(self.current_player.label) == 1
+
+    @property
+    def zobrist_hash(self) -> int:
+        """A 64 bit Zobrist hash of the position and the side to move, kept up to date move by move."""
+        position_hash = self._zobrist & ZOBRIST_MASK
+        return position_hash ^ self._zobrist_keys.side if self._second_seat_to_move() else position_hash
+
+    @property
+    def canonical_hash(self) -> int:
+        """A 64 bit Zobrist hash of the position and the side to move that is the same for every rotation/reflection of the board."""
+        position_hash = min(self._zobrist >> shift & ZOBRIST_MASK for shift in range(0, 512, 64))
+        return position_hash ^ self._zobrist_keys.side if self._second_seat_to_move() else position_hash
+
     def has_winner(self):
         """Return True if the game has a winner, and False otherwise."""
         return self._has_winner
@@ -108,519 +383,286 @@ class TicTacToeGame:
     def is_tied(self):
         """Return True if the game is tied, and False otherwise"""
         no_winner = not self._has_winner
-        played_moves = (
-            move.label for row in self._current_moves for move in row
-        )
-        return no_winner and all(played_moves)
+        return no_winner and self._occupied == self._full_mask
     
     def toggle_player(self):
         """Return a toggled player."""
         self.current_player = next(self._players)
 
-    def reset_game(self):
-        """Reset the game state to play again."""
-        for row, row_content in enumerate(self._current_moves):
-            for col, _ in enumerate(row_content):
-                row_content[col] = Move(row, col)
+    def copy(self):
+        """Return an independent copy of the game state, sharing the read only line tables, e.g. for a cpu to think on while this game keeps changing."""
+        game = copy.copy(self)
+        game.players_list = list(self.players_list)
+        game._players = None
+        if self.current_player in game.players_list:
+            game._set_current_player(self.current_player)
+        game._bitboards = dict(self._bitboards)
+        game._line_counts = {label: list(counts) for label, counts in self._line_counts.items()}
+        game._line_totals = list(self._line_totals)
+        game._threat_lines = {label: set(lines) for label, lines in self._threat_lines.items()}
+        game.cpu_moves = list(self.cpu_moves)
+        game.player_moves = list(self.player_moves)
+        game.history = list(self.history)
+        game.recorder = None
+        game._record_moves = bytearray(self._record_moves)
+        game.finished_before = self.finished_before
+        game._finished_games = set(self._finished_games)
+        return game
+
+    def clear_board(self):
+        """Empty the board and forget the winner, keeping the players and their settings."""
+        self._bitboards = {player.label: 0 for player in self.players_list}
+        self._occupied = 0
+        self._line_counts = {
+            player.label: [0] * len(self._winning_combos) for player in self.players_list
+        }
+        self._line_totals = [0] * len(self._winning_combos)
+        self._threat_lines = {player.label: set() for player in self.players_list}
+        self._zobrist = 0
+        self._label_seats = {player.label: seat for seat, player in enumerate(self.players_list)}
         self._has_winner = False
-        self.hard_mode = True
         self.winner_combo = []
         self.cpu_moves = []
         self.player_moves = []
+        self.history = []
+        self._record_moves = bytearray()
+        self.finished_before = False
+        self._finished_games = set()
+
+    def reset_game(self):
+        """Reset the game state to play again."""
+        self.clear_board()
+        self.hard_mode = True
         self.players_list = list(DEFAULT_PLAYERS)
         self.current_player = DEFAULT_PLAYERS[0]
 
 
-class TicTacToeBoard(tk.Tk):
-    def __init__(self, game) -> None:
-        super().__init__()
-        self.minsize(400,500)
-        self.title("Tic-Tac-Toe Game")
-        self.master_frame = tk.Frame(master=self)
-        self.master_frame.place(x=0, y=0, relheight=1, relwidth=1)
-        self._cells = {}
-        self._game = game
-        self.twitch_check = "Hello"
-        self.player_one_score = 0
-        self.player_two_score = 0
-        self.vs_cpu_status = None
-        self.vs_cpu_info = [int, bool]
-        self.twitch_vs_cpu_info = None
-        self.hard_mode_status = self._game.hard_mode
-        self.eval("tk::PlaceWindow . center")
-        self.popup()
-        self._create_board_display()
-        self._create_board_grid()
-        self._create_menu()
-
-    def popup(self) -> None:
-        self.cpu_mode_option = tk.IntVar()
-        self.easy_mode_option = tk.IntVar()
-        self.twitch_mode_option = tk.IntVar()
-        self.first_player_mode_option = tk.IntVar()
-        self.twitch_channel_input = None
-        self.popup_window = tk.Toplevel()
-        self.eval(f"tk::PlaceWindow {str(self.popup_window)} center")
-        self.popup_window.title("Popup")
-        self.popup_window.attributes("-topmost", True)
-        self.popup_window.bind("<FocusOut>", lambda event: self.popup_window.focus_force())
-        self.popup_window.protocol('WM_DELETE_WINDOW', 'break')
-        self.popup_window.cpu_check = tk.Checkbutton(
-            self.popup_window, 
-            text="Play VS the CPU",
-            variable=self.cpu_mode_option,
-            onvalue=1,
-            offvalue=0,
-            command=self.vs_cpu_options,
-            font=("helvetica", 13)).pack(pady=(5),padx=(20))
-        self.popup_window.twitch_check = tk.Checkbutton(
-            self.popup_window, 
-            text="Twitch Plays DNT",
-            variable=self.twitch_mode_option,
-            onvalue=1, 
-            offvalue=0,
-            font=("helvetica", 13),
-            command=self.channel_input).pack(pady=(5),padx=(20))
-        self.popup_window.confirm_button = tk.Button(
-            self.popup_window, 
-            text="Confirm", 
-            command=self.confirm_button,
-            font=("helvetica", 13)).pack(side="bottom", padx=10,pady=10)
-        self.attributes("-disabled", True)
-
-    def channel_input(self):
-        if self.twitch_mode_option.get():
-            if self.twitch_channel_input is None:
-                self.twitch_channel_input = tk.Entry(self.popup_window, width=20)
-                self.twitch_channel_input.pack()
-                self.twitch_channel_value_info = tk.Label(self.popup_window)
-                self.twitch_channel_value_info.pack()
-                self.twitch_channel_input.insert(tk.END, "Enter Twitch Channel")
-                self.twitch_channel_input.bind("<FocusIn>", lambda e: self.text_entry_click())
-                self.twitch_channel_input.bind("<FocusOut>", lambda e: self.on_text_entry_focusout())
-                self.twitch_channel_input.config(fg= "grey")
-        else:
-            if self.twitch_channel_input is not None:
-                self.twitch_channel_input.pack_forget()
-                self.twitch_channel_input.destroy()
-                self.twitch_channel_value_info.pack_forget()
-                self.twitch_channel_value_info.destroy()
-                self.twitch_channel_input = None
-    
-    def is_channel_input_valid(self):
-        if self.twitch_value.lower() == "Holy".lower():
-            return True
-        else:
-            return False
-
-    def vs_cpu_options(self):
-        if self.cpu_mode_option.get():
-            self.first_player_check = tk.Checkbutton(
-                self.popup_window, 
-                text="Play First?",
-                variable=self.first_player_mode_option,
-                onvalue=1,
-                offvalue=0,
-                font=("helvetica", 13))
-            self.first_player_check.pack(pady=(5),padx=(20))
-            self.easy_mode_check = tk.Checkbutton(
-                self.popup_window, 
-                text="Easy Mode",
-                variable=self.easy_mode_option,
-                onvalue=1, 
-                offvalue=0,
-                font=("helvetica", 13))
-            self.easy_mode_check.pack(pady=(5),padx=(20))
-        else:
-            self.first_player_check.pack_forget()
-            self.first_player_check.destroy()
-            self.easy_mode_check.pack_forget()
-            self.easy_mode_check.destroy()
-
-    def text_entry_click(self):
-        if self.twitch_channel_input.get() == "Enter Twitch Channel":
-            self.twitch_channel_input.delete(0, "end")
-            self.twitch_channel_input.config(fg= "black")
-    
-    def on_text_entry_focusout(self):
-        if self.twitch_channel_input.get() == "":
-            self.twitch_channel_input.insert(tk.END, "Enter Twitch Channel")
-            self.twitch_channel_input.config(fg= "grey")
-
-    def confirm_button(self) -> None:
-        if self.twitch_channel_input is not None:
-            self.twitch_value = self.twitch_channel_input.get()
-            if not self.is_channel_input_valid():
-                self.twitch_channel_value_info["text"] = "No channels found"
-                return
-            elif self.is_channel_input_valid():
-                pass
-        
-        self.attributes("-disabled", False)
-        self.popup_window.destroy()
-        label_msg = "Cpu"
-        if self.easy_mode_option.get():
-            self.hard_mode_status= False
-        if self.cpu_mode_option.get() == 0:
-            self._update_display(msg="Player one's turn")
-            self.vs_cpu_status = False
-            self._game.set_players(self._game.players_list)
-            self._logic.cpu_play()
-        else:
-            if self.cpu_mode_option.get() and self.first_player_mode_option.get():
-                self._update_display(msg="Player one's turn")
-                self.vs_cpu_status = True
-                self.vs_cpu_info = [1, True]
-                self._update_player_two_info_display(label_msg)
-                self._game.set_cpu_player(1, True)
-                self._game.set_players(self._game.players_list)
-                self._logic.cpu_play()
-            elif self.cpu_mode_option.get() and self.first_player_mode_option.get() == 0:
-                self.vs_cpu_status = True
-                self.vs_cpu_info = [0, True]
-                self._update_player_one_info_display(label_msg)
-                self._game.set_cpu_player(0, True)
-                self._game.set_players(self._game.players_list)
-                print(type(self._game.players_list))
-                self._logic.cpu_play()
-        
-    def _create_menu(self):
-        menu_bar = tk.Menu(master=self)
-        self.config(menu=menu_bar)
-        file_menu = tk.Menu(master=menu_bar)
-        file_menu.add_command(
-            label="Play Again",
-            command=self.restart_game,
-        )
-        self.bind("")
-        file_menu.add_separator()
-        file_menu.add_command(
-            label="Options",
-            command=lambda: [self.popup(), self.reset_board()]
-        )
-        file_menu.add_separator()
-        file_menu.add_command(label="Exit", command=quit)
-        menu_bar.add_cascade(label="File", menu=file_menu)
-
-    def _create_board_display(self) -> None:
-        display_info_frame = tk.Frame(master=self.master_frame, background= "#aab7b8")
-        display_info_frame.place(x=0, y=0 , relheight=0.15, relwidth=1)
-        display_info_frame.columnconfigure((0,1,2), weight = 1)
-        display_info_frame.rowconfigure((0,1,2), weight = 1)
-
-        self.display = tk.Label(
-            master = display_info_frame,
-            text ="Ready?",
-            font = font.Font(size = 20, weight = "bold"),
-            background="#aab7b8",
-        )
-        self.display.grid(row=2, column=0, columnspan=3, sticky="nsew")
-
-        self.player_one_label_display = tk.Label(
-            master = display_info_frame,
-            text ="Player one?",
-            font = font.Font(size = 10),
-            background="#aab7b8",
-        )
-        self.player_one_label_display.grid(row=0, column=0, sticky="nsew")
-        self.player_one_score_display = tk.Label(
-            master = display_info_frame,
-            text = self.player_one_score,
-            font = font.Font(size = 10),
-            background="#aab7b8",
-        )
-        self.player_one_score_display.grid(row=1, column=0, sticky="nsew")
-
-        self.player_two_label_display = tk.Label(
-            master = display_info_frame,
-            text ="Player one?",
-            font = font.Font(size = 10),
-            background="#aab7b8",
-        )
-        self.player_two_label_display.grid(row=0, column=2, sticky="nsew")
-        self.player_two_score_display = tk.Label(
-            master = display_info_frame,
-            text = self.player_two_score,
-            font = font.Font(size = 10),
-            background="#aab7b8",
-        )
-        self.player_two_score_display.grid(row=1, column=2, sticky="nsew")
-
-    def _create_board_grid(self) -> None:
-        grid_frame = tk.Frame(master = self.master_frame, background="#aab7b8")
-        grid_frame.place(relx=0, rely=0.15 , relheight=0.85, relwidth=1)
-        for row in range(self._game.board_size):
-            grid_frame.rowconfigure(row, weight = 1, minsize = 50)
-            grid_frame.columnconfigure(row, weight = 1, minsize = 75)
-            for col in range(self._game.board_size):
-                cell_number = row * self._game.board_size + col + 1
-                button = tk.Button(
-                    master = grid_frame,
-                    text = "",
-                    font = font.Font(size = 36, weight = "bold"),
-                    bg = "#aed6f1",
-                    fg = "black",
-                    width = 3,
-                    height = 2,
-                    activebackground="#c39bd3",
-                )
-                button.num_label = cell_number
-                self._cells[button] = (row, col)
-                button.bind("<ButtonPress-1>", self.play)
-                button.grid(
-                    row = row,
-                    column = col,
-                    padx = 5,
-                    pady = 5,
-                    sticky = "nsew"
-                )
-    
-    def play(self, event) -> None:
-        update_move_list_check = [item.cpu for item in self._game.players_list]
-        #Handle a player's move
-        if self._game.current_player.cpu:
-            clicked_button = event
-        else:
-            clicked_button = event.widget
-        row, col = self._cells[clicked_button]
-        move = Move(row, col, self._game.current_player.label)
-        if self._game.is_valid_move(move):
-            self._update_button(clicked_button)
-            self._game.process_move(move)
-            if any(update_move_list_check):#Will only run if there is a cpu player
-                if self._game.current_player.cpu:
-                    self._game.cpu_moves.append([row, col])
-                else:
-                    self._game.player_moves.append([row, col])
-            if self._game.is_tied():
-                self._update_display(msg = "Tied game!", color = "red")
-            elif self._game.has_winner():
-                self._highlight_cells()
-                self._update_display_msg()
-                msg = f'"{self.current_player_display_info}" won!'
-                if self._game.current_player == self._game.players_list[0]:
-                    self.player_one_score = self.player_one_score +1
-                    self.player_one_score_display["text"] = self.player_one_score
-                elif self._game.current_player == self._game.players_list[1]:
-                    self.player_two_score = self.player_two_score +1
-                    self.player_two_score_display["text"] = self.player_two_score
-                color = self._game.current_player.color
-                self._update_display(msg, color)
-            else:
-                self._game.toggle_player()
-                self._update_display_msg()
-                msg = f"{self.current_player_display_info}'s turn"
-                self._update_display(msg)
-                if self._game.current_player.cpu:
-                    self._logic.cpu_play()
-
-    def _update_button(self, clicked_btn):
-        clicked_btn.config(text=self._game.current_player.label)
-        clicked_btn.config(fg=self._game.current_player.color)
-    
-    def _update_display(self, msg, color="black"):
-        self.display["text"] = msg
-        self.display["fg"] = color
-
-    def _update_display_msg(self):
-        self.current_player_display_info = ""
-        if self.vs_cpu_status:
-            if self._game.current_player.cpu:
-                self.current_player_display_info = "Cpu"
-            elif self._game.current_player.cpu == False:
-                self.current_player_display_info = self._game.current_player.name
-        elif self.vs_cpu_status is False:
-            self.current_player_display_info = self._game.current_player.name
-
-    def _update_player_one_info_display(self, msg, color="black"):
-        self.player_one_label_display["text"] = msg
-        self.player_one_label_display["fg"] = color
-
-    def _update_player_two_info_display(self, msg, color="black"):
-        self.player_two_label_display["text"] = msg
-        self.player_two_label_display["fg"] = color
-
-    def _highlight_cells(self):
-        for button, coordinates in self._cells.items():
-            if coordinates in self._game.winner_combo:
-                button.config(highlightbackground="red")
-
-    def reset_board(self):
-        #Reset the game's board to play again
-        self._game.reset_game()
-        self._update_display(msg="Ready?")
-        self.player_one_score = 0
-        self.player_one_score_display["text"] = self.player_one_score
-        self.player_two_score = 0
-        self.player_two_score_display["text"] = self.player_two_score
-        self._update_player_one_info_display("Player one")
-        self._update_player_two_info_display("Player two")
-        for button in self._cells.keys():
-            button.config(highlightbackground="lightblue")
-            button.config(text="")
-            button.config(fg="black")
-
-    def restart_game(self):
-        """Restarts the game keeping the sttings to play again."""
-        for row, row_content in enumerate(self._game._current_moves):
-            for col, _ in enumerate(row_content):
-                row_content[col] = Move(row, col)
-        self._game._has_winner = False
-        self._game.winner_combo = []
-        self._game.cpu_moves = []
-        self._game.player_moves = []
-        for button in self._cells.keys():
-            button.config(highlightbackground="lightblue")
-            button.config(text="")
-            button.config(fg="black")
-        if self.vs_cpu_status:
-            if self.vs_cpu_info[0] == 1:
-                self._update_display(msg="Player one's turn")
-            self._game.set_cpu_player(self.vs_cpu_info[0],self.vs_cpu_info[1])
-            self._game.set_players(self._game.players_list)
-            self._logic.cpu_play()
-        else:
-            self._update_display(msg="Player one's turn")
-            self._game.set_players(self._game.players_list)
-            self._logic.cpu_play()
-
-class TicTacToeGameCpuLogic:
-    def __init__(self, game, board):
+class TicTacToeCpuEngine:
+    def __init__(self, game, hard_mode=True, rng=random, perfect_mode=False, searcher=None, difficulty=None):
+        """Picks moves for the current player from the game state alone, so it can run without a "TicTacToeBoard".
+
+        :param game: The game to pick moves for
+        :type game: TicTacToeGame
+        :param hard_mode: A bool value to pick between the hard heuristic and random moves (Default value is "True")
+        :type hard_mode: bool
+        :param rng: The random number generator used for every random choice (Default value is the "random" module)
+        :type rng: random.Random
+        :param perfect_mode: A bool value to pick moves with "AlphaBetaSolver" instead, taking priority over "hard_mode", on boards of up to "PERFECT_MAX_CELLS" cells (larger ones are searched at "PERFECT_FALLBACK_LEVEL") (Default value is "False")
+        :type perfect_mode: bool
+        :param searcher: Any object with a "best_move(own, opp)" method returning a (row, col), such as "mcts.MctsSearch", used instead of every other mode (Default value is "None")
+        :param difficulty: One of "DIFFICULTY_LEVELS" to pick moves with "AnytimeSearch" on that level's budget, taking priority over "hard_mode" (Default value is "None")
+        :type difficulty: int
+        """
         self._game = game
-        self._board = board
+        self.hard_mode = hard_mode
+        self.perfect_mode = perfect_mode
+        self.searcher = searcher
+        self.difficulty = difficulty
+        self.last_decision = None
+        self._rng = rng
+        self._solver = None
+        self._anytime = None
+
+    def solver(self):
+        """Return the "AlphaBetaSolver" for the game's board, keeping its transposition table between moves and games."""
+        if self._solver is None or self._solver.winning_masks is not self._game._winning_masks:
+            self._solver = AlphaBetaSolver(self._game.board_size, self._game._winning_masks)
+        return self._solver
+
+    def anytime_search(self):
+        """Return the "AnytimeSearch" for the game's board, set to the budget of the current difficulty level."""
+        if self._anytime is None or self._anytime.winning_masks is not self._game._winning_masks:
+            self._anytime = AnytimeSearch(self._game.board_size, self._game._winning_masks)
+        level = PERFECT_FALLBACK_LEVEL if self.difficulty is None else self.difficulty
+        self._anytime.max_depth, self._anytime.time_budget = DIFFICULTY_LEVELS[level]
+        return self._anytime
+
+    def solves_perfectly(self) -> bool:
+        """Whether moves are picked by solving the position, perfect mode on a board of up to "PERFECT_MAX_CELLS" cells."""
+        return self.perfect_mode and self._game.board_size * self._game.board_size <= PERFECT_MAX_CELLS
+
+    def _opponent_label(self, label):
+        for player in self._game.players_list:
+            if player.label != label:
+                return player.label
 
     def block_win_check(self):
-        for win_combo in self._game._winning_combos:
-            player_count = 0
-            cpu_count = 0
-            player_moves = [tuple(item) for item in self._game.player_moves]
-            cpu_moves = [tuple(item) for item in self._game.cpu_moves]
-            if not(bool(set(player_moves) & set(win_combo))):
-                for move in win_combo:
-                    for cpu_move in self._game.cpu_moves:
-                        if list(move) == cpu_move:
-                            cpu_count += 1
-            elif not bool(set(cpu_moves) & set(win_combo)):
-                for move in win_combo:
-                    for player_move in self._game.player_moves:
-                        if list(move) == player_move:
-                            player_count += 1
-            if cpu_count == BOARD_SIZE -1:
-                self.cpu_winning_move.append(set(win_combo) - set(cpu_moves))
-            elif player_count == BOARD_SIZE -1:
-                self.player_winning_move.append(set(win_combo) - set(player_moves))
-
-    def cpu_first_move(self) -> int:
-        self.corners = self.get_corners()
-        self.center = self.get_center()
-        self.best_first_move_options = self.get_center()+self.get_corners()
-        self.best_first_move_options_list = [list(value) for key, value in self.best_first_move_options]
-        if len(self._game.player_moves) ==0:
-            [key, value] = random.choice(self.best_first_move_options)
-            return key
-        elif len(self._game.player_moves) ==1:
-            if self._game.player_moves[0] in self.best_first_move_options_list:
-                if tuple(self._game.player_moves[0]) == self.center[0][1]:
-                    [key, value] = random.choice(self.corners)
-                    return key
-                elif tuple(self._game.player_moves[0]) is not self.center[0][1]:
-                    return self.center[0][0]
-            else:
-                return self.center[0][0]
+        #Read the cell that wins for the cpu and the cell that blocks the player's win from the game's threat index
+        cpu_label = self._game.current_player.label
+        self.cpu_winning_move = self._game.winning_move(cpu_label)
+        self.player_winning_move = self._game.winning_move(self._opponent_label(cpu_label))
+
+    def cpu_first_move(self):
+        corners = self.get_corners()
+        center = self.get_center()
+        player_moves = self._game.moves_of(self._opponent_label(self._game.current_player.label))
+        if len(player_moves) == 0:
+            return self._rng.choice(center + corners)
+        elif player_moves[0] in center:
+            return self._rng.choice(corners)
+        else:
+            return center[0]
 
     def double_threat_setup(self):
         #This is the logic for the cpu's second and third move which will play into setting up the double threat
-        player_moves = [tuple(item) for item in self._game.player_moves]
-        cpu_moves = [tuple(item) for item in self._game.cpu_moves]
-        best_move_options = [tuple(item) for item in self.best_first_move_options_list]
-        best_moves = [item for item in best_move_options if item not in player_moves+cpu_moves]
-        available_moves = [[key, value] for key, value in self.best_first_move_options if value in best_moves]
-        if len(player_moves)+len(cpu_moves) == 2:
+        cpu_label = self._game.current_player.label
+        player_moves = self._game.moves_of(self._opponent_label(cpu_label))
+        cpu_moves = self._game.moves_of(cpu_label)
+        center = self.get_center()[0]
+        best_move_options = self.get_center() + self.get_corners()
+        available_moves = [move for move in best_move_options if move not in player_moves + cpu_moves]
+        if len(player_moves) + len(cpu_moves) == 2:
             if player_moves[0] in best_move_options:
-                if [value for key,value in available_moves if value == self.center[0][1]]:
-                    return self.center[0][0]
-                elif self.center[0][1] in player_moves:
-                    move = [key for key,value in available_moves if value[0] is not cpu_moves[0][0] and value[1] is not cpu_moves[0][1]]
-                    return move[0]
+                if center in available_moves:
+                    return center
+                elif center in player_moves:
+                    #Take the corner opposite to the cpu's first corner
+                    move = [move for move in available_moves if move[0] != cpu_moves[0][0] and move[1] != cpu_moves[0][1]]
+                    return move[0] if move else None
                 else:
-                    [key, value] = random.choice(available_moves)
-                    return key
+                    return self._rng.choice(available_moves) if available_moves else None
             else:
-                if self.center[0][1] in cpu_moves:
-                    move = [key for key,value in available_moves if value[0] is not player_moves[0][0] and value[1] is not player_moves[0][1]]
-                    return random.choice(move)
+                if center in cpu_moves:
+                    move = [move for move in available_moves if move[0] != player_moves[0][0] and move[1] != player_moves[0][1]]
+                    return self._rng.choice(move) if move else None
                 else:
-                    return self.center[0][0]
-        elif len(player_moves)+len(cpu_moves) == 3:
+                    return center
+        elif len(player_moves) + len(cpu_moves) == 3:
             next_cpu_move = []
-            #Loop through all the possible win combinations
+            #Pick a corner or the center on a line the player has no progress in but the cpu does
             for win_combo in self._game._winning_combos:
-                #Transform every item in self._game.player_moves/cpu_moves into a tuple so that it matches the win_combo format
-                player_moves = [tuple(item) for item in self._game.player_moves]
-                cpu_moves = [tuple(item) for item in self._game.cpu_moves]
-                #Using set() with the "&" (intersection operator), filter out the win_combos that the player has some progress in
-                if not(bool(set(player_moves) & set(win_combo))):
-                    if bool(set(cpu_moves) & set(win_combo)):
-                        for move in win_combo:
-                            for cpu_move in self._game.cpu_moves:
-                                if not bool(list(move) == cpu_move):
-                                    next_cpu_move.append(move)
-            
-            next_cpu_move_rng = random.choice(next_cpu_move)
-            chosen_move = [key for key, value in available_moves if tuple(value) == next_cpu_move_rng]
-            return chosen_move[0]
+                if not set(player_moves) & set(win_combo) and set(cpu_moves) & set(win_combo):
+                    next_cpu_move.extend(move for move in win_combo if move in available_moves)
+            return self._rng.choice(next_cpu_move) if next_cpu_move else None
 
     def get_corners(self):
         board_size = self._game.board_size
-        corner_coords = {(0,0), (0, board_size-1), (board_size-1,0), (board_size-1, board_size-1)}
-        return [[button, coord] for button, coord in self._board._cells.items() if coord in corner_coords]
+        return [(0, 0), (0, board_size - 1), (board_size - 1, 0), (board_size - 1, board_size - 1)]
 
     def get_center(self):
         board_size = self._game.board_size
-        center_coord = (board_size // 2, board_size // 2)
-        return [[button, coord] for button, coord in self._board._cells.items() if coord == center_coord]
-
-    def cpu_play(self) -> None:
-        available_moves = []
-        keys, values = list(self._board._cells), list(self._board._cells.values())
-        self.player_winning_move = []
-        self.cpu_winning_move = []
-        self.block_win_check()
-        #Logic for choosing where to move
-        if self._game.current_player.cpu:
-            if self._board.hard_mode_status:
-                if len(self.cpu_winning_move) > 0:
-                    for key, value in zip(keys, values):
-                        if value in self.cpu_winning_move[0]:
-                            self._board.play(key)
-                elif len(self.player_winning_move) > 0:
-                    for key, value in zip(keys, values):
-                        if value in self.player_winning_move[0]:
-                            self._board.play(key)
-                else:
-                    if len(self._game.player_moves) + len(self._game.cpu_moves) <= 1:
-                        self._board.play(self.cpu_first_move())
-                    elif len(self._game.player_moves) + len(self._game.cpu_moves) in range(2, 4):
-                        self._board.play(self.double_threat_setup())
-                    else:
-                        for key in keys:
-                            if key.config("text")[4] == "":
-                                available_moves.append(key)
-                        self._board.play(random.choice(available_moves))
-            else:
-                for key in keys:
-                    if key.config("text")[4] == "":
-                        available_moves.append(key)
-                self._board.play(random.choice(available_moves))
-        available_moves = []
+        return [(board_size // 2, board_size // 2)]
+
+    def select_move(self) -> tuple:
+        """Return the (row, col) the current player should play next, recording the decision in "last_decision"."""
+        instruments = instrumentation.active
+        if instruments is None:
+            return self._select_move()
+        started = time.perf_counter()
+        move = self._select_move()
+        instruments.record("cpu_select", time.perf_counter() - started)
+        instruments.count("cpu_decisions")
+        instruments.count("moves_evaluated", len(self._game.available_moves()))
+        instruments.count(f"cpu_path.{self.last_decision}")
+        if self.last_decision == "search" and self.searcher is None:
+            instruments.count("search_nodes", self._anytime.nodes)
+            instruments.count(f"search_depth.{self._anytime.depth}")
+        return move
+
+    def _select_move(self) -> tuple:
+        cpu_label = self._game.current_player.label
+        if self.searcher is not None or self.perfect_mode or self.difficulty is not None:
+            own = self._game._bitboards[cpu_label]
+            opp = self._game._bitboards[self._opponent_label(cpu_label)]
+            if self.searcher is not None:
+                self.last_decision = "search"
+                return self.searcher.best_move(own, opp)
+            if self.solves_perfectly():
+                self.last_decision = "perfect"
+                if self._game.board_size == self._game.win_length == solved_table.BOARD_SIZE:
+                    return solved_table.default_table().best_move(own, opp, self._rng)
+                return self.solver().best_move(own, opp)
+            self.last_decision = "search"
+            return self.anytime_search().best_move(own, opp)
+        available_moves = self._game.available_moves()
+        if self.hard_mode:
+            self.block_win_check()
+            if self.cpu_winning_move is not None:
+                self.last_decision = "win"
+                return self.cpu_winning_move
+            elif self.player_winning_move is not None:
+                self.last_decision = "block"
+                return self.player_winning_move
+            move = None
+            played_moves = self._game.board_size ** 2 - len(available_moves)
+            if self._game.board_size == self._game.win_length == 3:
+                if played_moves <= 1:
+                    move = self.cpu_first_move()
+                elif played_moves in range(2, 4):
+                    move = self.double_threat_setup()
+            if move is not None:
+                self.last_decision = "opening"
+                return move
+        self.last_decision = "random"
+        return self._rng.choice(available_moves)
+
+
+def __getattr__(name):
+    #The Tk frontend lives in "tic_tac_toe_gui" and is only imported the first time one of its names is used, so the game can be imported without tkinter
+    if name in _GUI_NAMES:
+        import tic_tac_toe_gui
+        return getattr(tic_tac_toe_gui, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+_GUI_NAMES = frozenset((
+    "TicTacToeBoard", "TicTacToeGameCpuLogic", "ButtonGridRenderer", "CanvasBoardRenderer",
+    "TWITCH_POLL_MS", "CPU_POLL_MS", "CANVAS_BOARD_SIZE",
+))
 
 def main():
-    """Create game board and run its main loop"""
-    game = TicTacToeGame()
-    board = TicTacToeBoard(game)
-    logic = TicTacToeGameCpuLogic(game, board)
-    board._logic = logic
-    board.mainloop()
+    """Run the game in a Tk window, or in the terminal with "--tui", recording metrics to the JSON file named by the "TIC_TAC_TOE_METRICS" environment variable and finished games to the game record file named by "TIC_TAC_TOE_RECORD" if set.
+    Game statistics go to the SQLite database given with "--stats" or named by "TIC_TAC_TOE_STATS"."""
+    parser = argparse.ArgumentParser(description="Play tic tac toe.")
+    parser.add_argument("--tui", action="store_true", help="Play in the terminal instead of a Tk window")
+    parser.add_argument("--board-size", type=int, default=BOARD_SIZE)
+    parser.add_argument("--win-length", type=int, default=None)
+    parser.add_argument("--renderer", choices=("buttons", "canvas"), help="How the Tk window draws the board (Default: the canvas for large boards)")
+    parser.add_argument("--stats", default=os.environ.get("TIC_TAC_TOE_STATS"), help="SQLite database keeping the statistics of every finished game")
+    parser.add_argument("--broadcast", type=int, metavar="PORT", help="Publish the game for spectators on this port, see broadcast.py")
+    parser.add_argument("--autoplay", type=int, metavar="DELAY_MS", help="Let the cpu play both seats, waiting DELAY_MS between moves")
+    parser.add_argument("--soak", action="store_true", help="With --autoplay, start a new game as soon as one ends, forever")
+    args = parser.parse_args()
+    if args.soak and args.autoplay is None:
+        parser.error("--soak needs --autoplay")
+    metrics_path = os.environ.get("TIC_TAC_TOE_METRICS")
+    if metrics_path:
+        instrumentation.enable(snapshot_path=metrics_path)
+    game = TicTacToeGame(board_size=args.board_size, win_length=args.win_length)
+    record_path = os.environ.get("TIC_TAC_TOE_RECORD")
+    if record_path:
+        try:
+            game.recorder = game_record.GameRecordWriter(record_path, buffer_size=0, board_size=game.board_size)
+        except ValueError as error:
+            parser.error(f"TIC_TAC_TOE_RECORD: {error}")
+    stats = None
+    spectators = None
+    if args.stats:
+        import stats_store
+        stats = stats_store.StatsStore(args.stats)
+    try:
+        if args.tui:
+            import tic_tac_toe_tui
+            tic_tac_toe_tui.run(game, stats)
+        else:
+            from tic_tac_toe_gui import TicTacToeBoard, TicTacToeGameCpuLogic
+            if args.broadcast:
+                import broadcast
+                spectators = broadcast.BroadcastThread(port=args.broadcast)
+            board = TicTacToeBoard(game, args.renderer, stats, spectators)
+            logic = TicTacToeGameCpuLogic(game, board)
+            board._logic = logic
+            if args.autoplay is not None:
+                board.start_autoplay(args.autoplay, args.soak)
+            board.mainloop()
+    finally:
+        if metrics_path:
+            instrumentation.disable()
+        if game.recorder is not None:
+            game.recorder.close()
+        if stats is not None:
+            stats.close()
+        if spectators is not None:
+            spectators.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
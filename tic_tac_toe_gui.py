@@ -0,0 +1,976 @@
+import tkinter as tk
+from tkinter import font
+from concurrent.futures import ThreadPoolExecutor
+import copy
+import broadcast
+import hints
+import instrumentation
+import stats_store
+import twitch
+from solver import SearchCancelled, PERFECT_MAX_CELLS
+from tic_tac_toe import Move, TicTacToeCpuEngine, DIFFICULTY_LEVELS
+
+TWITCH_POLL_MS: int = 50
+DEFAULT_DIFFICULTY: int = 3
+CPU_POLL_MS: int = 15
+#Boards this size and up are drawn on one canvas instead of a button per cell
+CANVAS_BOARD_SIZE: int = 8
+#The game id spectators watch the window's game under
+BROADCAST_GAME = "board"
+HINT_POLL_MS: int = 30
+#The states of "TurnScheduler"
+TURN_IDLE = "idle"
+TURN_HUMAN = "human"
+TURN_CPU = "cpu"
+TURN_OVER = "over"
+AUTOPLAY_DELAYS = (0, 50, 250, 1000)
+CELL_COLOR = "#aed6f1"
+HINT_TEXT_COLOR = "#4d5656"
+
+
+def hint_style(hint) -> tuple:
+    """Return the (background color, text) a "MoveHint" is shown with: green for a win, yellow for a draw and red for a loss, darker when it comes within 3 moves."""
+    if hint.outcome == hints.DRAW:
+        return "#f9e79f", "="
+    soon = hint.moves <= 3
+    if hint.outcome == hints.WIN:
+        return ("#58d68d" if soon else "#abebc6"), f"W{hint.moves}"
+    return ("#ec7063" if soon else "#f5b7b1"), f"L{hint.moves}"
+
+
+class ButtonGridRenderer:
+    def __init__(self, master, board_size: int, on_click) -> None:
+        """Draws the board as one "tk.Button" per cell, all sharing one font, and only touches the buttons that changed when cleared.
+
+        :param master: The frame to fill with the buttons
+        :param board_size: The number of rows (and columns) of the board
+        :type board_size: int
+        :param on_click: Called with the click event, see "cell_at"
+        """
+        self.cells = {}
+        self.buttons = {}
+        self._marked = set()
+        self._highlighted = []
+        self._hinted = set()
+        cell_font = self._font = font.Font(size = 36, weight = "bold")
+        self._hint_font = font.Font(size = 14, weight = "bold")
+        for row in range(board_size):
+            master.rowconfigure(row, weight = 1, minsize = 50)
+            master.columnconfigure(row, weight = 1, minsize = 75)
+            for col in range(board_size):
+                cell_number = row * board_size + col + 1
+                button = tk.Button(
+                    master = master,
+                    text = "",
+                    font = cell_font,
+                    bg = CELL_COLOR,
+                    fg = "black",
+                    width = 3,
+                    height = 2,
+                    activebackground="#c39bd3",
+                )
+                button.num_label = cell_number
+                self.cells[button] = (row, col)
+                self.buttons[(row, col)] = button
+                button.bind("<ButtonPress-1>", on_click)
+                button.grid(
+                    row = row,
+                    column = col,
+                    padx = 5,
+                    pady = 5,
+                    sticky = "nsew"
+                )
+
+    def cell_at(self, event):
+        """Return the (row, col) of the clicked cell, or None."""
+        return self.cells.get(event.widget)
+
+    def draw_mark(self, row: int, col: int, label: str, color: str) -> None:
+        button = self.buttons[(row, col)]
+        if button in self._hinted:
+            self._hinted.discard(button)
+            button.config(bg=CELL_COLOR)
+        button.config(text=label, fg=color, font=self._font)
+        self._marked.add(button)
+
+    def erase_mark(self, row: int, col: int) -> None:
+        button = self.buttons[(row, col)]
+        button.config(text="", fg="black")
+        self._marked.discard(button)
+
+    def highlight(self, cells) -> None:
+        for coordinates in cells:
+            button = self.buttons[coordinates]
+            button.config(highlightbackground="red")
+            self._highlighted.append(button)
+
+    def clear_highlight(self) -> None:
+        for button in self._highlighted:
+            button.config(highlightbackground="lightblue")
+        self._highlighted = []
+
+    def show_hints(self, cell_hints: dict) -> None:
+        """Shade the cells of "cell_hints", a (background color, text) per (row, col)."""
+        self.clear_hints()
+        for coordinates, (color, text) in cell_hints.items():
+            button = self.buttons[coordinates]
+            button.config(bg=color, text=text, fg=HINT_TEXT_COLOR, font=self._hint_font)
+            self._hinted.add(button)
+
+    def clear_hints(self) -> None:
+        for button in self._hinted:
+            button.config(bg=CELL_COLOR, text="", fg="black", font=self._font)
+        self._hinted = set()
+
+    def clear(self) -> None:
+        self.clear_hints()
+        for button in self._marked:
+            button.config(text="", fg="black")
+        self._marked = set()
+        self.clear_highlight()
+
+
+class CanvasBoardRenderer:
+    def __init__(self, master, board_size: int, on_click) -> None:
+        """Draws the grid and the marks on a single "tk.Canvas" for large boards.
+        Clicks are mapped to cells arithmetically, every mark shares one font that is resized with the window, and only the cells that change are drawn or deleted.
+
+        :param master: The frame to fill with the canvas
+        :param board_size: The number of rows (and columns) of the board
+        :type board_size: int
+        :param on_click: Called with the click event, see "cell_at"
+        """
+        self.board_size = board_size
+        self.canvas = tk.Canvas(master = master, background="#aab7b8", highlightthickness=0)
+        self.canvas.pack(fill="both", expand=True)
+        self._font = font.Font(size = 12, weight = "bold")
+        self._hint_font = font.Font(size = 8)
+        self._marks = {}
+        self._hints = {}
+        self._highlighted = set()
+        self._origin = (0, 0)
+        self._cell_size = 1.0
+        self.canvas.bind("<Configure>", self._on_resize)
+        self.canvas.bind("<ButtonPress-1>", on_click)
+
+    def _on_resize(self, event) -> None:
+        #The only full redraw, everything else is drawn cell by cell
+        size = self.board_size
+        self._cell_size = min(event.width, event.height) / size
+        self._origin = ((event.width - self._cell_size * size) / 2, (event.height - self._cell_size * size) / 2)
+        self._font.configure(size=-max(int(self._cell_size * 0.6), 1))
+        self._hint_font.configure(size=-max(int(self._cell_size * 0.25), 1))
+        canvas = self.canvas
+        canvas.delete("all")
+        left, top = self._origin
+        span = self._cell_size * size
+        canvas.create_rectangle(left, top, left + span, top + span, fill=CELL_COLOR, outline="")
+        for step in range(size + 1):
+            offset = step * self._cell_size
+            canvas.create_line(left, top + offset, left + span, top + offset, fill="#aab7b8", width=2)
+            canvas.create_line(left + offset, top, left + offset, top + span, fill="#aab7b8", width=2)
+        hinted, self._hints = self._hints, {}
+        for (row, col), (color, text, _) in hinted.items():
+            self._draw_hint(row, col, color, text)
+        for (row, col), (label, color, _) in list(self._marks.items()):
+            self.draw_mark(row, col, label, color)
+        highlighted, self._highlighted = self._highlighted, set()
+        self.highlight(highlighted)
+
+    def _bounds(self, row: int, col: int) -> tuple:
+        left, top = self._origin
+        return (
+            left + col * self._cell_size,
+            top + row * self._cell_size,
+            left + (col + 1) * self._cell_size,
+            top + (row + 1) * self._cell_size,
+        )
+
+    def cell_at(self, event):
+        """Return the (row, col) under the click, or None outside the grid."""
+        left, top = self._origin
+        row = int((event.y - top) // self._cell_size)
+        col = int((event.x - left) // self._cell_size)
+        if 0 <= row < self.board_size and 0 <= col < self.board_size:
+            return row, col
+        return None
+
+    def draw_mark(self, row: int, col: int, label: str, color: str) -> None:
+        hint = self._hints.pop((row, col), None)
+        if hint is not None:
+            self.canvas.delete(*hint[2])
+        left, top, right, bottom = self._bounds(row, col)
+        item = self.canvas.create_text(
+            (left + right) / 2, (top + bottom) / 2, text=label, fill=color, font=self._font, tags="mark",
+        )
+        self._marks[(row, col)] = (label, color, item)
+
+    def erase_mark(self, row: int, col: int) -> None:
+        _, _, item = self._marks.pop((row, col))
+        self.canvas.delete(item)
+
+    def highlight(self, cells) -> None:
+        for row, col in cells:
+            inset = 2
+            left, top, right, bottom = self._bounds(row, col)
+            self.canvas.create_rectangle(
+                left + inset, top + inset, right - inset, bottom - inset, outline="red", width=3, tags="highlight",
+            )
+            self._highlighted.add((row, col))
+
+    def clear_highlight(self) -> None:
+        self.canvas.delete("highlight")
+        self._highlighted = set()
+
+    def _draw_hint(self, row: int, col: int, color: str, text: str) -> None:
+        inset = 2
+        left, top, right, bottom = self._bounds(row, col)
+        shade = self.canvas.create_rectangle(
+            left + inset, top + inset, right - inset, bottom - inset, fill=color, outline="", tags="hint",
+        )
+        label = self.canvas.create_text(
+            (left + right) / 2, (top + bottom) / 2, text=text, fill=HINT_TEXT_COLOR, font=self._hint_font, tags="hint",
+        )
+        self._hints[(row, col)] = (color, text, (shade, label))
+
+    def show_hints(self, cell_hints: dict) -> None:
+        """Shade the cells of "cell_hints", a (background color, text) per (row, col)."""
+        self.clear_hints()
+        for (row, col), (color, text) in cell_hints.items():
+            self._draw_hint(row, col, color, text)
+
+    def clear_hints(self) -> None:
+        self.canvas.delete("hint")
+        self._hints = {}
+
+    def clear(self) -> None:
+        self.canvas.delete("mark", "highlight", "hint")
+        self._marks = {}
+        self._hints = {}
+        self._highlighted = set()
+
+
+class TurnScheduler:
+    def __init__(self, board, delay_ms: int = 0) -> None:
+        """Hands the turn over between the seats of a "TicTacToeBoard" from after() callbacks, so a move is never played from inside the call that played the one before.
+
+        Every change of position calls "schedule", which replaces whatever step was pending with a single new one. The step reads the game and moves to one of the states:
+        "TURN_HUMAN" waits for a click or a chat vote, "TURN_CPU" sets the cpu thinking (its move comes back through "play_cell") and "TURN_OVER" ends the game, restarting it in soak mode.
+
+        :param board: The window whose turns are driven
+        :type board: TicTacToeBoard
+        :param delay_ms: The milliseconds waited before a cpu move or a soak restart, so cpu vs cpu games can be followed (Default value is "0")
+        :type delay_ms: int
+        """
+        self._board = board
+        self.delay_ms = delay_ms
+        self.soak = False
+        self.state = TURN_IDLE
+        self.games = 0
+        self._pending = None
+
+    def schedule(self) -> None:
+        """Take the next step once the current callback has returned, after "delay_ms" if it's the cpu's turn."""
+        self.cancel()
+        player = self._board._game.current_player
+        delay = self.delay_ms if player is not None and player.cpu else 0
+        self._pending = self._board.after(delay, self._step)
+
+    def cancel(self) -> None:
+        if self._pending is not None:
+            self._board.after_cancel(self._pending)
+            self._pending = None
+        self.state = TURN_IDLE
+
+    def _step(self) -> None:
+        self._pending = None
+        board = self._board
+        game = board._game
+        if game.current_player is None:
+            self.state = TURN_IDLE
+        elif game.has_winner() or game.is_tied():
+            self.state = TURN_OVER
+            if self.soak:
+                self._pending = board.after(self.delay_ms, self._restart)
+        elif game.current_player.cpu:
+            self.state = TURN_CPU
+            board._logic.cpu_play()
+        else:
+            self.state = TURN_HUMAN
+            board._start_chat_turn()
+
+    def _restart(self) -> None:
+        self._pending = None
+        self.games += 1
+        self._board.restart_game()
+
+
+class TicTacToeBoard(tk.Tk):
+    def __init__(self, game, renderer=None, stats=None, broadcast=None) -> None:
+        """The Tk window for a game.
+
+        :param game: The game to show
+        :type game: TicTacToeGame
+        :param renderer: "buttons" for one button per cell or "canvas" to draw on a single canvas (Default value is "None", meaning the canvas from "CANVAS_BOARD_SIZE" up)
+        :type renderer: str
+        :param stats: Where finished games are recorded and the Statistics window reads from (Default value is "None")
+        :type stats: StatsStore
+        :param broadcast: Where the game is published for spectators, as "BROADCAST_GAME" (Default value is "None")
+        :type broadcast: BroadcastThread
+        """
+        super().__init__()
+        self.minsize(400,500)
+        self.title("Tic-Tac-Toe Game")
+        self.master_frame = tk.Frame(master=self)
+        self.master_frame.place(x=0, y=0, relheight=1, relwidth=1)
+        self._cells = {}
+        self._buttons = {}
+        self._renderer = None
+        self._renderer_name = renderer
+        self._redo = []
+        self._game = game
+        self.stats = stats
+        self.broadcast = broadcast
+        self.twitch_check = "Hello"
+        self.player_one_score = 0
+        self.player_two_score = 0
+        self.vs_cpu_status = None
+        self.vs_cpu_info = [int, bool]
+        self.twitch_vs_cpu_info = None
+        self._twitch = None
+        self.difficulty_status = DEFAULT_DIFFICULTY
+        self.perfect_mode_status = False
+        self.hints_option = tk.BooleanVar(value=False)
+        self._hint_engine = hints.HintEngine()
+        self._hint_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hints")
+        self._hint_pending = None
+        self._turns = TurnScheduler(self)
+        self.autoplay_option = tk.BooleanVar(value=False)
+        self.soak_option = tk.BooleanVar(value=False)
+        self.autoplay_delay_option = tk.IntVar(value=AUTOPLAY_DELAYS[2])
+        self.eval("tk::PlaceWindow . center")
+        self.popup()
+        self._create_board_display()
+        self._create_board_grid()
+        self._create_menu()
+
+    def popup(self) -> None:
+        self.cpu_mode_option = tk.IntVar()
+        self.difficulty_option = tk.IntVar(value=self.difficulty_status)
+        self.perfect_mode_option = tk.IntVar()
+        self.twitch_mode_option = tk.IntVar()
+        self.first_player_mode_option = tk.IntVar()
+        self.twitch_channel_input = None
+        self.popup_window = tk.Toplevel()
+        self.eval(f"tk::PlaceWindow {str(self.popup_window)} center")
+        self.popup_window.title("Popup")
+        self.popup_window.attributes("-topmost", True)
+        self.popup_window.bind("<FocusOut>", lambda event: self.popup_window.focus_force())
+        self.popup_window.protocol('WM_DELETE_WINDOW', 'break')
+        self.popup_window.cpu_check = tk.Checkbutton(
+            self.popup_window, 
+            text="Play VS the CPU",
+            variable=self.cpu_mode_option,
+            onvalue=1,
+            offvalue=0,
+            command=self.vs_cpu_options,
+            font=("helvetica", 13)).pack(pady=(5),padx=(20))
+        self.popup_window.twitch_check = tk.Checkbutton(
+            self.popup_window, 
+            text="Twitch Plays DNT",
+            variable=self.twitch_mode_option,
+            onvalue=1, 
+            offvalue=0,
+            font=("helvetica", 13),
+            command=self.channel_input).pack(pady=(5),padx=(20))
+        self.popup_window.confirm_button = tk.Button(
+            self.popup_window, 
+            text="Confirm", 
+            command=self.confirm_button,
+            font=("helvetica", 13)).pack(side="bottom", padx=10,pady=10)
+        self.attributes("-disabled", True)
+
+    def channel_input(self):
+        if self.twitch_mode_option.get():
+            if self.twitch_channel_input is None:
+                self.twitch_channel_input = tk.Entry(self.popup_window, width=20)
+                self.twitch_channel_input.pack()
+                self.twitch_channel_value_info = tk.Label(self.popup_window)
+                self.twitch_channel_value_info.pack()
+                self.twitch_channel_input.insert(tk.END, "Enter Twitch Channel")
+                self.twitch_channel_input.bind("<FocusIn>", lambda e: self.text_entry_click())
+                self.twitch_channel_input.bind("<FocusOut>", lambda e: self.on_text_entry_focusout())
+                self.twitch_channel_input.config(fg= "grey")
+        else:
+            if self.twitch_channel_input is not None:
+                self.twitch_channel_input.pack_forget()
+                self.twitch_channel_input.destroy()
+                self.twitch_channel_value_info.pack_forget()
+                self.twitch_channel_value_info.destroy()
+                self.twitch_channel_input = None
+    
+    def is_channel_input_valid(self):
+        return twitch.is_valid_channel(self.twitch_value)
+
+    def _start_twitch(self, channel):
+        #Chat is read on a background thread, the winning votes are picked up here through after()
+        self._stop_twitch()
+        self._twitch = twitch.TwitchVoteController(channel, self._game.board_size)
+        self._twitch.start()
+        self.after(TWITCH_POLL_MS, self._poll_twitch)
+
+    def _stop_twitch(self):
+        if self._twitch is not None:
+            self._twitch.stop()
+            self._twitch = None
+
+    def _start_chat_turn(self):
+        #Let chat vote for every move of a non cpu player while Twitch mode is on
+        if self._twitch is None or self._game.current_player.cpu:
+            return
+        if self._game.has_winner() or self._game.is_tied():
+            return
+        self._twitch.open_window(self._game._occupied)
+        self._update_display(msg=f"Chat is voting... ({self._twitch.window_seconds:.0f}s)")
+
+    def _poll_twitch(self):
+        if self._twitch is None:
+            return
+        if self._twitch.error is not None or not self._twitch.running:
+            self._update_display(msg="Twitch chat disconnected", color="red")
+            self._twitch = None
+            return
+        result = self._twitch.poll()
+        if result is not None:
+            _, cell, votes = result
+            if cell is None:
+                self._start_chat_turn()
+            else:
+                self.play_cell(*divmod(cell, self._game.board_size))
+        self.after(TWITCH_POLL_MS, self._poll_twitch)
+
+    def vs_cpu_options(self):
+        if self.cpu_mode_option.get():
+            self.first_player_check = tk.Checkbutton(
+                self.popup_window, 
+                text="Play First?",
+                variable=self.first_player_mode_option,
+                onvalue=1,
+                offvalue=0,
+                font=("helvetica", 13))
+            self.first_player_check.pack(pady=(5),padx=(20))
+            self.difficulty_scale = tk.Scale(
+                self.popup_window,
+                label="Difficulty",
+                variable=self.difficulty_option,
+                from_=min(DIFFICULTY_LEVELS),
+                to=max(DIFFICULTY_LEVELS),
+                orient="horizontal",
+                font=("helvetica", 13))
+            self.difficulty_scale.pack(pady=(5),padx=(20))
+            self.perfect_mode_check = tk.Checkbutton(
+                self.popup_window, 
+                text="Perfect Play",
+                variable=self.perfect_mode_option,
+                onvalue=1, 
+                offvalue=0,
+                font=("helvetica", 13))
+            if self._game.board_size * self._game.board_size > PERFECT_MAX_CELLS:
+                #Too big to solve, the cpu would search at its difficulty level anyway
+                self.perfect_mode_option.set(0)
+                self.perfect_mode_check.config(state="disabled", text=f"Perfect Play (boards of up to {PERFECT_MAX_CELLS} cells)")
+            self.perfect_mode_check.pack(pady=(5),padx=(20))
+        else:
+            self.first_player_check.pack_forget()
+            self.first_player_check.destroy()
+            self.difficulty_scale.pack_forget()
+            self.difficulty_scale.destroy()
+            self.perfect_mode_check.pack_forget()
+            self.perfect_mode_check.destroy()
+
+    def text_entry_click(self):
+        if self.twitch_channel_input.get() == "Enter Twitch Channel":
+            self.twitch_channel_input.delete(0, "end")
+            self.twitch_channel_input.config(fg= "black")
+    
+    def on_text_entry_focusout(self):
+        if self.twitch_channel_input.get() == "":
+            self.twitch_channel_input.insert(tk.END, "Enter Twitch Channel")
+            self.twitch_channel_input.config(fg= "grey")
+
+    def confirm_button(self) -> None:
+        if self.twitch_channel_input is not None:
+            self.twitch_value = self.twitch_channel_input.get()
+            if not self.is_channel_input_valid():
+                self.twitch_channel_value_info["text"] = "Not a valid channel name"
+                return
+            self._start_twitch(self.twitch_value)
+        
+        self.attributes("-disabled", False)
+        self.popup_window.destroy()
+        label_msg = "Cpu"
+        self.difficulty_status = self.difficulty_option.get()
+        self.perfect_mode_status = bool(self.perfect_mode_option.get())
+        if self.cpu_mode_option.get() == 0:
+            self._update_display(msg="Player one's turn")
+            self.vs_cpu_status = False
+            self._game.set_players(self._game.players_list)
+        else:
+            if self.cpu_mode_option.get() and self.first_player_mode_option.get():
+                self._update_display(msg="Player one's turn")
+                self.vs_cpu_status = True
+                self.vs_cpu_info = [1, True]
+                self._update_player_two_info_display(label_msg)
+                self._game.set_cpu_player(1, True)
+                self._game.set_players(self._game.players_list)
+            elif self.cpu_mode_option.get() and self.first_player_mode_option.get() == 0:
+                self.vs_cpu_status = True
+                self.vs_cpu_info = [0, True]
+                self._update_player_one_info_display(label_msg)
+                self._game.set_cpu_player(0, True)
+                self._game.set_players(self._game.players_list)
+        self._publish_board()
+        self._refresh_hints()
+        self._turns.schedule()
+        
+    def _create_menu(self):
+        menu_bar = tk.Menu(master=self)
+        self.config(menu=menu_bar)
+        file_menu = tk.Menu(master=menu_bar)
+        file_menu.add_command(
+            label="Play Again",
+            command=self.restart_game,
+        )
+        self.bind("")
+        file_menu.add_separator()
+        file_menu.add_command(label="Undo", accelerator="Ctrl+Z", command=self.undo_move)
+        file_menu.add_command(label="Redo", accelerator="Ctrl+Y", command=self.redo_move)
+        self.bind("<Control-z>", lambda event: self.undo_move())
+        self.bind("<Control-y>", lambda event: self.redo_move())
+        file_menu.add_separator()
+        file_menu.add_checkbutton(label="Show hints", accelerator="Ctrl+H", variable=self.hints_option, command=self.toggle_hints)
+        self.bind("<Control-h>", lambda event: [self.hints_option.set(not self.hints_option.get()), self.toggle_hints()])
+        file_menu.add_command(label="Statistics", command=self.show_statistics)
+        file_menu.add_command(
+            label="Options",
+            command=lambda: [self.popup(), self.reset_board()]
+        )
+        file_menu.add_separator()
+        file_menu.add_command(label="Exit", command=quit)
+        menu_bar.add_cascade(label="File", menu=file_menu)
+        autoplay_menu = tk.Menu(master=menu_bar)
+        autoplay_menu.add_checkbutton(label="Cpu vs Cpu", variable=self.autoplay_option, command=self.toggle_autoplay)
+        autoplay_menu.add_checkbutton(label="Soak test (play again forever)", variable=self.soak_option, command=self._set_autoplay_pace)
+        autoplay_menu.add_separator()
+        for delay in AUTOPLAY_DELAYS:
+            autoplay_menu.add_radiobutton(
+                label=f"{delay} ms between moves", variable=self.autoplay_delay_option, value=delay, command=self._set_autoplay_pace,
+            )
+        menu_bar.add_cascade(label="Autoplay", menu=autoplay_menu)
+
+    def _create_board_display(self) -> None:
+        display_info_frame = tk.Frame(master=self.master_frame, background= "#aab7b8")
+        display_info_frame.place(x=0, y=0 , relheight=0.15, relwidth=1)
+        display_info_frame.columnconfigure((0,1,2), weight = 1)
+        display_info_frame.rowconfigure((0,1,2), weight = 1)
+
+        self.display = tk.Label(
+            master = display_info_frame,
+            text ="Ready?",
+            font = font.Font(size = 20, weight = "bold"),
+            background="#aab7b8",
+        )
+        self.display.grid(row=2, column=0, columnspan=3, sticky="nsew")
+
+        self.player_one_label_display = tk.Label(
+            master = display_info_frame,
+            text ="Player one?",
+            font = font.Font(size = 10),
+            background="#aab7b8",
+        )
+        self.player_one_label_display.grid(row=0, column=0, sticky="nsew")
+        self.player_one_score_display = tk.Label(
+            master = display_info_frame,
+            text = self.player_one_score,
+            font = font.Font(size = 10),
+            background="#aab7b8",
+        )
+        self.player_one_score_display.grid(row=1, column=0, sticky="nsew")
+
+        self.player_two_label_display = tk.Label(
+            master = display_info_frame,
+            text ="Player one?",
+            font = font.Font(size = 10),
+            background="#aab7b8",
+        )
+        self.player_two_label_display.grid(row=0, column=2, sticky="nsew")
+        self.player_two_score_display = tk.Label(
+            master = display_info_frame,
+            text = self.player_two_score,
+            font = font.Font(size = 10),
+            background="#aab7b8",
+        )
+        self.player_two_score_display.grid(row=1, column=2, sticky="nsew")
+
+    def _create_board_grid(self) -> None:
+        grid_frame = tk.Frame(master = self.master_frame, background="#aab7b8")
+        grid_frame.place(relx=0, rely=0.15 , relheight=0.85, relwidth=1)
+        renderer = self._renderer_name
+        if renderer is None:
+            renderer = "canvas" if self._game.board_size >= CANVAS_BOARD_SIZE else "buttons"
+        renderer_class = CanvasBoardRenderer if renderer == "canvas" else ButtonGridRenderer
+        self._renderer = renderer_class(grid_frame, self._game.board_size, self.play)
+        self._cells = getattr(self._renderer, "cells", {})
+        self._buttons = getattr(self._renderer, "buttons", {})
+    
+    def play(self, event) -> None:
+        #Handle a player's click, the cpu plays through play_cell
+        if self._game.current_player.cpu:
+            return
+        cell = self._renderer.cell_at(event)
+        if cell is not None:
+            self.play_cell(*cell)
+
+    def play_cell(self, row, col) -> None:
+        if self._game.is_valid_move(Move(row, col)):
+            self._redo = []
+            self._apply_move(row, col)
+            self._next_turn()
+
+    def _apply_move(self, row, col) -> None:
+        #Play a move on the game and the board and show the result, without handing the turn over
+        if self._twitch is not None:
+            self._twitch.cancel_window()
+        self._update_button(row, col)
+        move = Move(row, col, self._game.current_player.label)
+        self._game.make_move(move)
+        if self.broadcast is not None:
+            self.broadcast.publish_move(BROADCAST_GAME, **broadcast.move_state(self._game, move))
+        if self._game.is_tied():
+            self._update_display(msg = "Tied game!", color = "red")
+            self._record_stats()
+        elif self._game.has_winner():
+            self._record_stats()
+            self._highlight_cells()
+            self._update_display_msg()
+            msg = f'"{self.current_player_display_info}" won!'
+            self._add_score(self._game.current_player, 1)
+            color = self._game.current_player.color
+            self._update_display(msg, color)
+        else:
+            self._update_display_msg()
+            msg = f"{self.current_player_display_info}'s turn"
+            self._update_display(msg)
+        self._refresh_hints()
+
+    def _record_stats(self) -> None:
+        #Queued for the store's writer thread, so finishing a game never waits on disk
+        if self.stats is None or self._game.finished_before:
+            return
+        difficulty = None
+        if self._twitch is not None:
+            mode = stats_store.MODE_TWITCH
+        elif self.autoplay_option.get():
+            mode = stats_store.MODE_SELF_PLAY
+        elif not self.vs_cpu_status:
+            mode = stats_store.MODE_PLAYERS
+        elif self.perfect_mode_status:
+            mode = stats_store.MODE_PERFECT
+        else:
+            mode = stats_store.MODE_CPU
+            difficulty = self.difficulty_status
+        self.stats.record_finished_game(self._game, mode, difficulty)
+
+    def show_statistics(self) -> None:
+        """Open a window with the win rates recorded in the statistics store for this board."""
+        window = tk.Toplevel(self)
+        window.title("Statistics")
+        if self.stats is None:
+            text = "No statistics database, start the game with --stats to keep them."
+        else:
+            game = self._game
+            lines = [f"{self.stats.game_count():,} games recorded", "", "Against the cpu:"]
+            for stats in self.stats.win_rate_by_difficulty(game.board_size, game.win_length):
+                level = "perfect" if stats.mode == stats_store.MODE_PERFECT else f"{stats.mode} {stats.difficulty or ''}"
+                lines.append(f"  {level}: {stats.games} games, won {stats.player_win_rate:.0%}, lost {stats.cpu_wins / stats.games:.0%}")
+            lines += ["", "First player wins by opening move:"]
+            for stats in self.stats.win_rate_by_opening(game.board_size, game.win_length):
+                lines.append(f"  {stats.group}: {stats.games} games, {stats.first_win_rate:.0%}")
+            text = "\n".join(lines)
+        tk.Label(window, text=text, justify="left", font=("helvetica", 12)).pack(padx=20, pady=10)
+        tk.Button(window, text="Close", command=window.destroy).pack(pady=(0, 10))
+
+    def toggle_hints(self) -> None:
+        if self.hints_option.get() and not self._hint_engine.supports(self._game):
+            self.hints_option.set(False)
+            self._update_display(msg=f"Hints need a board of up to {hints.HINT_MAX_CELLS} cells", color="red")
+            return
+        self._refresh_hints()
+
+    def _refresh_hints(self) -> None:
+        #Called after every change of position: cached hints are painted at once, the others are solved on the hints thread
+        self._renderer.clear_hints()
+        game = self._game
+        if not self.hints_option.get() or game.current_player is None or game.current_player.cpu:
+            return
+        if game.has_winner() or game.is_tied() or not self._hint_engine.supports(game):
+            return
+        cell_hints = self._hint_engine.cached(game)
+        if cell_hints is not None:
+            self._paint_hints(cell_hints)
+            return
+        key = self._hint_engine.key(game)
+        if self._hint_pending is not None:
+            future, pending_key = self._hint_pending
+            if pending_key == key:
+                return
+            if not future.done():
+                self._hint_engine.cancel()
+        else:
+            self.after(HINT_POLL_MS, self._collect_hints)
+        self._hint_pending = (self._hint_executor.submit(self._hint_engine.compute, game.copy()), key)
+
+    def _collect_hints(self) -> None:
+        if self._hint_pending is None:
+            return
+        future, key = self._hint_pending
+        if not future.done():
+            self.after(HINT_POLL_MS, self._collect_hints)
+            return
+        self._hint_pending = None
+        try:
+            cell_hints = future.result()
+        except SearchCancelled:
+            return
+        game = self._game
+        if self.hints_option.get() and not game.current_player.cpu and self._hint_engine.key(game) == key:
+            self._paint_hints(cell_hints)
+
+    @instrumentation.timed("widget_update")
+    def _paint_hints(self, cell_hints) -> None:
+        self._renderer.show_hints({(hint.row, hint.col): hint_style(hint) for hint in cell_hints})
+
+    def _publish_board(self) -> None:
+        #Spectators get the whole board after anything but a single move
+        if self.broadcast is not None:
+            self.broadcast.publish_snapshot(BROADCAST_GAME, **broadcast.game_state(self._game))
+
+    def _next_turn(self) -> None:
+        self._turns.schedule()
+
+    def _set_autoplay_pace(self) -> None:
+        #The delay only slows the cpu down when it plays both seats, against a player it answers at once
+        autoplay = self.autoplay_option.get()
+        self._turns.delay_ms = self.autoplay_delay_option.get() if autoplay else 0
+        self._turns.soak = autoplay and self.soak_option.get()
+        if self._turns.soak and self._turns.state == TURN_OVER:
+            self._turns.schedule()
+
+    def toggle_autoplay(self) -> None:
+        """Let the cpu play both seats, or give the seats back as set in the options, and start a new game."""
+        autoplay = self.autoplay_option.get()
+        if autoplay and self.vs_cpu_status is None:
+            #Still at the options popup, start with its settings
+            self.confirm_button()
+        self._set_autoplay_pace()
+        self.restart_game()
+
+    def start_autoplay(self, delay_ms: int = 0, soak: bool = False) -> None:
+        """Have the cpu play both seats with "delay_ms" between moves, playing again forever with "soak"."""
+        self.autoplay_delay_option.set(delay_ms)
+        self.soak_option.set(soak)
+        self.autoplay_option.set(True)
+        self.toggle_autoplay()
+
+    def _add_score(self, player, amount) -> None:
+        if player.label == self._game.players_list[0].label:
+            self.player_one_score = self.player_one_score + amount
+            self.player_one_score_display["text"] = self.player_one_score
+        else:
+            self.player_two_score = self.player_two_score + amount
+            self.player_two_score_display["text"] = self.player_two_score
+
+    def undo_move(self) -> None:
+        """Take back the last move, and the cpu's reply before it, so it's a player's turn again."""
+        self._logic.cancel()
+        if self._twitch is not None:
+            self._twitch.cancel_window()
+        game = self._game
+        while game.history:
+            if game.has_winner():
+                self._add_score(game.current_player, -1)
+                self._renderer.clear_highlight()
+            move = game.unmake_move()
+            self._renderer.erase_mark(move.row, move.col)
+            self._redo.append(move)
+            if not game.current_player.cpu:
+                break
+        self._update_display_msg()
+        self._update_display(f"{self.current_player_display_info}'s turn")
+        self._publish_board()
+        self._refresh_hints()
+        self._next_turn()
+
+    def redo_move(self) -> None:
+        """Play the last undone move again, and the cpu's reply after it, so it's a player's turn again."""
+        if not self._redo:
+            return
+        self._logic.cancel()
+        game = self._game
+        while self._redo and not (game.has_winner() or game.is_tied()):
+            move = self._redo.pop()
+            self._apply_move(move.row, move.col)
+            if not game.current_player.cpu:
+                break
+        self._next_turn()
+
+    @instrumentation.timed("widget_update")
+    def _update_button(self, row, col):
+        self._renderer.draw_mark(row, col, self._game.current_player.label, self._game.current_player.color)
+    
+    @instrumentation.timed("widget_update")
+    def _update_display(self, msg, color="black"):
+        self.display["text"] = msg
+        self.display["fg"] = color
+
+    def _update_seat_names(self) -> None:
+        for seat, update in enumerate((self._update_player_one_info_display, self._update_player_two_info_display)):
+            player = self._game.players_list[seat]
+            update("Cpu" if player.cpu else player.name)
+
+    def _update_display_msg(self):
+        self.current_player_display_info = ""
+        if self.autoplay_option.get():
+            self.current_player_display_info = f"Cpu {self._game.current_player.label}"
+        elif self.vs_cpu_status:
+            if self._game.current_player.cpu:
+                self.current_player_display_info = "Cpu"
+            elif self._game.current_player.cpu == False:
+                self.current_player_display_info = self._game.current_player.name
+        elif self.vs_cpu_status is False:
+            self.current_player_display_info = self._game.current_player.name
+
+    def _update_player_one_info_display(self, msg, color="black"):
+        self.player_one_label_display["text"] = msg
+        self.player_one_label_display["fg"] = color
+
+    def _update_player_two_info_display(self, msg, color="black"):
+        self.player_two_label_display["text"] = msg
+        self.player_two_label_display["fg"] = color
+
+    @instrumentation.timed("widget_update")
+    def _highlight_cells(self):
+        self._renderer.highlight(self._game.winner_combo)
+
+    def reset_board(self):
+        #Reset the game's board to play again
+        self._turns.cancel()
+        self.autoplay_option.set(False)
+        self._set_autoplay_pace()
+        self._logic.cancel()
+        self._stop_twitch()
+        self._game.reset_game()
+        self._redo = []
+        self._update_display(msg="Ready?")
+        self.player_one_score = 0
+        self.player_one_score_display["text"] = self.player_one_score
+        self.player_two_score = 0
+        self.player_two_score_display["text"] = self.player_two_score
+        self._update_player_one_info_display("Player one")
+        self._update_player_two_info_display("Player two")
+        self._renderer.clear()
+        self._publish_board()
+        self._refresh_hints()
+
+    def restart_game(self):
+        """Restarts the game keeping the sttings to play again."""
+        self._logic.cancel()
+        if self._twitch is not None:
+            self._twitch.cancel_window()
+        self._turns.cancel()
+        self._game.clear_board()
+        self._redo = []
+        self._renderer.clear()
+        self._game.set_cpu_player(0, False)
+        self._game.set_cpu_player(1, False)
+        if self.autoplay_option.get():
+            self._game.set_cpu_player(0, True)
+            self._game.set_cpu_player(1, True)
+            self._game.set_players(self._game.players_list)
+            self._update_display(msg=f"Cpu vs Cpu, game {self._turns.games + 1}")
+        elif self.vs_cpu_status:
+            if self.vs_cpu_info[0] == 1:
+                self._update_display(msg="Player one's turn")
+            self._game.set_cpu_player(self.vs_cpu_info[0],self.vs_cpu_info[1])
+            self._game.set_players(self._game.players_list)
+        else:
+            self._update_display(msg="Player one's turn")
+            self._game.set_players(self._game.players_list)
+        self._update_seat_names()
+        self._publish_board()
+        self._refresh_hints()
+        self._turns.schedule()
+
+
+class TicTacToeGameCpuLogic(TicTacToeCpuEngine):
+    def __init__(self, game, board):
+        """Plays the moves picked by "TicTacToeCpuEngine" on a "TicTacToeBoard".
+        Moves are picked on a worker thread from a copy of the game and played back on the Tk thread through after(), so the window stays responsive while the cpu thinks.
+        """
+        super().__init__(game)
+        self._board = board
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cpu")
+        self._pending = None
+        self._turn_id = 0
+
+    def _think(self, thinker) -> tuple:
+        #Runs on the worker thread, searches never overlap since the executor has a single thread
+        for searcher in (self._solver, self._anytime, self.searcher):
+            if searcher is not None:
+                searcher.cancel_requested = False
+        return thinker.select_move()
+
+    def cpu_play(self) -> None:
+        if not self._game.current_player.cpu:
+            return
+        if self._game.has_winner() or self._game.is_tied():
+            return
+        self.cancel()
+        self.difficulty = self._board.difficulty_status
+        self.perfect_mode = self._board.perfect_mode_status
+        #Searchers are created here so the thinker shares them and cancel() can reach them
+        if self.solves_perfectly():
+            self.solver()
+        else:
+            self.anytime_search()
+        #The thinker shares the solver, searcher and rng but reads a copy of the game
+        thinker = copy.copy(self)
+        thinker._game = self._game.copy()
+        self._pending = self._executor.submit(self._think, thinker)
+        self._board._update_display(msg="Cpu is thinking…")
+        #Looked at once straight away, a quick pick then isn't held back by the polling interval in cpu vs cpu games
+        self._board.after(1, self._collect, self._turn_id)
+
+    def _collect(self, turn_id) -> None:
+        if turn_id != self._turn_id or self._pending is None:
+            return
+        if not self._pending.done():
+            self._board.after(CPU_POLL_MS, self._collect, turn_id)
+            return
+        future, self._pending = self._pending, None
+        try:
+            row, col = future.result()
+        except SearchCancelled:
+            return
+        self._board.play_cell(row, col)
+
+    def cancel(self) -> None:
+        """Forget the move being computed, if any, asking the search to stop early. A result that still comes back is never played."""
+        self._turn_id += 1
+        if self._pending is None:
+            return
+        if not self._pending.cancel():
+            for searcher in (self._solver, self._anytime, self.searcher):
+                if searcher is not None:
+                    searcher.cancel_requested = True
+        self._pending = None
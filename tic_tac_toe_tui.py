@@ -0,0 +1,224 @@
+import curses
+import locale
+import stats_store
+from tic_tac_toe import Move, TicTacToeCpuEngine, DIFFICULTY_LEVELS
+from solver import PERFECT_MAX_CELLS
+
+KEY_HELP = "Arrows/hjkl move  Enter/space play  u undo  y redo  r restart  o options  q quit"
+COLOR_PAIRS = {"blue": 1, "green": 2, "red": 3}
+MOVE_KEYS = {
+    curses.KEY_UP: (-1, 0), ord("k"): (-1, 0),
+    curses.KEY_DOWN: (1, 0), ord("j"): (1, 0),
+    curses.KEY_LEFT: (0, -1), ord("h"): (0, -1),
+    curses.KEY_RIGHT: (0, 1), ord("l"): (0, 1),
+}
+
+
+class TerminalFrontend:
+    def __init__(self, screen, game, stats=None) -> None:
+        """Plays a game in a curses screen with the same modes as the Tk window: two players or vs the cpu at a difficulty level or with perfect play, and who plays first.
+
+        :param screen: The curses window to draw on
+        :param game: The game to play
+        :type game: TicTacToeGame
+        :param stats: Where finished games are recorded (Default value is "None")
+        :type stats: StatsStore
+        """
+        self.screen = screen
+        self._game = game
+        self.stats = stats
+        self.engine = TicTacToeCpuEngine(game)
+        self.vs_cpu_status = False
+        self.scores = [0, 0]
+        self.cursor = (game.board_size // 2, game.board_size // 2)
+        self.message = "Ready?"
+        self.message_color = None
+        self._redo = []
+
+    def _ask(self, question: str, answers: str) -> str:
+        #Show a question and wait for one of the "answers" keys
+        self.screen.erase()
+        self.screen.addstr(1, 2, question)
+        self.screen.refresh()
+        while True:
+            key = self.screen.getch()
+            if key in (ord("q"), 27):
+                raise KeyboardInterrupt
+            if 0 <= key < 256 and chr(key).lower() in answers:
+                return chr(key).lower()
+
+    def options(self) -> None:
+        """Ask for the game mode and start a new match with the scores reset."""
+        game = self._game
+        game.set_cpu_player(0, False)
+        game.set_cpu_player(1, False)
+        self.vs_cpu_status = self._ask("Play VS the CPU? [y/n]", "yn") == "y"
+        if self.vs_cpu_status:
+            levels = "".join(str(level) for level in DIFFICULTY_LEVELS)
+            question = f"Difficulty: [{levels[0]}]-[{levels[-1]}]"
+            #Perfect play is only offered on boards small enough to solve between key presses
+            if game.board_size * game.board_size <= PERFECT_MAX_CELLS:
+                question, levels = question + " or [p]erfect play", levels + "p"
+            difficulty = self._ask(question, levels)
+            self.engine.perfect_mode = difficulty == "p"
+            self.engine.difficulty = None if self.engine.perfect_mode else int(difficulty)
+            play_first = self._ask("Play first? [y/n]", "yn") == "y"
+            game.set_cpu_player(1 if play_first else 0, True)
+        self.scores = [0, 0]
+        self.restart()
+
+    def restart(self) -> None:
+        """Clear the board keeping the settings to play again."""
+        self._game.clear_board()
+        self._game.set_players(self._game.players_list)
+        self._redo = []
+        self._set_turn_message()
+
+    def _display_name(self) -> str:
+        player = self._game.current_player
+        return "Cpu" if self.vs_cpu_status and player.cpu else player.name
+
+    def _set_turn_message(self) -> None:
+        self.message = f"{self._display_name()}'s turn"
+        self.message_color = None
+
+    def is_over(self) -> bool:
+        return self._game.has_winner() or self._game.is_tied()
+
+    def _seat(self) -> int:
+        return 0 if self._game.current_player.label == self._game.players_list[0].label else 1
+
+    def play_cell(self, row: int, col: int, redo: bool = False) -> None:
+        game = self._game
+        move = Move(row, col, game.current_player.label)
+        if not game.is_valid_move(move):
+            return
+        if not redo:
+            self._redo = []
+        game.make_move(move)
+        if game.is_tied():
+            self.message, self.message_color = "Tied game!", "red"
+        elif game.has_winner():
+            self.scores[self._seat()] += 1
+            self.message, self.message_color = f'"{self._display_name()}" won!', game.current_player.color
+        else:
+            self._set_turn_message()
+            return
+        if self.stats is not None and not game.finished_before:
+            if not self.vs_cpu_status:
+                self.stats.record_finished_game(game, stats_store.MODE_PLAYERS)
+            elif self.engine.perfect_mode:
+                self.stats.record_finished_game(game, stats_store.MODE_PERFECT)
+            else:
+                self.stats.record_finished_game(game, stats_store.MODE_CPU, self.engine.difficulty)
+
+    def undo(self) -> None:
+        """Take back moves until it's a player's turn again, the cpu's reply included."""
+        game = self._game
+        while game.history:
+            if game.has_winner():
+                self.scores[self._seat()] -= 1
+            self._redo.append(game.unmake_move())
+            if not game.current_player.cpu:
+                break
+        self._set_turn_message()
+
+    def redo(self) -> None:
+        """Play undone moves again until it's a player's turn."""
+        game = self._game
+        while self._redo and not self.is_over():
+            move = self._redo.pop()
+            self.play_cell(move.row, move.col, redo=True)
+            if not game.current_player.cpu:
+                break
+
+    def _attribute(self, color) -> int:
+        if color is None or not curses.has_colors():
+            return 0
+        return curses.color_pair(COLOR_PAIRS.get(color, 0))
+
+    def draw(self) -> None:
+        screen = self.screen
+        game = self._game
+        size = game.board_size
+        height, width = screen.getmaxyx()
+        screen.erase()
+        one, two = game.players_list
+        screen.addnstr(0, 1, f"{one.name} ({one.label}): {self.scores[0]}    {two.name} ({two.label}): {self.scores[1]}", width - 2)
+        screen.addnstr(1, 1, self.message, width - 2, self._attribute(self.message_color) | curses.A_BOLD)
+        #Wide cells with separators when they fit, a mark and a space per cell otherwise
+        wide = size * 4 + 2 < width and size * 2 + 5 < height
+        cell_width = 4 if wide else 2
+        row_step = 2 if wide else 1
+        labels = {player.label: player for player in game.players_list}
+        winning = set(game.winner_combo)
+        for row in range(size):
+            y = 3 + row * row_step
+            if y >= height - 1:
+                break
+            for col in range(size):
+                x = 1 + col * cell_width
+                if x + cell_width >= width:
+                    break
+                label = next((label for label in labels if game._bitboards[label] >> (row * size + col) & 1), "")
+                attribute = self._attribute(labels[label].color) if label else 0
+                if (row, col) in winning:
+                    attribute = self._attribute("red") | curses.A_BOLD
+                if (row, col) == self.cursor and not self.is_over():
+                    attribute |= curses.A_REVERSE
+                text = f" {label or '.'} " if wide else label or "."
+                screen.addstr(y, x, text, attribute)
+                if wide and col < size - 1:
+                    screen.addstr(y, x + 3, "|")
+            if wide and row < size - 1 and y + 1 < height - 1:
+                screen.addnstr(y + 1, 1, "+".join(["---"] * size), width - 2)
+        screen.addnstr(height - 1, 1, KEY_HELP, width - 2, curses.A_DIM)
+        screen.refresh()
+
+    def run(self) -> None:
+        """Ask for the options and play until "q" is pressed."""
+        self.options()
+        while True:
+            self.draw()
+            if self._game.current_player.cpu and not self.is_over():
+                self.message = "Cpu is thinking…"
+                self.draw()
+                self.play_cell(*self.engine.select_move())
+                continue
+            key = self.screen.getch()
+            if key in (ord("q"), 27):
+                return
+            if key == ord("r"):
+                self.restart()
+            elif key == ord("o"):
+                self.options()
+            elif key == ord("u"):
+                self.undo()
+            elif key == ord("y"):
+                self.redo()
+            elif key in MOVE_KEYS:
+                size = self._game.board_size
+                row_step, col_step = MOVE_KEYS[key]
+                self.cursor = ((self.cursor[0] + row_step) % size, (self.cursor[1] + col_step) % size)
+            elif key in (ord(" "), ord("\n"), curses.KEY_ENTER) and not self.is_over():
+                self.play_cell(*self.cursor)
+
+
+def _main(screen, game, stats) -> None:
+    curses.curs_set(0)
+    screen.keypad(True)
+    if curses.has_colors():
+        curses.use_default_colors()
+        curses.init_pair(COLOR_PAIRS["blue"], curses.COLOR_BLUE, -1)
+        curses.init_pair(COLOR_PAIRS["green"], curses.COLOR_GREEN, -1)
+        curses.init_pair(COLOR_PAIRS["red"], curses.COLOR_RED, -1)
+    try:
+        TerminalFrontend(screen, game, stats).run()
+    except KeyboardInterrupt:
+        pass
+
+
+def run(game, stats=None) -> None:
+    """Play "game" in the terminal until the player quits, recording finished games in "stats" if given."""
+    locale.setlocale(locale.LC_ALL, "")
+    curses.wrapper(_main, game, stats)
@@ -0,0 +1,335 @@
+import argparse
+import asyncio
+import os
+import queue
+import re
+import threading
+import time
+
+TWITCH_IRC_HOST = "irc.chat.twitch.tv"
+TWITCH_IRC_PORT: int = 6667
+#Twitch lets anonymous "justinfan" logins read chat without a token
+ANONYMOUS_NICK = "justinfan31415"
+CHANNEL_PATTERN = re.compile(r"^#?[A-Za-z0-9_]{3,25}$")
+COLUMN_LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def is_valid_channel(channel: str) -> bool:
+    """Return True if "channel" (with or without the leading "#") is a possible Twitch channel name."""
+    return bool(CHANNEL_PATTERN.match(channel.strip()))
+
+
+def build_vote_lookup(board_size: int) -> dict:
+    """Return a dict mapping every accepted vote message to a cell index (row * board_size + col).
+    Votes are either "!<cell number>" counting from 1 like the board's "num_label", or a column letter and a row number like "b2".
+
+    :param board_size: The number of rows (and columns) of the board
+    :type board_size: int
+    """
+    lookup = {}
+    for row in range(board_size):
+        for col in range(board_size):
+            cell = row * board_size + col
+            lookup[f"!{cell + 1}".encode()] = cell
+            if col < len(COLUMN_LETTERS):
+                letter = COLUMN_LETTERS[col]
+                lookup[f"{letter}{row + 1}".encode()] = cell
+                lookup[f"{letter.upper()}{row + 1}".encode()] = cell
+    return lookup
+
+
+def parse_privmsg(line: bytes):
+    """Return the (nick, text) of a raw IRC PRIVMSG line, or None for any other line."""
+    if line.startswith(b"@"):
+        line = line[line.find(b" ") + 1:]
+    if not line.startswith(b":"):
+        return None
+    parts = line.split(b" ", 3)
+    if len(parts) < 4 or parts[1] != b"PRIVMSG":
+        return None
+    prefix = parts[0]
+    bang = prefix.find(b"!")
+    return prefix[1:bang if bang > 0 else None], parts[3][1:]
+
+
+class VoteTally:
+    def __init__(self, board_size: int) -> None:
+        """Counts one vote per chatter and per window, keeping the leading cell up to date on every vote so closing a window is constant time."""
+        self.counts = [0] * (board_size * board_size)
+        self.voters = set()
+        self.legal_mask = 0
+        self.leader = None
+        self.leader_votes = 0
+        self.total = 0
+
+    def reset(self, legal_mask: int) -> None:
+        """Start a new window where only the cells set in "legal_mask" can be voted for."""
+        for cell in range(len(self.counts)):
+            self.counts[cell] = 0
+        self.voters.clear()
+        self.legal_mask = legal_mask
+        self.leader = None
+        self.leader_votes = 0
+        self.total = 0
+
+    def vote(self, voter: bytes, cell: int) -> bool:
+        if not self.legal_mask >> cell & 1 or voter in self.voters:
+            return False
+        self.voters.add(voter)
+        votes = self.counts[cell] + 1
+        self.counts[cell] = votes
+        self.total += 1
+        if votes > self.leader_votes:
+            self.leader, self.leader_votes = cell, votes
+        return True
+
+
+class TwitchChatClient:
+    def __init__(self, channel: str, board_size: int, on_vote, host: str = TWITCH_IRC_HOST, port: int = TWITCH_IRC_PORT) -> None:
+        """Reads a channel's chat over IRC and calls "on_vote(nick, cell)" for every message that is a vote.
+
+        :param channel: The channel to join, with or without the leading "#"
+        :type channel: str
+        :param board_size: The number of rows (and columns) of the board
+        :type board_size: int
+        :param on_vote: Called with the voter's nick (bytes) and the cell index
+        :param host: The IRC server (Default value is "TWITCH_IRC_HOST")
+        :type host: str
+        :param port: The IRC port (Default value is "TWITCH_IRC_PORT")
+        :type port: int
+        """
+        self.channel = "#" + channel.strip().lstrip("#").lower()
+        self.host = host
+        self.port = port
+        self.on_vote = on_vote
+        self.messages = 0
+        self._lookup = build_vote_lookup(board_size)
+
+    async def run(self) -> None:
+        """Connect, join the channel and handle chat until the connection closes."""
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        writer.write(f"NICK {ANONYMOUS_NICK}\r\nJOIN {self.channel}\r\n".encode())
+        await writer.drain()
+        lookup = self._lookup
+        on_vote = self.on_vote
+        pending = b""
+        try:
+            while True:
+                chunk = await reader.read(1 << 16)
+                if not chunk:
+                    break
+                lines = (pending + chunk).split(b"\r\n")
+                pending = lines.pop()
+                for line in lines:
+                    message = parse_privmsg(line)
+                    if message is None:
+                        if line.startswith(b"PING"):
+                            writer.write(b"PONG" + line[4:] + b"\r\n")
+                        continue
+                    self.messages += 1
+                    cell = lookup.get(message[1].strip())
+                    if cell is not None:
+                        on_vote(message[0], cell)
+        finally:
+            writer.close()
+
+
+class TwitchVoteController:
+    def __init__(self, channel: str, board_size: int, window_seconds: float = 10.0, host: str = None, port: int = None) -> None:
+        """Runs a "TwitchChatClient" on an asyncio loop in a background thread and turns chat votes into moves.
+        The GUI opens a voting window with "open_window" and picks up the winning cell with "poll" (from Tk's "after()"), so the UI never waits on the network.
+        "host" and "port" default to the "TWITCH_IRC_ADDRESS" environment variable ("host:port"), then to Twitch itself.
+        """
+        if host is None or port is None:
+            address = os.environ.get("TWITCH_IRC_ADDRESS", f"{TWITCH_IRC_HOST}:{TWITCH_IRC_PORT}")
+            default_host, _, default_port = address.rpartition(":")
+            host = host or default_host
+            port = port or int(default_port)
+        self.window_seconds = window_seconds
+        self.window_id = 0
+        self.error = None
+        self._window_open = False
+        self._tally = VoteTally(board_size)
+        self._results = queue.Queue()
+        self._loop = asyncio.new_event_loop()
+        self._client = TwitchChatClient(channel, board_size, self._on_vote, host, port)
+        self._thread = threading.Thread(target=self._run_loop, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    @property
+    def running(self) -> bool:
+        """Whether the chat loop is still running, windows opened once it has stopped never close."""
+        return self._thread.is_alive()
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._client.run())
+        except (Exception, asyncio.CancelledError) as error:
+            self.error = error
+        else:
+            #The server ended the connection, no vote will ever come in again
+            self.error = ConnectionError("Twitch chat closed the connection")
+
+    def _on_vote(self, voter: bytes, cell: int) -> None:
+        if self._window_open:
+            self._tally.vote(voter, cell)
+
+    def open_window(self, occupied: int) -> int:
+        """Start a voting window for the empty cells of the board, from any thread, and return its id.
+
+        :param occupied: The game's bitmask of played cells
+        :type occupied: int
+        """
+        self.window_id += 1
+        legal_mask = ((1 << len(self._tally.counts)) - 1) & ~occupied
+        self._loop.call_soon_threadsafe(self._open_window, self.window_id, legal_mask)
+        return self.window_id
+
+    def _open_window(self, window_id: int, legal_mask: int) -> None:
+        self._tally.reset(legal_mask)
+        self._window_open = True
+        self._loop.call_later(self.window_seconds, self._close_window, window_id)
+
+    def _close_window(self, window_id: int) -> None:
+        if window_id != self.window_id:
+            return
+        self._window_open = False
+        self._results.put((window_id, self._tally.leader, self._tally.total))
+
+    def cancel_window(self) -> None:
+        """Drop the current window, its result will never be reported."""
+        self.window_id += 1
+
+    def poll(self):
+        """Return the (window id, winning cell or None, number of votes) of a closed window that is still current, or None if there is none yet."""
+        while True:
+            try:
+                window_id, cell, votes = self._results.get_nowait()
+            except queue.Empty:
+                return None
+            if window_id == self.window_id:
+                return window_id, cell, votes
+
+    def stop(self) -> None:
+        """Cancel the current window and disconnect from chat."""
+        self.cancel_window()
+        if self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._cancel_tasks)
+
+    def _cancel_tasks(self) -> None:
+        for task in asyncio.all_tasks(self._loop):
+            task.cancel()
+
+
+class ReplayIrcServer:
+    def __init__(self, lines: list, rate: float = 1000.0, channel: str = "#replay", loop_forever: bool = False) -> None:
+        """A local stand-in for Twitch's IRC server that replays recorded chat to every client that joins.
+
+        Recorded lines are either raw IRC lines (starting with ":") or "nick message" pairs that get wrapped in a PRIVMSG.
+
+        :param lines: The recorded chat lines
+        :type lines: list
+        :param rate: The number of messages per second to send, 0 sending as fast as possible (Default value is "1000.0")
+        :type rate: float
+        :param channel: The channel the wrapped messages are sent to (Default value is "#replay")
+        :type channel: str
+        :param loop_forever: Start again from the first line after the last one (Default value is "False")
+        :type loop_forever: bool
+        """
+        self.rate = rate
+        self.loop_forever = loop_forever
+        self._messages = []
+        for line in lines:
+            line = line.rstrip("\r\n")
+            if not line:
+                continue
+            if not line.startswith(":"):
+                nick, _, text = line.partition(" ")
+                line = f":{nick}!{nick}@{nick}.tmi.twitch.tv PRIVMSG {channel} :{text}"
+            self._messages.append(line.encode() + b"\r\n")
+        self.server = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """Start listening and return the port, useful with the default "port=0" picking a free one."""
+        self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def _handle(self, reader, writer) -> None:
+        #Wait for the JOIN, then replay the chat in bursts paced to the configured rate
+        while True:
+            line = await reader.readline()
+            if not line:
+                writer.close()
+                return
+            if line.startswith(b"JOIN"):
+                break
+        burst = 256 if self.rate <= 0 else max(1, int(self.rate / 100))
+        started = time.monotonic()
+        sent = 0
+        try:
+            while True:
+                for start in range(0, len(self._messages), burst):
+                    writer.write(b"".join(self._messages[start:start + burst]))
+                    sent += len(self._messages[start:start + burst])
+                    await writer.drain()
+                    if self.rate > 0:
+                        delay = started + sent / self.rate - time.monotonic()
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                if not self.loop_forever:
+                    break
+        except ConnectionError:
+            pass
+        writer.close()
+
+    def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+
+
+async def _benchmark(lines, rate, board_size) -> None:
+    server = ReplayIrcServer(lines, rate)
+    port = await server.start()
+    tally = VoteTally(board_size)
+    tally.reset((1 << board_size * board_size) - 1)
+    client = TwitchChatClient("replay", board_size, tally.vote, "127.0.0.1", port)
+    started = time.perf_counter()
+    await client.run()
+    elapsed = time.perf_counter() - started
+    server.close()
+    print(f"{client.messages} messages in {elapsed:.2f}s: {client.messages / elapsed:,.0f} messages/sec")
+    print(f"{tally.total} votes counted, leading cell {tally.leader} with {tally.leader_votes} votes")
+
+
+def main():
+    """Serve recorded chat from a local stand-in IRC server, or measure the vote pipeline against it"""
+    parser = argparse.ArgumentParser(description="Replay recorded Twitch chat locally.")
+    parser.add_argument("mode", choices=("serve", "bench"))
+    parser.add_argument("--file", help="Recorded chat, one \"nick message\" or raw IRC line per line (Default: generated votes)")
+    parser.add_argument("--rate", type=float, default=0, help="Messages per second, 0 for as fast as possible")
+    parser.add_argument("--messages", type=int, default=200_000, help="Number of generated messages without --file")
+    parser.add_argument("--board-size", type=int, default=3)
+    parser.add_argument("--port", type=int, default=TWITCH_IRC_PORT)
+    args = parser.parse_args()
+    if args.file:
+        with open(args.file) as chat_file:
+            lines = chat_file.readlines()
+    else:
+        votes = list(build_vote_lookup(args.board_size)) + [b"PogChamp", b"gg"]
+        lines = [f"viewer{index} {votes[index % len(votes)].decode()}" for index in range(args.messages)]
+    if args.mode == "bench":
+        asyncio.run(_benchmark(lines, args.rate, args.board_size))
+        return
+
+    async def serve():
+        server = ReplayIrcServer(lines, args.rate, loop_forever=True)
+        port = await server.start(port=args.port)
+        print(f"Replaying {len(lines)} lines on 127.0.0.1:{port} (set TWITCH_IRC_ADDRESS=127.0.0.1:{port})")
+        await server.server.serve_forever()
+    asyncio.run(serve())
+
+if __name__ == "__main__":
+    main()